@@ -0,0 +1,203 @@
+"""Run many unattended migrations in parallel, one process per account
+
+Each line of the jobs file is a JSON object describing one account:
+
+    {"name": "alice", "spotify_profile": "C:/Edge/alice-spotify", "ytmusic_profile": "C:/Edge/alice-ytm",
+     "playlists": ["Road trip*"], "exclude": ["Discover Weekly"], "args": ["--workers", "2"]}
+
+name, spotify_profile and ytmusic_profile are required; the profiles must already
+be logged in. "import" can replace spotify_profile with a Spotify data export
+(see --import in ytmusic.py). playlists and exclude are name patterns or Spotify IDs (see
+--playlist in ytmusic.py) and args are passed to ytmusic.py as they are. A JSON
+list of the same objects works too.
+
+    python batch.py jobs.jsonl --concurrency 8
+
+Every job gets a directory under --log-dir with its output, journal, track cache
+and selector cache, and a summary with each job's exit status is written to
+summary.json there. Running the same jobs file again with --resume continues the
+jobs that did not finish. --ytmusic-rate and --spotify-rate are totals for all
+running jobs together; each job gets an equal share.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import ytmusic
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ytmusic.py")
+DEFAULT_LOG_DIR = "batch_logs"
+# Each job drives at least two browsers, so don't start more jobs than that fits
+DEFAULT_CONCURRENCY = max(1, (os.cpu_count() or 2) // 2)
+
+# Exit statuses of ytmusic.py, for the summary
+STATUS_NAMES = {0: "ok", 1: "failed", 2: "usage error", 3: "login required"}
+
+def load_jobs(path):
+    """Read and validate jobs from a JSON lines file (or a JSON list)"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        jobs = json.loads(text)
+    else:
+        jobs = [json.loads(line) for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    names = set()
+    for number, job in enumerate(jobs, 1):
+        for field in ("name", "ytmusic_profile"):
+            if not job.get(field):
+                raise ValueError(f"job {number} has no {field}")
+        if not job.get("spotify_profile") and not job.get("import"):
+            raise ValueError(f"job {number} has neither spotify_profile nor import")
+        if job["name"] in names:
+            raise ValueError(f"job name {job['name']!r} is used twice")
+        names.add(job["name"])
+    return jobs
+
+def job_directory(log_dir, job):
+    return os.path.join(log_dir, re.sub(r"[^\w.-]+", "_", job["name"]))
+
+def job_command(job, directory, resume=False, rates=ytmusic.RATE_LIMITS):
+    """The ytmusic.py command line for one job
+
+    rates are the job's own requests per second per service; args from the job
+    come last, so a job can still override them or the cache paths.
+    """
+    journal = os.path.join(directory, "journal.jsonl")
+    command = [
+        sys.executable, SCRIPT, "--non-interactive",
+        "--ytmusic-profile", job["ytmusic_profile"],
+        "--journal", journal,
+        "--artifact-dir", os.path.join(directory, "debug"),
+        # Jobs run at the same time, so they must not write the same cache files
+        "--cache", os.path.join(directory, "track_cache.sqlite3"),
+        "--selector-cache", os.path.join(directory, "selector_cache.json"),
+        "--spotify-rate", f"{rates['spotify']:g}",
+        "--ytmusic-rate", f"{rates['ytmusic']:g}",
+    ]
+    if job.get("import"):
+        command += ["--import", job["import"]]
+    else:
+        command += ["--spotify-profile", job["spotify_profile"]]
+    for pattern in job.get("playlists", []):
+        command += ["--playlist", pattern]
+    for pattern in job.get("exclude", []):
+        command += ["--exclude-playlist", pattern]
+    # Without --resume a job starts over, even if its last run was interrupted
+    command.append("--resume" if resume and os.path.exists(journal) else "--fresh")
+    return command + [str(arg) for arg in job.get("args", [])]
+
+class BatchRunner:
+    """Run jobs as subprocesses with at most `concurrency` running at once"""
+
+    def __init__(self, jobs, log_dir=DEFAULT_LOG_DIR, concurrency=DEFAULT_CONCURRENCY, resume=False, timeout=None,
+                 rates=ytmusic.RATE_LIMITS):
+        self.jobs = jobs
+        self.log_dir = log_dir
+        self.concurrency = concurrency
+        # The services see every running job at once, so split the total rate between them
+        running = max(1, min(concurrency, len(jobs)))
+        self.rates = {service: rate / running for service, rate in rates.items()}
+        self.resume = resume
+        self.timeout = timeout
+        self.processes = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def run_job(self, job):
+        """Run one job to completion and return its summary entry"""
+        directory = job_directory(self.log_dir, job)
+        os.makedirs(directory, exist_ok=True)
+        command = job_command(job, directory, self.resume, self.rates)
+        log_path = os.path.join(directory, "output.log")
+        env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+        entry = {"name": job["name"], "log": log_path, "started": time.time()}
+        if self.stopping.is_set():
+            return dict(entry, status="skipped", exit_code=None, seconds=0.0)
+
+        print(f"▶ {job['name']} started")
+        with open(log_path, "a", encoding="utf-8") as log:
+            log.write(f"$ {subprocess.list2cmdline(command)}\n")
+            log.flush()
+            process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, env=env)
+            with self.lock:
+                self.processes[job["name"]] = process
+            try:
+                exit_code = process.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                exit_code = process.wait()
+                entry["timed_out"] = True
+            finally:
+                with self.lock:
+                    self.processes.pop(job["name"], None)
+
+        seconds = time.time() - entry["started"]
+        status = "timed out" if entry.get("timed_out") else STATUS_NAMES.get(exit_code, "failed")
+        print(f"{'✅' if exit_code == 0 else '❌'} {job['name']}: {status} after {seconds / 60:.1f} min")
+        return dict(entry, status=status, exit_code=exit_code, seconds=round(seconds, 1))
+
+    def stop(self):
+        """Start no more jobs and terminate the running ones"""
+        self.stopping.set()
+        with self.lock:
+            running = list(self.processes.values())
+        for process in running:
+            process.terminate()
+
+    def run(self):
+        """Run every job; returns the summary entries in jobs-file order"""
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.run_job, job): job["name"] for job in self.jobs}
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    results[futures[future]] = future.result()
+            except KeyboardInterrupt:
+                print("Interrupted, stopping running jobs...")
+                self.stop()
+                for future, name in futures.items():
+                    results[name] = future.result()
+        summary = [results[job["name"]] for job in self.jobs]
+        with open(os.path.join(self.log_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate many accounts unattended, one ytmusic.py process per job")
+    parser.add_argument("jobs", help="JSON lines file with one job per line")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"jobs running at once (default: {DEFAULT_CONCURRENCY}, half the CPU cores)")
+    parser.add_argument("--log-dir", default=DEFAULT_LOG_DIR, help=f"where job logs and journals go (default: {DEFAULT_LOG_DIR})")
+    parser.add_argument("--resume", action="store_true", help="continue jobs from their journals where one exists")
+    parser.add_argument("--timeout", type=float, help="kill a job after this many seconds")
+    parser.add_argument("--spotify-rate", type=float, default=ytmusic.RATE_LIMITS["spotify"],
+                        help=f"most Spotify requests per second for all running jobs together (default: {ytmusic.RATE_LIMITS['spotify']})")
+    parser.add_argument("--ytmusic-rate", type=float, default=ytmusic.RATE_LIMITS["ytmusic"],
+                        help=f"most YouTube Music requests per second for all running jobs together (default: {ytmusic.RATE_LIMITS['ytmusic']})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        jobs = load_jobs(args.jobs)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not read jobs: {e}")
+        return 2
+    os.makedirs(args.log_dir, exist_ok=True)
+    print(f"Running {len(jobs)} jobs, {args.concurrency} at a time")
+    rates = {"spotify": args.spotify_rate, "ytmusic": args.ytmusic_rate}
+    summary = BatchRunner(jobs, args.log_dir, max(1, args.concurrency), args.resume, args.timeout, rates).run()
+    failed = [entry for entry in summary if entry["exit_code"] != 0]
+    print(f"\n{len(summary) - len(failed)}/{len(summary)} jobs succeeded; summary in {os.path.join(args.log_dir, 'summary.json')}")
+    for entry in failed:
+        print(f"- {entry['name']}: {entry['status']} (see {entry['log']})")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Offline throughput benchmark for the migration pipeline
+
+Starts mock_server.py, points ytmusic.py at it and runs the real extraction,
+playlist creation and track-adding functions in a headless Edge, so a change
+that slows the pipeline down shows up in numbers before it ships:
+
+    python benchmark.py --sizes 10,1000,10000 --latency 0.05
+
+For each playlist size it reports tracks per minute, WebDriver round trips per
+track, time in deliberate sleeps and p50/p95 latency per stage, all taken from
+ytmusic.Instrumentation spans (--metrics / --prometheus keep the raw data). Stages:
+
+    spotify   iter_spotify_playlist_tracks (or the API capture with --spotify-api),
+              latency per track between yields
+    create    PlaylistRegistry.ensure (the batch create endpoint, or the dialog with
+              --ui-create), latency per playlist
+    add       search_and_add_to_ytmusic_playlist through the Save dialog, per track
+              (only the first --add-limit tracks, since this path is slow)
+    resolve   resolve_ytmusic_tracks, per batch of RESOLVE_BATCH_SIZE
+    insert    add_videos_to_ytmusic_playlist, per batch of INSERT_BATCH_SIZE
+"""
+import argparse
+import json
+import math
+
+import ytmusic
+from mock_server import MockServer
+
+STAGES = ("spotify", "create", "add", "resolve", "insert")
+MIN_SIZE = 10
+MAX_SIZE = 10000
+# Requests per second allowed against the mock server, high enough that the rate limiter never waits
+BENCHMARK_RATE = 1000.0
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+class StageResult:
+    """Latencies, track count, round trips and sleeps of one stage, collected from spans"""
+
+    def __init__(self, stage, size):
+        self.stage = stage
+        self.size = size
+        self.latencies = []
+        self.tracks = 0
+        self.seconds = 0.0
+        self.round_trips = 0
+        self.sleep_seconds = 0.0
+        self.ok = 0
+
+    def add(self, span, latency=True):
+        """Account for one finished span; latency=False keeps it out of the percentiles"""
+        self.seconds += span["seconds"]
+        self.round_trips += span["commands"]
+        self.sleep_seconds += span["sleep_seconds"]
+        if latency:
+            self.latencies.append(span["seconds"])
+
+    def span(self, **fields):
+        return ytmusic.metrics.span(f"benchmark_{self.stage}", size=self.size, **fields)
+
+    def as_dict(self):
+        return {
+            "stage": self.stage,
+            "size": self.size,
+            "tracks": self.tracks,
+            "ok": self.ok,
+            "seconds": round(self.seconds, 3),
+            "tracks_per_minute": round(self.tracks / self.seconds * 60, 1) if self.seconds else 0.0,
+            "round_trips_per_track": round(self.round_trips / self.tracks, 2) if self.tracks else 0.0,
+            "sleep_seconds": round(self.sleep_seconds, 3),
+            "p50_ms": round(percentile(self.latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 0.95) * 1000, 1),
+        }
+
+def bench_spotify(driver, server, size, use_api):
+    """Harvest a synthetic playlist; returns (result, tracks)"""
+    result = StageResult("spotify", size)
+    url = server.url(f"/playlist/synthetic-{size}")
+    source = iter(ytmusic.iter_spotify_tracks_from_api(driver, url) if use_api else ytmusic.iter_spotify_playlist_tracks(driver, url))
+    tracks = []
+    while True:
+        with result.span(index=len(tracks)) as span:
+            track = next(source, None)
+        # The scrolling after the last track counts towards throughput but not the per-track latency
+        result.add(span, latency=track is not None)
+        if track is None:
+            break
+        tracks.append(track)
+    result.tracks = result.ok = len(tracks)
+    return result, tracks
+
+def bench_create(driver, size, count, ui=False):
+    """Create count playlists; returns (result, url and name of the last one)"""
+    result = StageResult("create", size)
+    registry = ytmusic.PlaylistRegistry(driver)
+    playlist_url = name = None
+    for i in range(count):
+        name = f"Benchmark {size} #{i + 1}"
+        with result.span(playlist=name) as span:
+            if ui:
+                playlist_url = ytmusic.create_ytmusic_playlist(driver, name)
+            else:
+                playlist_url = registry.ensure({"name": name, "url": f"benchmark:{size}:{i}"})
+        result.add(span)
+        if ytmusic.playlist_id_from_url(playlist_url):
+            result.ok += 1
+    result.tracks = count
+    return result, playlist_url, name
+
+def bench_add(driver, size, playlist_url, name, tracks):
+    """Add tracks one at a time through search and the Save dialog"""
+    result = StageResult("add", size)
+    for index, track in enumerate(tracks):
+        with result.span(index=index) as span:
+            added = ytmusic.search_and_add_to_ytmusic_playlist(driver, playlist_url, track, name)
+        result.add(span)
+        result.ok += 1 if added else 0
+    result.tracks = len(tracks)
+    return result
+
+def bench_resolve(driver, size, tracks):
+    """Resolve tracks in in-page search batches; returns (result, video IDs found)"""
+    result = StageResult("resolve", size)
+    video_ids = []
+    for start_index in range(0, len(tracks), ytmusic.RESOLVE_BATCH_SIZE):
+        batch = tracks[start_index:start_index + ytmusic.RESOLVE_BATCH_SIZE]
+        with result.span(tracks=len(batch)) as span:
+            matches = ytmusic.resolve_ytmusic_tracks(driver, batch)
+        result.add(span)
+        video_ids.extend(m["video_id"] for m in matches if m)
+    result.tracks = len(tracks)
+    result.ok = len(video_ids)
+    return result, video_ids
+
+def bench_insert(driver, size, playlist_url, video_ids):
+    """Insert video IDs into a playlist in batches"""
+    result = StageResult("insert", size)
+    playlist_id = ytmusic.playlist_id_from_url(playlist_url)
+    for start_index in range(0, len(video_ids), ytmusic.INSERT_BATCH_SIZE):
+        batch = video_ids[start_index:start_index + ytmusic.INSERT_BATCH_SIZE]
+        with result.span(tracks=len(batch)) as span:
+            added = ytmusic.add_videos_to_ytmusic_playlist(driver, playlist_id, batch)
+        result.add(span)
+        result.ok += sum(added)
+    result.tracks = len(video_ids)
+    return result
+
+def run_size(driver, server, size, args):
+    """Run the selected stages for one playlist size"""
+    results = []
+    tracks = []
+    if "spotify" in args.stages:
+        result, tracks = bench_spotify(driver, server, size, args.spotify_api)
+        results.append(result)
+    if not tracks:
+        # The YouTube Music stages can still run on generated tracks
+        tracks = [{"name": f"Track {i + 1}", "artists": f"Artist {i % 97}", "album": "", "duration": "2:30"}
+                  for i in range(size)]
+    playlist_url = name = None
+    if "create" in args.stages or {"add", "insert"} & set(args.stages):
+        result, playlist_url, name = bench_create(driver, size, max(1, args.creates), args.ui_create)
+        if "create" in args.stages:
+            results.append(result)
+    if "add" in args.stages and playlist_url:
+        results.append(bench_add(driver, size, playlist_url, name, tracks[:args.add_limit]))
+    video_ids = []
+    if "resolve" in args.stages or "insert" in args.stages:
+        result, video_ids = bench_resolve(driver, size, tracks)
+        if "resolve" in args.stages:
+            results.append(result)
+    if "insert" in args.stages and playlist_url:
+        results.append(bench_insert(driver, size, playlist_url, video_ids))
+    return results
+
+def print_report(rows):
+    header = (f"{'stage':<8} {'size':>6} {'tracks':>6} {'ok':>6} {'seconds':>8} {'tracks/min':>10} {'rt/track':>8} "
+              f"{'sleep s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['stage']:<8} {row['size']:>6} {row['tracks']:>6} {row['ok']:>6} {row['seconds']:>8.2f} "
+              f"{row['tracks_per_minute']:>10.1f} {row['round_trips_per_track']:>8.2f} {row['sleep_seconds']:>8.2f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f}")
+
+def playlist_size(value):
+    size = int(value)
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise argparse.ArgumentTypeError(f"playlist sizes must be between {MIN_SIZE} and {MAX_SIZE}")
+    return size
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the migration pipeline against a local mock server")
+    parser.add_argument("--sizes", default="10,100,1000",
+                        type=lambda value: [playlist_size(v) for v in value.split(",") if v],
+                        help=f"comma-separated playlist sizes ({MIN_SIZE}-{MAX_SIZE} tracks)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every mock server request")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        type=lambda value: [s for s in value.split(",") if s],
+                        help=f"comma-separated stages to run: {', '.join(STAGES)}")
+    parser.add_argument("--add-limit", type=int, default=25,
+                        help="tracks per size sent through the Save dialog in the add stage")
+    parser.add_argument("--creates", type=int, default=3, help="playlists created per size in the create stage")
+    parser.add_argument("--ui-create", action="store_true", help="create playlists through the New playlist dialog")
+    parser.add_argument("--spotify-api", action="store_true", help="benchmark the API capture instead of the DOM harvester")
+    parser.add_argument("--fixtures", help="directory of recorded playlist responses for the mock server")
+    parser.add_argument("--politeness", type=float, default=ytmusic.MIN_POLITENESS_DELAY,
+                        help="delay between user-facing actions (the real default unless overridden)")
+    parser.add_argument("--rate", type=float, default=BENCHMARK_RATE,
+                        help=f"requests per second allowed per service (default: {BENCHMARK_RATE:g}, i.e. unlimited; "
+                             f"pass the real limits, e.g. {ytmusic.RATE_LIMITS['ytmusic']:g}, to include the rate limiter)")
+    parser.add_argument("--lean", action="store_true", help="use the lean browser mode")
+    parser.add_argument("--show-browser", action="store_true", help="run the browser with a visible window")
+    parser.add_argument("--json", help="also write the results to this file as a JSON list")
+    parser.add_argument("--metrics", metavar="PATH", help="append every span to this JSON lines file")
+    parser.add_argument("--prometheus", metavar="PATH", help="write a Prometheus textfile with the totals here")
+    args = parser.parse_args(argv)
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = []
+    with MockServer(fixtures=args.fixtures, latency=args.latency) as server:
+        ytmusic.SPOTIFY_BASE_URL = server.url()
+        ytmusic.YTMUSIC_BASE_URL = server.url("/music")
+        ytmusic.TRACK_CACHE_PATH = None
+        ytmusic.strategies = ytmusic.SelectorRegistry()
+        ytmusic.artifacts = ytmusic.ArtifactRecorder("off")
+        ytmusic.waits = ytmusic.WaitEngine(politeness=args.politeness)
+        ytmusic.metrics = ytmusic.Instrumentation(args.metrics, args.prometheus)
+        for limiter in ytmusic.rate_limits.values():
+            limiter.configure(args.rate, burst=max(ytmusic.RATE_LIMIT_BURST, int(args.rate)))
+        driver = ytmusic.setup_driver(headless=not args.show_browser, capture_network=args.spotify_api, lean=args.lean)
+        ytmusic.metrics.wrap(driver, "benchmark")
+        try:
+            for size in args.sizes:
+                print(f"\n=== {size} tracks, {args.latency * 1000:.0f} ms latency ===")
+                rows.extend(result.as_dict() for result in run_size(driver, server, size, args))
+        finally:
+            driver.quit()
+            ytmusic.metrics.close()
+    print()
+    print_report(rows)
+    print(ytmusic.metrics.summary())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return rows
+
+if __name__ == "__main__":
+    main()
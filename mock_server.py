@@ -0,0 +1,554 @@
+"""Local stand-in for the Spotify and YouTube Music endpoints the migration talks to
+
+Serves recorded response fixtures (or synthetic playlists) so the API-based
+extraction and in-page search in ytmusic.py can be run without live accounts:
+
+    python mock_server.py --port 8765 --fixtures fixtures/
+
+Then point the extractor at http://127.0.0.1:8765/playlist/<id>. A playlist id
+of the form synthetic-<n> is generated on the fly with n tracks; any other id is
+loaded from <fixtures>/<id>.json as written by iter_spotify_tracks_from_api(record_to=...).
+/ytmusic is a page with a ytcfg object, /youtubei/v1/search answers searches
+with synthetic song results and /youtubei/v1/browse/edit_playlist records added
+videos, so resolve_ytmusic_tracks and add_videos_to_ytmusic_playlist can run
+against it.
+
+The playlist page renders a virtualized tracklist and /collection/playlists a
+virtualized library sidebar, and /music/ mirrors the YouTube Music pages the UI
+flow uses (library with New playlist, search with Save, watch page menu,
+playlist), so with ytmusic.SPOTIFY_BASE_URL set to the server and
+ytmusic.YTMUSIC_BASE_URL to its /music path the browser-driven functions run
+against it too (see benchmark.py).
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The web player sends these on every API call; requests without them are rejected
+MOCK_TOKEN = "Bearer mock-token"
+
+# Virtualized tracklist like the web player's: rows are fetched from the API in
+# pages as they scroll into view and only a window of them is kept in the DOM
+SPOTIFY_PLAYLIST_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Mock Spotify playlist</title>
+<style>
+    body { margin: 0; font-family: sans-serif; }
+    header { height: 120px; }
+    [data-testid="tracklist-row"] { display: flex; gap: 16px; height: 56px; align-items: center; }
+</style>
+</head>
+<body>
+<header><h1 id="title">Loading playlist...</h1></header>
+<div id="main" role="grid" aria-label="%(playlist_id)s">
+    <div role="row" aria-rowindex="1">Title</div>
+    <div id="rows" style="position: relative;"></div>
+</div>
+<script>
+    var ROW_HEIGHT = 56, HEADER = 120, OVERSCAN = 8, PAGE = 100;
+    var tracks = [], total = null, requested = {};
+
+    function query(offset, limit) {
+        var variables = {uri: "spotify:playlist:%(playlist_id)s", offset: offset, limit: limit};
+        return fetch("/pathfinder/v1/query?operationName=fetchPlaylist&variables=" +
+                     encodeURIComponent(JSON.stringify(variables)), {
+            headers: {"authorization": "%(token)s", "client-token": "mock-client-token"}
+        }).then(function(response) { return response.json(); }).then(function(payload) {
+            var playlist = payload.data.playlistV2;
+            if (total === null) {
+                total = playlist.content.totalCount;
+                document.getElementById("title").textContent = playlist.name;
+                document.getElementById("main").setAttribute("aria-rowcount", total + 1);
+                document.getElementById("rows").style.height = (total * ROW_HEIGHT) + "px";
+            }
+            playlist.content.items.forEach(function(item, i) { tracks[offset + i] = item.itemV2.data; });
+            render();
+        });
+    }
+    function duration(ms) {
+        var seconds = Math.round(ms / 1000);
+        return Math.floor(seconds / 60) + ":" + ("0" + seconds %% 60).slice(-2);
+    }
+    function escape(text) {
+        var node = document.createElement("span");
+        node.textContent = text;
+        return node.innerHTML;
+    }
+    function row(index, track) {
+        var id = track.uri.split(":").pop();
+        var artists = track.artists.items.map(function(artist) {
+            return '<span data-testid="tracklist-row-artists-album-artist-link"><a href="/artist/' +
+                   escape(artist.profile.name).replace(/ /g, "") + '">' + escape(artist.profile.name) + '</a></span>';
+        }).join(", ");
+        return '<div role="row" aria-rowindex="' + (index + 2) + '" style="position: absolute; top: ' +
+               (index * ROW_HEIGHT) + 'px; height: ' + ROW_HEIGHT + 'px;">' +
+               '<div data-testid="tracklist-row">' +
+               '<div><a data-testid="internal-track-link" href="/track/' + id + '"><div>' + escape(track.name) + '</div></a>' +
+               artists + '</div>' +
+               '<div><a href="/album/' + id + '">' + escape(track.albumOfTrack.name) + '</a></div>' +
+               '<div>' + duration(track.trackDuration.totalMilliseconds) + '</div>' +
+               '</div></div>';
+    }
+    function render() {
+        if (total === null) return;
+        var top = window.scrollY - HEADER;
+        var first = Math.max(0, Math.floor(top / ROW_HEIGHT) - OVERSCAN);
+        var last = Math.min(total - 1, Math.floor((top + window.innerHeight) / ROW_HEIGHT) + OVERSCAN);
+        for (var page = Math.floor(first / PAGE); page <= Math.floor(last / PAGE); page++) {
+            if (!requested[page]) {
+                requested[page] = true;
+                query(page * PAGE, PAGE);
+            }
+        }
+        var html = [];
+        for (var i = first; i <= last; i++) {
+            if (tracks[i]) html.push(row(i, tracks[i]));
+        }
+        document.getElementById("rows").innerHTML = html.join("");
+    }
+    window.addEventListener("scroll", render);
+    // The first request looks like the web player's initial playlist fetch
+    query(0, 25);
+</script>
+</body>
+</html>
+"""
+
+# The sidebar scrolls on its own and, like the real one, only renders the rows near its viewport
+SPOTIFY_LIBRARY_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Mock Spotify library</title>
+<style>
+    body { margin: 0; font-family: sans-serif; }
+    #library { height: 600px; overflow-y: auto; }
+    [role="row"] { display: flex; flex-direction: column; gap: 4px; }
+</style>
+</head>
+<body>
+<div id="library" aria-label="Your Library" aria-rowcount="%(count)d">
+    <div id="rows" style="position: relative;"></div>
+</div>
+<script>
+    var ROW_HEIGHT = 48, OVERSCAN = 4;
+    var entries = %(entries)s;
+    var library = document.getElementById("library");
+    document.getElementById("rows").style.height = (entries.length * ROW_HEIGHT) + "px";
+
+    function escape(text) {
+        var node = document.createElement("span");
+        node.textContent = text;
+        return node.innerHTML;
+    }
+    function render() {
+        var first = Math.max(0, Math.floor(library.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        var last = Math.min(entries.length - 1, Math.floor((library.scrollTop + library.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+        var html = [];
+        for (var i = first; i <= last; i++) {
+            var uri = "spotify:playlist:" + entries[i].id;
+            html.push('<div role="row" aria-rowindex="' + (i + 1) + '" style="position: absolute; top: ' +
+                      (i * ROW_HEIGHT) + 'px; height: ' + ROW_HEIGHT + 'px;">' +
+                      '<span id="listrow-title-' + uri + '">' + escape(entries[i].name) + '</span>' +
+                      '<span id="listrow-subtitle-' + uri + '">' + escape(entries[i].subtitle) + '</span></div>');
+        }
+        document.getElementById("rows").innerHTML = html.join("");
+    }
+    library.addEventListener("scroll", render);
+    render();
+</script>
+</body>
+</html>
+"""
+
+# Every YouTube Music page shares the ytcfg object and the Save/New playlist dialogs
+YTMUSIC_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Mock YouTube Music</title></head>
+<body>
+<ytmusic-app>
+<button aria-label="Account">Account</button>
+%(body)s
+</ytmusic-app>
+<script>
+    window.ytcfg = {
+        data_: {
+            INNERTUBE_API_KEY: "mock-key",
+            INNERTUBE_CONTEXT: {client: {clientName: "WEB_REMIX", clientVersion: "1.0"}}
+        },
+        get: function(key) { return this.data_[key]; }
+    };
+    // Newest first, like the Save dialog lists them
+    var playlists = %(playlists)s;
+
+    function post(path, payload) {
+        return fetch(path, {method: "POST", headers: {"Content-Type": "application/json"},
+                            body: JSON.stringify(payload)})
+            .then(function(response) { return response.json(); });
+    }
+    function add(tag, parent, html) {
+        var node = document.createElement(tag);
+        if (html) node.innerHTML = html;
+        (parent || document.body).appendChild(node);
+        return node;
+    }
+    function openSaveDialog(videoId) {
+        var old = document.querySelector("tp-yt-paper-dialog");
+        if (old) old.remove();
+        var dialog = add("tp-yt-paper-dialog");
+        var renderer = add("ytmusic-add-to-playlist-renderer", dialog);
+        playlists.forEach(function(playlist) {
+            var option = add("ytmusic-playlist-add-to-option-renderer", renderer,
+                             '<button><yt-formatted-string class="title"></yt-formatted-string></button>');
+            option.querySelector(".title").textContent = playlist.title;
+            // Polymer data, as the real option renderer carries it
+            option.data = {addToPlaylistServiceEndpoint: {playlistEditEndpoint: {playlistId: playlist.id}}};
+            option.addEventListener("click", function() {
+                dialog.remove();
+                post("/youtubei/v1/browse/edit_playlist", {
+                    playlistId: playlist.id,
+                    actions: [{action: "ACTION_ADD_VIDEO", addedVideoId: videoId}]
+                }).then(function() {
+                    add("tp-yt-paper-toast").setAttribute("opened", "");
+                });
+            });
+        });
+    }
+    function openPlayerMenu(videoId) {
+        var popup = add("ytmusic-menu-popup-renderer");
+        var item = add("ytmusic-menu-navigation-item-renderer", popup, "<a>Save to playlist</a>");
+        item.addEventListener("click", function() {
+            popup.remove();
+            openSaveDialog(videoId);
+        });
+    }
+    function openCreateDialog() {
+        var dialog = add("tp-yt-paper-dialog", null,
+                         '<div id="title-input"><input type="text"></div>' +
+                         '<div id="create-button"><button>Create</button></div>');
+        dialog.querySelector("#create-button button").addEventListener("click", function() {
+            post("/youtubei/v1/playlist/create", {title: dialog.querySelector("input").value})
+                .then(function(response) { location.href = "/music/playlist?list=" + response.playlistId; });
+        });
+    }
+</script>
+</body>
+</html>
+"""
+
+def synthetic_playlist(playlist_id, size):
+    """Build a playlist API response with `size` generated tracks"""
+    items = []
+    prefix = re.sub(r"[^A-Za-z0-9]", "", playlist_id)
+    for i in range(size):
+        items.append({
+            "itemV2": {
+                "data": {
+                    "__typename": "Track",
+                    "name": f"Track {i + 1}",
+                    "uri": f"spotify:track:{prefix}{i:05d}",
+                    "artists": {"items": [{"profile": {"name": f"Artist {i % 97}"}}]},
+                    "albumOfTrack": {"name": f"Album {i % 31}"},
+                    "trackDuration": {"totalMilliseconds": 150000 + (i * 7919) % 120000},
+                }
+            }
+        })
+    return {"data": {"playlistV2": {"name": playlist_id, "content": {"items": items, "totalCount": size}}}}
+
+def load_playlist(fixtures, playlist_id):
+    """Return the full response for playlist_id, or None if there is no fixture"""
+    if playlist_id.startswith("synthetic-"):
+        try:
+            return synthetic_playlist(playlist_id, int(playlist_id.split("-", 1)[1]))
+        except ValueError:
+            return None
+    path = os.path.join(fixtures or "", f"{playlist_id}.json")
+    if not fixtures or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def video_id_for(text):
+    """Stable 11-character video ID derived from text"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:11]
+
+def song_result(video_id, title, artist, duration):
+    """One musicResponsiveListItemRenderer shaped like a real songs search result"""
+    return {
+        "musicResponsiveListItemRenderer": {
+            "playlistItemData": {"videoId": video_id},
+            "flexColumns": [
+                {"musicResponsiveListItemFlexColumnRenderer": {"text": {"runs": [{"text": title}]}}},
+                {"musicResponsiveListItemFlexColumnRenderer": {"text": {"runs": [
+                    {"text": artist, "navigationEndpoint": {"browseEndpoint": {
+                        "browseEndpointContextSupportedConfigs": {
+                            "browseEndpointContextMusicConfig": {"pageType": "MUSIC_PAGE_TYPE_ARTIST"}
+                        }
+                    }}},
+                    {"text": " • "},
+                    {"text": duration},
+                ]}}},
+            ],
+        }
+    }
+
+def synthetic_search(query):
+    """Search response whose best match is not the first result, like real searches often are"""
+    words = query.split()
+    title = " ".join(words[:2]) if len(words) >= 2 else query
+    artist = " ".join(words[2:]) or "Unknown Artist"
+    results = [
+        song_result(video_id_for("cover " + query), f"{title} (Cover)", "Cover Band", "3:01"),
+        song_result(video_id_for(query), title, artist, "2:30"),
+        song_result(video_id_for("live " + query), f"{title} (Live)", artist, "4:12"),
+    ]
+    return {"contents": {"tabbedSearchResultsRenderer": {"tabs": [{"tabRenderer": {"content": {
+        "sectionListRenderer": {"contents": [{"musicShelfRenderer": {"contents": results}}]}
+    }}}]}}}
+
+def ytmusic_page(server, body=""):
+    """A YouTube Music page around body, listing the mock library's playlists newest first"""
+    with server.lock:
+        playlists = [{"id": playlist_id, "title": title} for playlist_id, title in reversed(server.titles.items())]
+    return YTMUSIC_PAGE % {"body": body, "playlists": json.dumps(playlists)}
+
+def search_page(server, query):
+    """Search results page: the first result as the top result card, the rest as a shelf"""
+    results = []
+    for item in synthetic_search(query)["contents"]["tabbedSearchResultsRenderer"]["tabs"][0]["tabRenderer"][
+            "content"]["sectionListRenderer"]["contents"][0]["musicShelfRenderer"]["contents"]:
+        renderer = item["musicResponsiveListItemRenderer"]
+        columns = [c["musicResponsiveListItemFlexColumnRenderer"]["text"]["runs"] for c in renderer["flexColumns"]]
+        results.append((renderer["playlistItemData"]["videoId"], columns[0][0]["text"],
+                        columns[1][0]["text"], columns[1][-1]["text"]))
+    with server.lock:
+        for video_id, title, artist, _ in results:
+            server.videos[video_id] = (title, artist)
+    video_id, title, artist, duration = [html.escape(str(v)) for v in results[0]]
+    top = (f'<ytmusic-card-shelf-renderer><a class="title" href="/music/watch?v={video_id}">{title}</a>'
+           f'<div class="subtitle">Song • {artist} • {duration}</div>'
+           f'<div id="actions"><button aria-label="Save to playlist" onclick="openSaveDialog(\'{video_id}\')">'
+           f'Save</button></div></ytmusic-card-shelf-renderer>')
+    rows = "".join(
+        f'<ytmusic-responsive-list-item-renderer><a class="title" href="/music/watch?v={html.escape(v)}">'
+        f'{html.escape(t)}</a><div class="secondary-flex-columns">{html.escape(a)}</div>'
+        f'</ytmusic-responsive-list-item-renderer>'
+        for v, t, a, _ in results[1:]
+    )
+    return ytmusic_page(server, top + f"<ytmusic-shelf-renderer>{rows}</ytmusic-shelf-renderer>")
+
+def watch_page(server, video_id):
+    video_id = html.escape(video_id)
+    return ytmusic_page(server, (
+        f'<ytmusic-player-bar><ytmusic-menu-renderer><button aria-label="Action menu" '
+        f'onclick="openPlayerMenu(\'{video_id}\')">...</button></ytmusic-menu-renderer></ytmusic-player-bar>'
+    ))
+
+def library_page(server):
+    with server.lock:
+        titles = list(reversed(server.titles.items()))
+    items = "".join(
+        f'<ytmusic-two-row-item-renderer><a href="/music/playlist?list={html.escape(playlist_id)}">'
+        f'<yt-formatted-string class="title">{html.escape(title)}</yt-formatted-string></a>'
+        f'</ytmusic-two-row-item-renderer>'
+        for playlist_id, title in titles
+    )
+    return ytmusic_page(server, f'<button aria-label="New playlist" onclick="openCreateDialog()">New playlist</button>{items}')
+
+def playlist_page(server, playlist_id):
+    with server.lock:
+        title = server.titles.get(playlist_id, playlist_id)
+        videos = [(v, *server.videos.get(v, (v, ""))) for v in server.playlists.get(playlist_id, [])]
+    rows = "".join(
+        f'<ytmusic-responsive-list-item-renderer><div class="title-column"><a href="/music/watch?v={html.escape(v)}">'
+        f'<yt-formatted-string class="title">{html.escape(t)}</yt-formatted-string></a></div>'
+        f'<div class="secondary-flex-columns"><yt-formatted-string>{html.escape(a)}</yt-formatted-string></div>'
+        f'</ytmusic-responsive-list-item-renderer>'
+        for v, t, a in videos
+    )
+    return ytmusic_page(server, f"<h1>{html.escape(title)}</h1><ytmusic-playlist-shelf-renderer>{rows}</ytmusic-playlist-shelf-renderer>")
+
+def spotify_library_page(server):
+    entries = []
+    for playlist_id in server.library:
+        payload = load_playlist(server.fixtures, playlist_id)
+        if payload is None:
+            continue
+        playlist = payload["data"]["playlistV2"]
+        entries.append({
+            "id": playlist_id,
+            "name": playlist.get("name") or playlist_id,
+            "subtitle": f"Playlist • Mock • {playlist['content']['totalCount']} songs",
+        })
+    # Keep the JSON from closing the script element
+    data = json.dumps(entries).replace("</", "<\\/")
+    return SPOTIFY_LIBRARY_PAGE % {"count": len(entries), "entries": data}
+
+def page_of(payload, offset, limit):
+    """Cut one page out of a full playlist response, keeping its envelope"""
+    page = json.loads(json.dumps(payload))
+    content = page["data"]["playlistV2"]["content"]
+    content["items"] = content["items"][offset:offset + limit]
+    return page
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Routes requests to the mock pages and API endpoints"""
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.handle_request(None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.handle_request(self.rfile.read(length).decode("utf-8") if length else "")
+
+    def handle_request(self, body):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parts = urllib.parse.urlsplit(self.path)
+        if parts.path.startswith("/playlist/"):
+            playlist_id = parts.path.rsplit("/", 1)[-1]
+            page = SPOTIFY_PLAYLIST_PAGE % {"playlist_id": playlist_id, "token": MOCK_TOKEN}
+            return self.send_body(200, page, "text/html; charset=utf-8")
+        if parts.path == "/collection/playlists":
+            return self.send_body(200, spotify_library_page(self.server), "text/html; charset=utf-8")
+        if parts.path.startswith("/pathfinder/"):
+            return self.spotify_query(parts, body)
+        if parts.path == "/ytmusic":
+            return self.send_body(200, ytmusic_page(self.server), "text/html; charset=utf-8")
+        if parts.path == "/music" or parts.path.startswith("/music/"):
+            return self.ytmusic_route(parts.path[len("/music"):] or "/", urllib.parse.parse_qs(parts.query))
+        if parts.path == "/youtubei/v1/search" and body is not None:
+            query = json.loads(body or "{}").get("query", "")
+            return self.send_body(200, json.dumps(synthetic_search(query)))
+        if parts.path == "/youtubei/v1/browse/edit_playlist" and body is not None:
+            return self.edit_playlist(json.loads(body or "{}"))
+        if parts.path == "/youtubei/v1/playlist/create" and body is not None:
+            return self.create_playlist(json.loads(body or "{}"))
+        self.send_body(404, json.dumps({"error": "not found"}))
+
+    def ytmusic_route(self, path, query):
+        """YouTube Music web pages, served under /music"""
+        if path == "/":
+            page = ytmusic_page(self.server)
+        elif path == "/search":
+            page = search_page(self.server, query.get("q", [""])[0])
+        elif path == "/watch":
+            page = watch_page(self.server, query.get("v", [""])[0])
+        elif path == "/library/playlists":
+            page = library_page(self.server)
+        elif path == "/playlist":
+            page = playlist_page(self.server, query.get("list", [""])[0])
+        else:
+            return self.send_body(404, json.dumps({"error": "not found"}))
+        self.send_body(200, page, "text/html; charset=utf-8")
+
+    def create_playlist(self, request):
+        with self.server.lock:
+            playlist_id = f"PLmock{len(self.server.titles) + 1:04d}"
+            self.server.titles[playlist_id] = request.get("title") or "Untitled"
+            self.server.playlists.setdefault(playlist_id, [])
+        self.send_body(200, json.dumps({"playlistId": playlist_id}))
+
+    def edit_playlist(self, request):
+        video_ids = [a["addedVideoId"] for a in request.get("actions", []) if a.get("action") == "ACTION_ADD_VIDEO"]
+        # Like the real endpoint, one unknown video fails the whole edit
+        if not all(re.fullmatch(r"[A-Za-z0-9_-]{11}", v or "") for v in video_ids):
+            self.send_body(200, json.dumps({"status": "STATUS_FAILED"}))
+            return
+        with self.server.lock:
+            self.server.playlists.setdefault(request.get("playlistId"), []).extend(video_ids)
+        results = [{"playlistEditVideoAddedResultData": {"videoId": v, "setVideoId": f"set-{v}"}} for v in video_ids]
+        self.send_body(200, json.dumps({"status": "STATUS_SUCCEEDED", "playlistEditResults": results}))
+
+    def spotify_query(self, parts, body):
+        if self.headers.get("authorization") != MOCK_TOKEN:
+            return self.send_body(401, json.dumps({"error": "missing token"}))
+        if body:
+            variables = json.loads(body).get("variables", {})
+        else:
+            query = urllib.parse.parse_qs(parts.query)
+            variables = json.loads(query.get("variables", ["{}"])[0])
+        playlist_id = variables.get("uri", "").split(":")[-1]
+        payload = load_playlist(self.server.fixtures, playlist_id)
+        if payload is None:
+            return self.send_body(404, json.dumps({"error": f"no fixture for {playlist_id}"}))
+        page = page_of(payload, int(variables.get("offset", 0)), int(variables.get("limit", 25)))
+        self.send_body(200, json.dumps(page))
+
+class MockServer:
+    """Run the stand-in server on a background thread"""
+
+    def __init__(self, port=0, fixtures=None, latency=0.0, verbose=False, handler=MockHandler, library=()):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.fixtures = fixtures
+        self.httpd.latency = latency
+        self.httpd.verbose = verbose
+        # Spotify playlist IDs listed on /collection/playlists
+        self.httpd.library = list(library)
+        # YouTube Music side: videos added through edit_playlist and playlist titles, by playlist ID
+        self.httpd.playlists = {}
+        self.httpd.titles = {}
+        # Titles and artists of videos that have appeared in search results, by video ID
+        self.httpd.videos = {}
+        self.httpd.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def url(self, path=""):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded Spotify and YouTube Music responses locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="directory of recorded <playlist-id>.json responses")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of delay added to every request")
+    parser.add_argument("--library", default="synthetic-250",
+                        help="comma-separated playlist IDs listed in the Spotify library page")
+    args = parser.parse_args()
+    server = MockServer(args.port, args.fixtures, args.latency, verbose=True,
+                        library=[p for p in args.library.split(",") if p])
+    print(f"Serving on {server.url()} (try {server.url('/playlist/synthetic-250')})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
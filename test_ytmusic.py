@@ -0,0 +1,28 @@
+import ytmusic
+
+
+def playlist_diff(monkeypatch, tracks, cached=None):
+    class Cache:
+        def get(self, track):
+            return cached.get(track["artists"]) if cached else None
+
+    monkeypatch.setattr(ytmusic, "get_track_cache", lambda: Cache())
+    return ytmusic.PlaylistDiff(tracks)
+
+
+def test_sync_keeps_songs_that_only_share_a_title(monkeypatch):
+    diff = playlist_diff(monkeypatch, [{"name": "Intro", "artists": "The xx • xx • 2:07", "video_id": "xxintro0001"}])
+    assert not diff.claim({"name": "Intro", "artists": "M83"})
+    assert diff.claim({"name": "Intro", "artists": "The xx"})
+    assert not diff.claim({"name": "Intro", "artists": "The xx"})
+
+
+def test_sync_claims_cached_video_once(monkeypatch):
+    tracks = [
+        {"name": "Intro", "artists": "M83", "video_id": "m83intro001"},
+        {"name": "Intro", "artists": "The xx", "video_id": "xxintro0001"},
+    ]
+    diff = playlist_diff(monkeypatch, tracks, cached={"M83": {"video_id": "m83intro001"}})
+    assert diff.claim({"name": "Intro", "artists": "M83"})
+    assert diff.claim({"name": "Intro", "artists": "The xx"})
+    assert not diff.claim({"name": "Intro", "artists": "M83"})
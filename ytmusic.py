@@ -5,16 +5,1016 @@ from selenium.webdriver.edge.service import Service as EdgeService
 from webdriver_manager.microsoft import EdgeChromiumDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import SessionNotCreatedException
 import time
 import json
 import os
+import re
+import argparse
+import csv
+import difflib
+import collections
+import itertools
+import sqlite3
+import unicodedata
+import urllib.parse
+import queue
+import threading
+import sys
+import fnmatch
+import gzip
+import io
+import zipfile
+import zlib
+import shutil
+import subprocess
+from contextlib import contextmanager, nullcontext
+try:
+    import psutil  # Optional: resident memory in the worker memory report
+except ImportError:
+    psutil = None
 
-def setup_driver(headless=False):
-    """Set up and return an Edge webdriver with anti-detection measures"""
+# Site roots; the benchmark points these at mock_server.py
+SPOTIFY_BASE_URL = "https://open.spotify.com"
+YTMUSIC_BASE_URL = "https://music.youtube.com"
+
+# Minimum pause between user-facing actions so we never hammer either service
+MIN_POLITENESS_DELAY = 0.5
+
+# Per-condition timeouts (seconds) used by the wait engine
+DEFAULT_WAIT_TIMEOUTS = {
+    "page_ready": 20,
+    "spotify_playlists": 20,
+    "spotify_tracklist": 20,
+    "scroll_growth": 3,
+    "tracklist_scroll": 3,
+    "library_scroll": 3,
+    "spotify_api": 20,
+    "ytmusic_app": 15,
+    "ytmusic_library": 10,
+    "create_dialog": 5,
+    "playlist_created": 10,
+    "search_results": 10,
+    "playlist_dialog": 5,
+    "save_confirmation": 2,
+    "player_menu": 10,
+    "ytmusic_playlist": 15,
+    "login_state": 20,
+}
+
+class WaitEngine:
+    """Wait on DOM conditions instead of sleeping for fixed amounts of time"""
+
+    MIN_POLL = 0.05
+    MAX_POLL = 1.0
+    DEFAULT_POLL = 0.25
+
+    def __init__(self, politeness=MIN_POLITENESS_DELAY, timeouts=None):
+        self.politeness = politeness
+        self.timeouts = dict(DEFAULT_WAIT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        # Exponentially weighted average of how long each condition took to become true
+        self.latencies = {}
+        self.lock = threading.Lock()
+
+    def poll_interval(self, name):
+        """Start polling at a fraction of the latency we usually observe for this condition"""
+        with self.lock:
+            expected = self.latencies.get(name)
+        if expected is None:
+            return self.DEFAULT_POLL
+        return min(max(expected / 4, self.MIN_POLL), self.MAX_POLL)
+
+    def record(self, name, elapsed):
+        with self.lock:
+            previous = self.latencies.get(name)
+            self.latencies[name] = elapsed if previous is None else 0.7 * previous + 0.3 * elapsed
+
+    def until(self, driver, name, condition, timeout=None):
+        """Poll condition(driver) until it returns something truthy; return None on timeout"""
+        if timeout is None:
+            timeout = self.timeouts.get(name, 10)
+        start = time.monotonic()
+        interval = self.poll_interval(name)
+        while True:
+            try:
+                result = condition(driver)
+            except Exception:
+                result = None
+            elapsed = time.monotonic() - start
+            if result:
+                self.record(name, elapsed)
+                metrics.waited(name, elapsed)
+                return result
+            if elapsed >= timeout:
+                # Learn from timeouts too so we poll less eagerly next time
+                self.record(name, timeout)
+                metrics.waited(name, elapsed, timed_out=True)
+                return None
+            time.sleep(min(interval, timeout - elapsed))
+            interval = min(interval * 1.5, self.MAX_POLL)
+
+    def polite(self, seconds=0):
+        """Sleep for at least the configured politeness delay"""
+        metrics.sleep("polite", max(seconds, self.politeness))
+
+# Shared wait engine used by every scraping and migration function
+waits = WaitEngine()
+
+def document_ready(driver):
+    return driver.execute_script("return document.readyState") == "complete"
+
+def css_present(selector):
+    """Condition: at least one element matches the CSS selector"""
+    return lambda driver: driver.execute_script("return document.querySelector(arguments[0]) !== null", selector)
+
+def url_matches(*fragments):
+    """Condition: the current URL contains any of the fragments"""
+    return lambda driver: any(fragment in driver.current_url for fragment in fragments)
+
+def scroll_height_changed(last_height):
+    """Condition: the document grew after a scroll, returns the new height"""
+    def condition(driver):
+        height = driver.execute_script("return document.body.scrollHeight")
+        return height if height != last_height else None
+    return condition
+
+def count_settled(selector, quiet_period=0.75, minimum=1):
+    """Condition: the number of elements matching selector stopped changing for quiet_period seconds"""
+    state = {"count": -1, "since": time.monotonic()}
+    def condition(driver):
+        count = driver.execute_script("return document.querySelectorAll(arguments[0]).length", selector)
+        now = time.monotonic()
+        if count != state["count"]:
+            state["count"] = count
+            state["since"] = now
+            return None
+        if count >= minimum and now - state["since"] >= quiet_period:
+            return count
+        return None
+    return condition
+
+# Which selector strategy found each logical element last time (None keeps rankings in memory only)
+SELECTOR_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "selector_cache.json")
+SELECTOR_CACHE_VERSION = 1
+# Times in a row another strategy has to find an element before a learned one is forgotten
+SELECTOR_MISS_LIMIT = 3
+
+class SelectorRegistry:
+    """Learn which of several fallback selectors finds each logical element
+
+    order() puts the strategies that found an element before first, most hits
+    first, so the chains stop early. When another strategy finds the element, the
+    ones ranked above it count a miss, and after SELECTOR_MISS_LIMIT misses in a
+    row a strategy is dropped and relearned. Rankings are saved as JSON so later
+    runs start with them.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        # element -> {strategy: [hits, misses in a row]}
+        self.rankings = None
+        self.dirty = False
+
+    def _load(self):
+        if self.rankings is None:
+            self.rankings = {}
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == SELECTOR_CACHE_VERSION:
+                    self.rankings = data.get("elements") or {}
+            except (OSError, TypeError, ValueError, AttributeError):
+                pass
+        return self.rankings
+
+    def order(self, element, candidates):
+        """candidates with the learned strategies first"""
+        with self.lock:
+            ranked = dict(self._load().get(element, {}))
+        learned = sorted((c for c in candidates if c in ranked), key=lambda c: -ranked[c][0])
+        return learned + [c for c in candidates if c not in ranked]
+
+    def record(self, element, winner):
+        """Note that winner found element; a falsy winner (nothing found) teaches nothing"""
+        if not winner:
+            return
+        with self.lock:
+            ranked = self._load().setdefault(element, {})
+            tried = sorted(ranked, key=lambda s: -ranked[s][0])
+            for strategy in tried[:tried.index(winner)] if winner in ranked else tried:
+                ranked[strategy][1] += 1
+                if ranked[strategy][1] >= SELECTOR_MISS_LIMIT:
+                    del ranked[strategy]
+                    print(f"⚠️ Learned selector for {element} stopped matching, relearning: {strategy}")
+            entry = ranked.setdefault(winner, [0, 0])
+            entry[0] += 1
+            entry[1] = 0
+            self.dirty = True
+
+    def save(self):
+        """Write the rankings if anything was learned since the last save"""
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            text = json.dumps({"version": SELECTOR_CACHE_VERSION, "elements": self.rankings}, indent=1)
+            self.dirty = False
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not save selector rankings to {self.path}: {e}")
+
+# Shared selector rankings; main() points them at --selector-cache
+strategies = SelectorRegistry()
+
+# Returns the first XPath of arguments[0] that matches anything, or null
+FIRST_XPATH_JS = """
+    var expressions = arguments[0];
+    for (var i = 0; i < expressions.length; i++) {
+        if (xpathFirst(expressions[i])) return expressions[i];
+    }
+    return null;
+"""
+
+def learned_xpath_present(element, xpaths):
+    """Condition: one of xpaths matches, trying the learned one first; returns the XPath that did"""
+    def condition(driver):
+        winner = driver.execute_script(XPATH_HELPERS_JS + FIRST_XPATH_JS, strategies.order(element, xpaths))
+        strategies.record(element, winner)
+        return winner
+    return condition
+
+# Where debug screenshots and page snapshots are written
+ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug")
+ARTIFACT_LEVELS = ("off", "failure", "sampled", "always")
+
+class ArtifactRecorder:
+    """Debug screenshots and page snapshots, kept off the hot path
+
+    Levels:
+      off      - nothing is captured
+      failure  - checkpoints only note the URL and title in a ring buffer; a
+                 screenshot, the page source and the buffered history are written
+                 when something fails
+      sampled  - like failure, plus a screenshot of every sample_every-th checkpoint
+      always   - a screenshot at every checkpoint
+    Files get unique names and are written by a background thread.
+    """
+
+    def __init__(self, level="failure", directory=ARTIFACT_DIR, history=25, sample_every=20):
+        if level not in ARTIFACT_LEVELS:
+            raise ValueError(f"artifact level must be one of {', '.join(ARTIFACT_LEVELS)}")
+        self.level = level
+        self.directory = directory
+        self.history = collections.deque(maxlen=history)
+        self.sample_every = sample_every
+        self.counter = itertools.count(1)
+        self.sequence = itertools.count()
+        self.writes = queue.Queue()
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def _filename(self, label, extension):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        safe = re.sub(r"[^\w.-]+", "_", label)
+        return os.path.join(self.directory, f"{stamp}-{next(self.counter):05d}-{safe}.{extension}")
+
+    def _write(self, path, data):
+        with self.lock:
+            if self.writer is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.writer = threading.Thread(target=self._write_loop, name="artifact-writer", daemon=True)
+                self.writer.start()
+        self.writes.put((path, data))
+
+    def _write_loop(self):
+        while True:
+            path, data = self.writes.get()
+            try:
+                mode = "wb" if isinstance(data, bytes) else "w"
+                with open(path, mode, **({} if mode == "wb" else {"encoding": "utf-8"})) as f:
+                    f.write(data)
+            except Exception as e:
+                print(f"DEBUG: Could not write {path}: {e}")
+            finally:
+                self.writes.task_done()
+
+    def checkpoint(self, driver, label):
+        """Record the current page state on the hot path"""
+        if self.level == "off":
+            return
+        try:
+            url, title = driver.execute_script("return [location.href, document.title]")
+        except Exception:
+            url, title = None, None
+        sequence = next(self.sequence)
+        self.history.append({"sequence": sequence, "time": time.time(), "label": label, "url": url,
+                             "title": title, "thread": threading.current_thread().name})
+        if self.level == "always" or (self.level == "sampled" and sequence % self.sample_every == 0):
+            try:
+                self._write(self._filename(label, "png"), driver.get_screenshot_as_png())
+            except Exception:
+                pass
+
+    def failure(self, driver, label, error=None):
+        """Write a screenshot, the page source and the recent history after something went wrong"""
+        if self.level == "off":
+            return None
+        screenshot_path = self._filename(label, "png")
+        try:
+            self._write(screenshot_path, driver.get_screenshot_as_png())
+            self._write(self._filename(label, "html"), driver.page_source)
+        except Exception as e:
+            print(f"DEBUG: Could not capture page state: {e}")
+        history = {"label": label, "error": str(error) if error else None, "history": list(self.history)}
+        self._write(self._filename(label, "json"), json.dumps(history, indent=2, default=str))
+        print(f"DEBUG: Debug artifacts for {label} saved under {self.directory}")
+        return screenshot_path
+
+    def flush(self):
+        """Wait until every queued artifact has been written"""
+        if self.writer is not None:
+            self.writes.join()
+
+# Shared recorder used instead of writing screenshots inline
+artifacts = ArtifactRecorder()
+
+# Instrumentation: histogram buckets (seconds) for stage spans
+SPAN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def prometheus_labels(**labels):
+    """Format labels for the Prometheus text format"""
+    escaped = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+class Instrumentation:
+    """Count and time WebDriver commands, sleeps, waits and per-track stage spans
+
+    Finished spans are appended to a JSON lines file, and the totals are written
+    to a Prometheus textfile every export_interval seconds and on close, so long
+    runs can be graphed (e.g. with node_exporter's textfile collector).
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, export_interval=15.0):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.export_interval = export_interval
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # (driver label, command) -> [count, seconds]
+        self.commands = collections.defaultdict(lambda: [0, 0.0])
+        # sleep kind -> [count, seconds]
+        self.sleeps = collections.defaultdict(lambda: [0, 0.0])
+        # wait condition -> [count, seconds, timeouts]
+        self.waits = collections.defaultdict(lambda: [0, 0.0, 0])
+        # stage -> [count, seconds, per-bucket counts]
+        self.stages = collections.defaultdict(lambda: [0, 0.0, [0] * len(SPAN_BUCKETS)])
+        self.events = collections.Counter()
+        self.file = None
+        self.last_export = time.monotonic()
+
+    def _thread_totals(self):
+        """Commands, command seconds and sleep seconds issued by the current thread"""
+        totals = getattr(self.local, "totals", None)
+        if totals is None:
+            totals = self.local.totals = [0, 0.0, 0.0]
+        return totals
+
+    def wrap(self, driver, label):
+        """Count and time every WebDriver command sent through driver"""
+        original = driver.execute
+        def execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                return original(driver_command, params)
+            finally:
+                self.command(label, driver_command, time.perf_counter() - start)
+        driver.execute = execute
+        return driver
+
+    def command(self, label, name, seconds):
+        totals = self._thread_totals()
+        totals[0] += 1
+        totals[1] += seconds
+        with self.lock:
+            entry = self.commands[(label, name)]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def sleep(self, kind, seconds):
+        """Sleep deliberately, keeping the time apart from time spent working"""
+        if seconds <= 0:
+            return
+        time.sleep(seconds)
+        self._thread_totals()[2] += seconds
+        with self.lock:
+            entry = self.sleeps[kind]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def waited(self, name, seconds, timed_out=False):
+        with self.lock:
+            entry = self.waits[name]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += 1 if timed_out else 0
+
+    def count(self, event, amount=1):
+        with self.lock:
+            self.events[event] += amount
+
+    def _begin(self):
+        return list(self._thread_totals()), time.time(), time.perf_counter()
+
+    def _end(self, stage, begin, status, fields):
+        before, started, start = begin
+        totals = self._thread_totals()
+        span = {
+            "type": "span",
+            "stage": stage,
+            "start": round(started, 3),
+            "seconds": round(time.perf_counter() - start, 4),
+            "commands": totals[0] - before[0],
+            "command_seconds": round(totals[1] - before[1], 4),
+            "sleep_seconds": round(totals[2] - before[2], 4),
+            "thread": threading.current_thread().name,
+            "status": status,
+        }
+        span.update(fields)
+        with self.lock:
+            entry = self.stages[stage]
+            entry[0] += 1
+            entry[1] += span["seconds"]
+            for i, bound in enumerate(SPAN_BUCKETS):
+                if span["seconds"] <= bound:
+                    entry[2][i] += 1
+            if self.jsonl_path:
+                if self.file is None:
+                    self.file = open(self.jsonl_path, "a", encoding="utf-8")
+                self.file.write(json.dumps(span, default=str) + "\n")
+        self.maybe_export()
+        return span
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """Time a stage; yields a dict that is filled in with the span once it ends
+
+        The span also records the WebDriver commands and sleeps this thread issued during it.
+        """
+        begin = self._begin()
+        span = {}
+        status = "ok"
+        try:
+            yield span
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            span.update(self._end(stage, begin, status, fields))
+
+    def iterate(self, stage, iterable, **fields):
+        """Yield from iterable, recording a span for producing each item
+
+        The time from the last item until the iterable is exhausted goes to "<stage>_tail".
+        """
+        iterator = iter(iterable)
+        index = 0
+        while True:
+            begin = self._begin()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._end(f"{stage}_tail", begin, "ok", fields)
+                return
+            except BaseException:
+                self._end(stage, begin, "error", dict(fields, index=index))
+                raise
+            self._end(stage, begin, "ok", dict(fields, index=index))
+            index += 1
+            yield item
+
+    def snapshot(self):
+        """Totals so far, for printing and benchmarks"""
+        with self.lock:
+            return {
+                "commands": sum(entry[0] for entry in self.commands.values()),
+                "command_seconds": sum(entry[1] for entry in self.commands.values()),
+                "sleep_seconds": sum(entry[1] for entry in self.sleeps.values()),
+                "wait_seconds": sum(entry[1] for entry in self.waits.values()),
+                "stages": {stage: {"count": entry[0], "seconds": entry[1]} for stage, entry in self.stages.items()},
+                "events": dict(self.events),
+            }
+
+    def summary(self):
+        totals = self.snapshot()
+        return (f"WebDriver: {totals['commands']} commands ({totals['command_seconds']:.1f}s), "
+                f"waiting {totals['wait_seconds']:.1f}s, deliberate sleeps {totals['sleep_seconds']:.1f}s")
+
+    def prometheus_text(self):
+        lines = []
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP spotify2ytm_{name} {help_text}")
+            lines.append(f"# TYPE spotify2ytm_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"spotify2ytm_{name}{labels} {value}")
+
+        with self.lock:
+            commands = sorted(self.commands.items())
+            sleeps = sorted(self.sleeps.items())
+            conditions = sorted(self.waits.items())
+            stages = sorted((stage, [entry[0], entry[1], list(entry[2])]) for stage, entry in self.stages.items())
+            events = sorted(self.events.items())
+        metric("webdriver_commands_total", "counter", "WebDriver commands sent",
+               [(prometheus_labels(driver=d, command=c), e[0]) for (d, c), e in commands])
+        metric("webdriver_command_seconds_total", "counter", "Time spent in WebDriver commands",
+               [(prometheus_labels(driver=d, command=c), round(e[1], 6)) for (d, c), e in commands])
+        metric("sleep_seconds_total", "counter", "Time spent in deliberate sleeps",
+               [(prometheus_labels(kind=k), round(e[1], 6)) for k, e in sleeps])
+        metric("wait_seconds_total", "counter", "Time spent waiting for page conditions",
+               [(prometheus_labels(condition=n), round(e[1], 6)) for n, e in conditions])
+        metric("wait_timeouts_total", "counter", "Page condition waits that timed out",
+               [(prometheus_labels(condition=n), e[2]) for n, e in conditions])
+        lines.append("# HELP spotify2ytm_stage_seconds Duration of pipeline stage spans")
+        lines.append("# TYPE spotify2ytm_stage_seconds histogram")
+        for stage, (count, seconds, buckets) in stages:
+            for bound, bucket in zip(SPAN_BUCKETS, buckets):
+                lines.append(f"spotify2ytm_stage_seconds_bucket{prometheus_labels(stage=stage, le=bound)} {bucket}")
+            lines.append(f"spotify2ytm_stage_seconds_bucket{prometheus_labels(stage=stage, le='+Inf')} {count}")
+            lines.append(f"spotify2ytm_stage_seconds_sum{prometheus_labels(stage=stage)} {round(seconds, 6)}")
+            lines.append(f"spotify2ytm_stage_seconds_count{prometheus_labels(stage=stage)} {count}")
+        metric("events_total", "counter", "Pipeline events such as tracks added",
+               [(prometheus_labels(event=e), n) for e, n in events])
+        return "\n".join(lines) + "\n"
+
+    def maybe_export(self):
+        if self.prometheus_path and time.monotonic() - self.last_export >= self.export_interval:
+            self.export()
+
+    def export(self):
+        """Rewrite the Prometheus textfile atomically so a collector never reads half of it"""
+        if not self.prometheus_path:
+            return
+        self.last_export = time.monotonic()
+        temporary = f"{self.prometheus_path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(temporary, self.prometheus_path)
+        except OSError as e:
+            print(f"⚠️ Could not write metrics to {self.prometheus_path}: {e}")
+
+    def close(self):
+        """Write the final Prometheus textfile and a summary line, then close the span log"""
+        self.export()
+        summary = dict(self.snapshot(), type="summary")
+        with self.lock:
+            if self.file is not None:
+                self.file.write(json.dumps(summary, default=str) + "\n")
+                self.file.close()
+                self.file = None
+
+# Shared instrumentation; main() replaces it when metrics output is requested
+metrics = Instrumentation()
+
+# Request budgets per service: the steady rate ceiling (requests/second) and the burst size
+RATE_LIMITS = {"spotify": 5.0, "ytmusic": 4.0}
+RATE_LIMIT_BURST = 8
+# On throttling the rate is halved and requests pause, doubling per repeat up to the maximum
+RATE_BACKOFF_FACTOR = 0.5
+RATE_BACKOFF_PAUSE = 5.0
+RATE_BACKOFF_MAX_PAUSE = 300.0
+# Each success gives back this fraction of the ceiling
+RATE_RECOVERY_STEP = 0.02
+# This many empty results in a row count as throttling
+EMPTY_RESULTS_LIMIT = 3
+
+class RateLimiter:
+    """Token bucket for one service, shared by every driver and worker talking to it
+
+    The rate backs off multiplicatively when throttling is detected and recovers
+    additively with each success, so it settles just under what the service allows.
+    Costs larger than the bucket are allowed and paid off as debt before the next request.
+    """
+
+    def __init__(self, service, rate, burst=RATE_LIMIT_BURST):
+        self.service = service
+        self.lock = threading.Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate, burst=RATE_LIMIT_BURST):
+        with self.lock:
+            self.max_rate = rate
+            self.min_rate = rate / 50
+            self.rate = rate
+            self.burst = burst
+            self.tokens = float(burst)
+            self.updated = time.monotonic()
+            self.paused_until = 0.0
+            self.strikes = 0
+            self.empty_streak = 0
+            self.successes = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, cost=1):
+        """Block until cost requests fit in the budget"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(self.paused_until - now, 0.0)
+                if not wait:
+                    if self.tokens >= min(cost, self.burst):
+                        self.tokens -= cost
+                        return
+                    wait = (min(cost, self.burst) - self.tokens) / self.rate
+            metrics.sleep(f"rate_limit_{self.service}", wait)
+
+    def succeeded(self):
+        """A request went through: creep back towards the ceiling"""
+        with self.lock:
+            self.empty_streak = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_STEP)
+            self.successes += 1
+            if self.successes >= 50:
+                self.strikes = max(0, self.strikes - 1)
+                self.successes = 0
+
+    def throttled(self, reason):
+        """The service pushed back: slow down and pause, longer for repeated throttling"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return  # Concurrent workers reporting the same episode
+            self.strikes += 1
+            self.successes = 0
+            self.empty_streak = 0
+            self.rate = max(self.min_rate, self.rate * RATE_BACKOFF_FACTOR)
+            pause = min(RATE_BACKOFF_MAX_PAUSE, RATE_BACKOFF_PAUSE * 2 ** (self.strikes - 1))
+            self.paused_until = now + pause
+            self.tokens = min(self.tokens, 0.0)
+            rate = self.rate
+        metrics.count(f"throttled_{self.service}")
+        print(f"⚠️ {self.service} looks throttled ({reason}); pausing {pause:.0f}s, then {rate:.2f} requests/s")
+
+    def empty_result(self, reason="empty results"):
+        """An empty result is normal once, suspicious several times in a row"""
+        with self.lock:
+            self.empty_streak += 1
+            suspicious = self.empty_streak >= EMPTY_RESULTS_LIMIT
+        if suspicious:
+            self.throttled(f"{reason} {EMPTY_RESULTS_LIMIT} times in a row")
+
+rate_limits = {service: RateLimiter(service, rate) for service, rate in RATE_LIMITS.items()}
+
+# Returns a short description of any throttling signal on the current page, or null
+THROTTLE_SIGNALS_JS = """
+    var url = location.href;
+    var text = (document.body ? document.body.innerText || '' : '').slice(0, 20000).toLowerCase();
+    if (/consent\\.(youtube|google)\\.com/.test(url) ||
+        document.querySelector('form[action*="consent"], ytmusic-consent-bump-v2-lightbox, ytd-consent-bump-v2-lightbox')) {
+        return 'consent wall';
+    }
+    if (url.indexOf('/sorry/') !== -1 || text.indexOf('unusual traffic') !== -1) return 'unusual traffic page';
+    if (text.indexOf('too many requests') !== -1 || document.title.indexOf('429') !== -1) return 'too many requests';
+    var toasts = document.querySelectorAll('tp-yt-paper-toast, ytmusic-notification-action-renderer, [data-testid="toast"], [role="alert"]');
+    for (var i = 0; i < toasts.length; i++) {
+        var message = (toasts[i].innerText || toasts[i].textContent || '').trim().toLowerCase();
+        if (/something went wrong|try again later|too many|rate limit|temporarily/.test(message)) {
+            return 'error toast: ' + message.slice(0, 80);
+        }
+    }
+    return null;
+"""
+
+def check_throttling(driver, limiter, empty_reason=None):
+    """After a failed step, look for throttling signals on the page and report them to limiter
+
+    Without a signal, empty_reason (if given) is reported as an empty result. Returns the signal found, if any.
+    """
+    try:
+        reason = driver.execute_script(THROTTLE_SIGNALS_JS)
+    except Exception:
+        reason = None
+    if reason:
+        limiter.throttled(reason)
+    elif empty_reason:
+        limiter.empty_result(empty_reason)
+    return reason
+
+def throttled_status(error):
+    """True if an in-page request error looks like the service refusing us"""
+    return bool(error) and any(code in str(error) for code in ("HTTP 429", "HTTP 403", "HTTP 503"))
+
+# Lean mode: what a scraping session does not need to download or run
+LEAN_WINDOW_SIZE = "1280,800"
+LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm", "*.m4a", "*.mp3",
+    "*i.scdn.co/*", "*mosaic.scdn.co/*", "*image-cdn-*.spotifycdn.com/*",
+    "*i.ytimg.com/*", "*yt3.ggpht.com/*", "*lh3.googleusercontent.com/*", "*googlevideo.com/videoplayback*",
+]
+# Keep tabs that are not in front running at full speed (lean sessions and worker tabs)
+BACKGROUND_TAB_ARGUMENTS = [
+    "--disable-background-timer-throttling",
+    "--disable-renderer-backgrounding",
+    "--disable-backgrounding-occluded-windows",
+]
+LEAN_ARGUMENTS = [
+    "--disable-background-networking",
+    *BACKGROUND_TAB_ARGUMENTS,
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--disable-component-update",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,msEdgeShopping,msEdgeCollections",
+    "--no-first-run",
+    "--mute-audio",
+    "--autoplay-policy=user-gesture-required",
+    "--blink-settings=imagesEnabled=false",
+]
+
+def apply_lean_options(options):
+    """Smaller window, no images/background features, and return from get() at DOMContentLoaded"""
+    options.add_argument(f"--window-size={LEAN_WINDOW_SIZE}")
+    for argument in LEAN_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    # Readiness is checked explicitly with the wait engine, so don't wait for every subresource
+    options.page_load_strategy = "eager"
+
+def start_lean_session(driver):
+    """Block images, media and fonts by URL for the current tab"""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+        # Keep every resource timing entry so page_load_stats can count all bytes
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+            "source": "performance.setResourceTimingBufferSize(10000);"
+        })
+    except Exception as e:
+        print(f"⚠️ Could not enable request blocking: {e}")
+
+PAGE_LOAD_STATS_JS = """
+    var nav = performance.getEntriesByType('navigation')[0];
+    var resources = performance.getEntriesByType('resource');
+    var bytes = nav ? nav.transferSize || 0 : 0;
+    for (var i = 0; i < resources.length; i++) bytes += resources[i].transferSize || 0;
+    return {
+        url: location.href,
+        ready_ms: nav ? Math.round(nav.domContentLoadedEventEnd - nav.startTime) : null,
+        resources: resources.length,
+        bytes: bytes
+    };
+"""
+
+class PageLoadStats:
+    """Page-load time and bytes transferred per navigation, to compare browser modes
+
+    Bytes come from the Resource Timing API, so cross-origin responses without a
+    Timing-Allow-Origin header count as zero; compare runs, not absolute numbers.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.pages = 0
+        self.ready_ms = []
+        self.bytes = 0
+        self.resources = 0
+
+    def sample(self, driver):
+        try:
+            stats = driver.execute_script(PAGE_LOAD_STATS_JS)
+        except Exception:
+            return
+        if not stats or not stats.get("url", "").startswith("http"):
+            return
+        self.pages += 1
+        if stats.get("ready_ms") is not None:
+            self.ready_ms.append(stats["ready_ms"])
+        self.bytes += stats.get("bytes") or 0
+        self.resources += stats.get("resources") or 0
+
+    def attach(self, driver):
+        """Sample each page just before the driver navigates away from it"""
+        original_get = driver.get
+        def get(url):
+            self.sample(driver)
+            return original_get(url)
+        driver.get = get
+        return self
+
+    def report(self, driver=None):
+        if driver is not None:
+            self.sample(driver)
+        if not self.pages:
+            return f"{self.label}: no pages loaded"
+        average = sum(self.ready_ms) / len(self.ready_ms) if self.ready_ms else 0
+        return (f"{self.label}: {self.pages} pages, {average:.0f} ms average DOM ready, "
+                f"{self.bytes / 1048576:.1f} MB over {self.resources} resources")
+
+# Driver binary resolution: cached per machine so startup needs no network check
+DRIVER_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "spotify2ytm", "msedgedriver.json")
+DRIVER_PATH_ENV = "MSEDGEDRIVER_PATH"
+DRIVER_VERSION_ENV = "MSEDGEDRIVER_VERSION"
+DRIVER_OFFLINE_ENV = "SPOTIFY2YTM_OFFLINE"
+# How long DriverFactory.close() waits for browsers that are still being pre-launched
+PREWARM_CLOSE_TIMEOUT = 60
+
+def driver_binary_version(path):
+    """Version reported by a msedgedriver binary, or None if it can't be run"""
+    try:
+        output = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r"(\d+(?:\.\d+)+)", output or "")
+    return match.group(1) if match else None
+
+class DriverFactory:
+    """Resolve msedgedriver once and hand out browser sessions, optionally pre-launched
+
+    The binary is looked up in this order: the MSEDGEDRIVER_PATH environment
+    variable, the JSON cache from an earlier run (if it still exists and matches
+    the pinned version), webdriver-manager (skipped when offline), msedgedriver
+    on PATH, and finally Selenium's own driver lookup.
+    """
+
+    def __init__(self, cache_path=DRIVER_CACHE_PATH, version=None, offline=None):
+        self.cache_path = cache_path
+        self.version = version or os.environ.get(DRIVER_VERSION_ENV) or None
+        if offline is None:
+            offline = os.environ.get(DRIVER_OFFLINE_ENV, "") not in ("", "0")
+        self.offline = offline
+        self.path = None
+        self.resolved = False
+        self.cond = threading.Condition()
+        self.warm = collections.defaultdict(list)
+        self.pending = collections.defaultdict(int)
+        # Set by close(); sessions that finish launching afterwards are quit
+        self.closed = False
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = entry.get("path")
+        if not path or not os.path.exists(path):
+            return None
+        if self.version and entry.get("version") != self.version:
+            return None
+        return path
+
+    def _write_cache(self, path):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump({"path": path, "version": driver_binary_version(path), "resolved_at": time.time()}, f)
+        except OSError as e:
+            print(f"⚠️ Could not cache driver location: {e}")
+
+    def _install(self):
+        try:
+            if self.version:
+                try:
+                    manager = EdgeChromiumDriverManager(driver_version=self.version)
+                except TypeError:
+                    manager = EdgeChromiumDriverManager(version=self.version)
+            else:
+                manager = EdgeChromiumDriverManager()
+            return manager.install()
+        except Exception as e:
+            print(f"⚠️ Could not download msedgedriver: {e}")
+            return None
+
+    def driver_path(self, refresh=False):
+        """Path of the msedgedriver binary, or None to let Selenium find one"""
+        with self.cond:
+            if self.resolved and not refresh:
+                return self.path
+            path = os.environ.get(DRIVER_PATH_ENV) or None
+            if path is None and not refresh:
+                path = self._read_cache()
+            if path is None and not self.offline:
+                path = self._install()
+                if path is not None:
+                    self._write_cache(path)
+            if path is None:
+                path = shutil.which("msedgedriver")
+            self.path = path
+            self.resolved = True
+            return path
+
+    def launch(self, options):
+        """Start Edge with options, re-resolving the driver once if it no longer fits the browser"""
+        path = self.driver_path()
+        try:
+            return webdriver.Edge(service=EdgeService(path) if path else EdgeService(), options=options)
+        except SessionNotCreatedException:
+            # Usually Edge updated itself past the cached driver version
+            if self.offline or os.environ.get(DRIVER_PATH_ENV):
+                raise
+            fresh = self.driver_path(refresh=True)
+            if fresh == path:
+                raise
+            return webdriver.Edge(service=EdgeService(fresh) if fresh else EdgeService(), options=options)
+
+    def prewarm(self, count, url=None, **setup):
+        """Launch count sessions in the background for later acquire(**setup) calls
+
+        url is loaded in each one so DNS, connections and the HTTP cache are warm.
+        """
+        key = tuple(sorted(setup.items()))
+
+        def launch():
+            driver = None
+            try:
+                driver = setup_driver(**setup)
+                if url:
+                    driver.get(url)
+            except Exception as e:
+                print(f"⚠️ Could not pre-launch a browser: {e}")
+            with self.cond:
+                self.pending[key] -= 1
+                late = self.closed
+                if driver is not None and not late:
+                    self.warm[key].append(driver)
+                self.cond.notify_all()
+            if driver is not None and late:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+
+        with self.cond:
+            self.pending[key] += count
+        for _ in range(count):
+            threading.Thread(target=launch, daemon=True).start()
+
+    def acquire(self, **setup):
+        """A pre-launched session for these setup_driver arguments, or a new one"""
+        key = tuple(sorted(setup.items()))
+        with self.cond:
+            while not self.warm[key] and self.pending[key] > 0:
+                self.cond.wait()
+            driver = self.warm[key].pop() if self.warm[key] else None
+        if driver is not None and driver_alive(driver):
+            return driver
+        return setup_driver(**setup)
+
+    def close(self, timeout=PREWARM_CLOSE_TIMEOUT):
+        """Quit pre-launched sessions nobody acquired, waiting up to timeout for launches in progress
+
+        A launch that finishes even later quits its own session.
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.wait_for(lambda: not any(self.pending.values()), timeout)
+            leftovers = [driver for sessions in self.warm.values() for driver in sessions]
+            self.warm.clear()
+        for driver in leftovers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+drivers = DriverFactory()
+
+def setup_driver(headless=None, capture_network=False, lean=False, page_load_strategy=None, active_tabs=False):
+    """Set up and return an Edge webdriver with anti-detection measures
+
+    capture_network turns on performance logging so API responses can be read back.
+    lean blocks images, media and fonts and trims the browser down; it runs
+    headless unless headless=False is passed (e.g. for an interactive login).
+    page_load_strategy overrides when get() returns ("none" returns at once).
+    active_tabs keeps background tabs from being throttled (lean does too).
+    """
+    if headless is None:
+        headless = lean
     options = EdgeOptions()
     if headless:
         options.add_argument("--headless")
-    options.add_argument("--window-size=1920,1080")
+    if lean:
+        apply_lean_options(options)
+    else:
+        options.add_argument("--window-size=1920,1080")
+    if page_load_strategy:
+        options.page_load_strategy = page_load_strategy
+    if active_tabs and not lean:
+        for argument in BACKGROUND_TAB_ARGUMENTS:
+            options.add_argument(argument)
     options.add_argument("--disable-gpu")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
@@ -30,20 +1030,52 @@ def setup_driver(headless=False):
     options.add_argument("--disable-webgl")
     # Suppress unnecessary logging
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    if capture_network:
+        options.set_capability("ms:loggingPrefs", {"performance": "ALL"})
     
-    driver = webdriver.Edge(service=EdgeService(EdgeChromiumDriverManager().install()), options=options)
+    driver = drivers.launch(options)
     
     # Additional anti-detection measures
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    if lean:
+        start_lean_session(driver)
     
     return driver
 
-def spotify_login(driver):
-    """Open Spotify and allow user to login"""
+# Exit statuses of main(), so batch runs can tell failures apart
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_LOGIN_REQUIRED = 3
+
+# Present only when signed in
+SPOTIFY_LOGGED_IN_SELECTOR = "[data-testid='user-widget-link'], button[data-testid='user-widget-link']"
+YTMUSIC_ACCOUNT_XPATHS = [
+    "//button[@aria-label='Account']",
+    "//img[contains(@alt, 'Avatar')]",
+    "//yt-img-shadow/img",
+]
+
+class LoginRequired(Exception):
+    """A non-interactive run found a browser profile that is not logged in"""
+
+def spotify_login(driver, interactive=True):
+    """Open Spotify and allow user to login
+
+    With interactive=False the browser profile must already be logged in, and
+    LoginRequired is raised instead of waiting for the user.
+    """
     print("Opening Spotify for login...")
-    driver.get("https://open.spotify.com/")
+    driver.get(f"{SPOTIFY_BASE_URL}/")
     
-    time.sleep(8)  # Wait longer for initial page load
+    waits.until(driver, "page_ready", document_ready)
+    
+    if not interactive:
+        if not waits.until(driver, "login_state", css_present(SPOTIFY_LOGGED_IN_SELECTOR)):
+            artifacts.failure(driver, "spotify_not_logged_in")
+            raise LoginRequired("the Spotify profile is not logged in")
+        print("✅ Logged in to Spotify")
+        return driver
     
     # Check for and accept cookies if prompted
     try:
@@ -52,7 +1084,7 @@ def spotify_login(driver):
         )
         accept_cookies.click()
         print("Accepted cookies")
-        time.sleep(2)
+        waits.polite()
     except:
         print("No cookie banner found or already accepted")
     
@@ -78,29 +1110,40 @@ def spotify_login(driver):
     print("=================================================\n")
     input("Press Enter once you've logged in to Spotify...")
     
-    # Give extra time for any redirects after login confirmation
-    time.sleep(5)
+    # Let any redirects after login confirmation finish
+    waits.until(driver, "page_ready", document_ready)
     
     # Verify login by checking for specific elements or URLs
-    if "open.spotify.com" in driver.current_url:
+    if driver.current_url.startswith(SPOTIFY_BASE_URL):
         print("✅ On Spotify website")
     else:
         print("⚠️ Not on Spotify website, navigating back...")
-        driver.get("https://open.spotify.com/")
-        time.sleep(5)
+        driver.get(f"{SPOTIFY_BASE_URL}/")
+        waits.until(driver, "page_ready", document_ready)
     
     # Additional verification - try to access the playlists directly
     print("Navigating to playlists to verify login...")
-    driver.get("https://open.spotify.com/collection/playlists")
-    time.sleep(5)
+    driver.get(f"{SPOTIFY_BASE_URL}/collection/playlists")
+    waits.until(driver, "page_ready", document_ready)
     
     return driver
 
-def ytmusic_login(driver):
-    """Open YouTube Music and allow user to login"""
+def ytmusic_login(driver, interactive=True):
+    """Open YouTube Music and allow user to login
+
+    With interactive=False the browser profile must already be logged in, and
+    LoginRequired is raised instead of waiting for the user.
+    """
     print("Opening YouTube Music for login...")
-    driver.get("https://music.youtube.com/")
-    time.sleep(3)  # Give page time to load completely
+    driver.get(f"{YTMUSIC_BASE_URL}/")
+    waits.until(driver, "ytmusic_app", css_present("ytmusic-app"))
+    
+    if not interactive:
+        if not waits.until(driver, "login_state", learned_xpath_present("ytmusic_account", YTMUSIC_ACCOUNT_XPATHS)):
+            artifacts.failure(driver, "ytmusic_not_logged_in")
+            raise LoginRequired("the YouTube Music profile is not logged in")
+        print("✅ Logged in to YouTube Music")
+        return driver
     
     # Check if sign-in button exists and click it
     try:
@@ -117,123 +1160,340 @@ def ytmusic_login(driver):
     input("Press Enter once you've logged in to YouTube Music...")
     
     # Wait for successful login (checking for avatar)
-    try:
-        # Multiple possible selectors for the account button
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((
-                By.XPATH, 
-                "//button[@aria-label='Account'] | //img[contains(@alt, 'Avatar')] | //yt-img-shadow/img"
-            ))
-        )
+    if waits.until(driver, "login_state", learned_xpath_present("ytmusic_account", YTMUSIC_ACCOUNT_XPATHS), timeout=10):
         print("✅ Successfully logged in to YouTube Music")
-    except Exception as e:
-        print(f"⚠️ Could not confirm YouTube Music login: {e}")
+    else:
+        print("⚠️ Could not confirm YouTube Music login: no account button found")
         print("Attempting to continue anyway...")
     
     # Verify we're on YouTube Music site
-    if "music.youtube.com" in driver.current_url:
+    if driver.current_url.startswith(YTMUSIC_BASE_URL):
         return driver
     else:
         print("Redirecting back to YouTube Music...")
-        driver.get("https://music.youtube.com/")
-        time.sleep(3)
+        driver.get(f"{YTMUSIC_BASE_URL}/")
+        waits.until(driver, "ytmusic_app", css_present("ytmusic-app"))
         return driver
 
-def get_spotify_playlists(driver):
-    """Scrape playlist information from Spotify"""
+# Small XPath helpers prepended to the bulk extraction scripts
+XPATH_HELPERS_JS = """
+    function xpathAll(expression, context) {
+        var snapshot = document.evaluate(expression, context || document, null,
+                                         XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+        return nodes;
+    }
+    function xpathFirst(expression, context) {
+        return document.evaluate(expression, context || document, null,
+                                 XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    }
+    function visibleText(node) {
+        return node ? (node.innerText || node.textContent || '').trim() : '';
+    }
+"""
+
+SPOTIFY_PLAYLIST_PATTERNS = [
+    "//div[@data-testid='grid-container']//div[@role='row']",
+    "//div[contains(@class, 'main-gridContainer')]//div[@role='row']",
+    "//div[@data-testid='playlist-tracklist-container']",
+    "//div[contains(@class, 'GlueCard')]",
+]
+SPOTIFY_PLAYLIST_NAME_SELECTORS = [
+    ".//a[@data-testid='playlist-name']",
+    ".//a[contains(@class, 'playlist-title')]",
+    ".//div[contains(@class, 'main-trackList-rowTitle')]//a",
+]
+
+# Returns {pattern, name_selector, candidates, playlists: [{name, url}]} for the whole page;
+# name_selector is the one that named the first playlist
+SPOTIFY_PLAYLISTS_JS = """
+    var patterns = arguments[0], nameSelectors = arguments[1];
+    for (var p = 0; p < patterns.length; p++) {
+        var elements = xpathAll(patterns[p]);
+        var playlists = [], nameSelector = null;
+        for (var i = 0; i < elements.length; i++) {
+            for (var n = 0; n < nameSelectors.length; n++) {
+                var link = xpathFirst(nameSelectors[n], elements[i]);
+                var name = visibleText(link);
+                if (name && link.href) {
+                    playlists.push({name: name, url: link.href});
+                    nameSelector = nameSelector || nameSelectors[n];
+                    break;
+                }
+            }
+        }
+        if (playlists.length) {
+            return {pattern: patterns[p], name_selector: nameSelector, candidates: elements.length, playlists: playlists};
+        }
+    }
+
+    // Backup approach: any playlist link on the page
+    var links = xpathAll("//a[contains(@href, '/playlist/')]");
+    var seen = {}, found = [];
+    for (var i = 0; i < links.length; i++) {
+        var url = links[i].href;
+        if (!url || seen[url]) continue;
+        seen[url] = true;
+        var child = links[i].firstElementChild;
+        var name = visibleText(child) || ('Playlist ' + (found.length + 1));
+        found.push({name: name, url: url});
+    }
+    return {pattern: found.length ? 'backup playlist links' : null, candidates: links.length, playlists: found};
+"""
+
+SPOTIFY_TRACK_ROW_PATTERNS = [
+    "//div[@data-testid='tracklist-row']",
+    "//div[contains(@class, 'tracklist-row')]",
+    "//div[contains(@class, 'TrackListRow')]",
+]
+SPOTIFY_TRACK_NAME_SELECTORS = [
+    ".//a[@data-testid='internal-track-link']",
+    ".//div[contains(@class, 'tracklist-name')]",
+    ".//div[contains(@class, 'track-name')]",
+]
+SPOTIFY_TRACK_ARTIST_SELECTORS = [
+    ".//span[@data-testid='tracklist-row-artists-album-artist-link']",
+    ".//span[contains(@class, 'artist-name')]",
+    ".//div[contains(@class, 'artist')]//a",
+    ".//a[contains(@href, '/artist/')]",
+]
+
+# Returns {pattern, name_selector, artist_selector, candidates, total,
+#          tracks: [{name, artists, album, duration, uri, row_index}]}
+# and, when the fourth argument is true, scrolls the rows after the last one into view.
+# The selectors reported are the ones that matched in the first harvested row.
+SPOTIFY_TRACK_ROWS_JS = """
+    var patterns = arguments[0], nameSelectors = arguments[1], artistSelectors = arguments[2];
+    for (var p = 0; p < patterns.length; p++) {
+        var rows = xpathAll(patterns[p]);
+        var tracks = [], nameSelector = null, artistSelector = null;
+        for (var i = 0; i < rows.length; i++) {
+            var row = rows[i], name = '', nameNode = null;
+            for (var n = 0; n < nameSelectors.length && !name; n++) {
+                nameNode = xpathFirst(nameSelectors[n], row);
+                name = visibleText(nameNode);
+                if (name) nameSelector = nameSelector || nameSelectors[n];
+            }
+            if (!name) continue;
+
+            var artists = '';
+            for (var a = 0; a < artistSelectors.length && !artists; a++) {
+                artists = xpathAll(artistSelectors[a], row).map(visibleText).filter(Boolean).join(', ');
+                if (artists && !tracks.length) artistSelector = artistSelectors[a];
+            }
+
+            var album = visibleText(row.querySelector('a[href*="/album/"]'));
+            var duration = '';
+            var cells = row.querySelectorAll('div, span');
+            for (var c = cells.length - 1; c >= 0; c--) {
+                var text = visibleText(cells[c]);
+                if (/^\\d{1,2}:\\d{2}(:\\d{2})?$/.test(text)) { duration = text; break; }
+            }
+            var uri = '';
+            var trackLink = (nameNode && nameNode.closest('a[href*="/track/"]')) || row.querySelector('a[href*="/track/"]');
+            if (trackLink) {
+                var match = trackLink.getAttribute('href').match(/\\/track\\/([A-Za-z0-9]+)/);
+                if (match) uri = 'spotify:track:' + match[1];
+            }
+            var indexed = row.closest('[aria-rowindex]');
+
+            tracks.push({
+                name: name,
+                artists: artists,
+                album: album,
+                duration: duration,
+                uri: uri,
+                row_index: indexed ? parseInt(indexed.getAttribute('aria-rowindex'), 10) : null
+            });
+        }
+        if (tracks.length) {
+            // Bring the rows after the last harvested one into the rendered window
+            if (arguments[3]) {
+                var last = rows[rows.length - 1];
+                (last.closest('[aria-rowindex]') || last).scrollIntoView({block: 'start'});
+            }
+            // aria-rowcount includes the header row
+            var grid = rows[0].closest('[aria-rowcount]');
+            var total = grid ? parseInt(grid.getAttribute('aria-rowcount'), 10) - 1 : null;
+            return {pattern: patterns[p], name_selector: nameSelector, artist_selector: artistSelector,
+                    candidates: rows.length, tracks: tracks, total: total > 0 ? total : null};
+        }
+    }
+    return {pattern: null, candidates: 0, tracks: []};
+"""
+
+def tracklist_advanced(high_water):
+    """Condition: a tracklist row past high_water has been rendered"""
+    return lambda driver: driver.execute_script("""
+        var rows = document.querySelectorAll('[aria-rowindex]');
+        for (var i = rows.length - 1; i >= 0; i--) {
+            if (parseInt(rows[i].getAttribute('aria-rowindex'), 10) > arguments[0]) return true;
+        }
+        return false;
+    """, high_water)
+
+# Harvests every playlist currently rendered in the library sidebar and collection grid.
+# Returns {total, playlists: [{id, name, owner, track_count}]} and, when the third
+# argument is true, scrolls the last rendered entries so the next ones get rendered.
+SPOTIFY_LIBRARY_JS = """
+    var found = {}, order = [];
+    function add(id, name, subtitle) {
+        if (!id || found[id]) return;
+        found[id] = {id: id, name: name, subtitle: subtitle || ''};
+        order.push(id);
+    }
+    function idFromHref(href) {
+        var match = (href || '').match(/\\/playlist\\/([A-Za-z0-9]+)/);
+        return match ? match[1] : null;
+    }
+
+    // Sidebar "Your Library" rows label themselves with the playlist URI
+    var titles = document.querySelectorAll('[id^="listrow-title-spotify:playlist:"]');
+    for (var i = 0; i < titles.length; i++) {
+        var id = titles[i].id.split(':').pop();
+        var subtitle = document.getElementById('listrow-subtitle-spotify:playlist:' + id);
+        add(id, visibleText(titles[i]), visibleText(subtitle));
+    }
+
+    // Collection grid cards and any other playlist links
+    var links = document.querySelectorAll('a[href*="/playlist/"]');
+    for (var i = 0; i < links.length; i++) {
+        var card = links[i].closest('[data-encore-id="card"], [role="row"], [role="listitem"]');
+        var subtitle = card ? card.querySelector('[data-encore-id="cardSubtitle"], [class*="ubtitle"]') : null;
+        add(idFromHref(links[i].getAttribute('href')), visibleText(links[i]), visibleText(subtitle));
+    }
+
+    // The original selector chains, for page layouts the above does not cover
+    var legacy = (function() {
+        """ + SPOTIFY_PLAYLISTS_JS + """
+    }).apply(null, [arguments[0], arguments[1]]);
+    for (var i = 0; i < legacy.playlists.length; i++) {
+        add(idFromHref(legacy.playlists[i].url), legacy.playlists[i].name, '');
+    }
+
+    if (arguments[2]) {
+        var last = titles.length ? titles[titles.length - 1] : links[links.length - 1];
+        if (last) (last.closest('[aria-rowindex], [role="row"], [data-encore-id="card"]') || last).scrollIntoView({block: 'start'});
+        window.scrollTo(0, document.body.scrollHeight);
+    }
+
+    var sidebar = document.querySelector('[aria-rowcount][aria-label*="Library"]');
+    return {
+        total: sidebar ? parseInt(sidebar.getAttribute('aria-rowcount'), 10) : null,
+        pattern: legacy.name_selector ? legacy.pattern : null,
+        name_selector: legacy.name_selector || null,
+        playlists: order.map(function(id) { return found[id]; })
+    };
+"""
+
+def parse_playlist_subtitle(subtitle):
+    """Pull the owner and track count out of subtitles like "Playlist • Owner • 42 songs" """
+    owner = None
+    track_count = None
+    for part in re.split(r"\s*[•·]\s*", (subtitle or "").strip()):
+        count = re.match(r"^([\d,.]+)\s+(songs?|tracks?)$", part, re.IGNORECASE)
+        if count:
+            track_count = int(re.sub(r"[,.]", "", count.group(1)))
+        elif part.lower().startswith("by "):
+            owner = part[3:].strip()
+        elif part and part.lower() != "playlist" and owner is None:
+            owner = part
+    return owner, track_count
+
+def iter_spotify_library(driver, max_stalls=3):
+    """Yield every playlist in the Spotify library, deduplicated by playlist ID
+
+    The sidebar and collection grid are virtualized, so entries are harvested on
+    every scroll step until the library's declared size is reached or scrolling
+    stops turning up new playlists.
+    """
     print("Navigating to your Spotify playlists...")
-    driver.get("https://open.spotify.com/collection/playlists")
+    rate_limits["spotify"].acquire()
+    driver.get(f"{SPOTIFY_BASE_URL}/collection/playlists")
     
-    # Wait longer for playlists to load
+    # Wait for a specific element that indicates playlists are loaded
     print("Waiting for playlists to load...")
-    time.sleep(8)
-    
-    # Try to find a specific element that indicates playlists are loaded
-    try:
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'contentSpacing')]"))
-        )
+    if waits.until(driver, "spotify_playlists", css_present(
+        "[id^='listrow-title-spotify:playlist:'], a[href*='/playlist/']"
+    )):
         print("Playlist page loaded successfully")
-    except:
+    else:
         print("Warning: Could not confirm playlist page loaded completely")
     
-    # Scroll to load more playlists multiple times
-    print("Scrolling to load all playlists...")
-    scroll_attempts = 5
-    last_height = driver.execute_script("return document.body.scrollHeight")
-    
-    for _ in range(scroll_attempts):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(3)  # Wait longer after each scroll
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
+    seen = set()
+    stalls = 0
+    while stalls < max_stalls:
+        result = driver.execute_script(
+            XPATH_HELPERS_JS + SPOTIFY_LIBRARY_JS,
+            strategies.order("spotify_playlist_row", SPOTIFY_PLAYLIST_PATTERNS),
+            strategies.order("spotify_playlist_name", SPOTIFY_PLAYLIST_NAME_SELECTORS),
+            True,
+        ) or {}
+        strategies.record("spotify_playlist_row", result.get("pattern"))
+        strategies.record("spotify_playlist_name", result.get("name_selector"))
+        fresh = 0
+        for entry in result.get("playlists", []):
+            if entry["id"] in seen:
+                continue
+            seen.add(entry["id"])
+            fresh += 1
+            owner, track_count = parse_playlist_subtitle(entry.get("subtitle"))
+            yield {
+                "id": entry["id"],
+                "name": entry["name"] or f"Playlist {len(seen)}",
+                "url": f"{SPOTIFY_BASE_URL}/playlist/{entry['id']}",
+                "owner": owner,
+                "track_count": track_count,
+            }
+        total = result.get("total")
+        if total and len(seen) >= total:
             break
-        last_height = new_height
-    
-    # Try multiple selector patterns to find playlists
-    selector_patterns = [
-        "//div[@data-testid='grid-container']//div[@role='row']",
-        "//div[contains(@class, 'main-gridContainer')]//div[@role='row']",
-        "//div[@data-testid='playlist-tracklist-container']",
-        "//div[contains(@class, 'GlueCard')]"
-    ]
-    
-    playlists = []
-    for pattern in selector_patterns:
-        print(f"Trying selector pattern: {pattern}")
-        playlist_elements = driver.find_elements(By.XPATH, pattern)
-        
-        if playlist_elements:
-            print(f"Found {len(playlist_elements)} potential playlist elements")
-            # Continue with original extraction logic...
-            for element in playlist_elements:
-                try:
-                    # Try multiple selector patterns for playlist name and URL
-                    name_selectors = [
-                        ".//a[@data-testid='playlist-name']", 
-                        ".//a[contains(@class, 'playlist-title')]",
-                        ".//div[contains(@class, 'main-trackList-rowTitle')]//a"
-                    ]
-                    
-                    for name_selector in name_selectors:
-                        try:
-                            name_element = element.find_element(By.XPATH, name_selector)
-                            name = name_element.text
-                            url = name_element.get_attribute("href")
-                            
-                            if name and url:
-                                playlists.append({
-                                    "name": name,
-                                    "url": url
-                                })
-                                break
-                        except:
-                            continue
-                except:
-                    continue
-            
-            if playlists:
-                break  # Stop trying patterns if we found playlists
-    
-    # Backup approach: Look for any playlist links if the above failed
-    if not playlists:
-        print("Trying backup approach to find playlists...")
-        try:
-            links = driver.find_elements(By.XPATH, "//a[contains(@href, '/playlist/')]")
-            unique_urls = set()
-            
-            for link in links:
-                try:
-                    url = link.get_attribute("href")
-                    if url and url not in unique_urls and "playlist" in url:
-                        unique_urls.add(url)
-                        name_element = link.find_element(By.XPATH, ".//*")  # Any child element
-                        name = name_element.text if name_element.text else f"Playlist {len(unique_urls)}"
-                        playlists.append({"name": name, "url": url})
-                except:
-                    continue
-        except:
-            print("Backup approach also failed")
+        stalls = 0 if fresh else stalls + 1
+        waits.until(driver, "library_scroll", library_grew(seen))
+
+def library_grew(seen):
+    """Condition: a playlist whose ID is not in seen has been rendered
+
+    The sidebar is virtualized, so the rendered entries can't be counted against
+    everything seen so far; look for one that is new instead.
+    """
+    return lambda driver: driver.execute_script("""
+        var seen = {};
+        for (var i = 0; i < arguments[0].length; i++) seen[arguments[0][i]] = true;
+        var titles = document.querySelectorAll('[id^="listrow-title-spotify:playlist:"]');
+        for (var i = 0; i < titles.length; i++) {
+            if (!seen[titles[i].id.split(':').pop()]) return true;
+        }
+        var links = document.querySelectorAll('a[href*="/playlist/"]');
+        for (var i = 0; i < links.length; i++) {
+            var match = (links[i].getAttribute('href') || '').match(/\\/playlist\\/([A-Za-z0-9]+)/);
+            if (match && !seen[match[1]]) return true;
+        }
+        return false;
+    """, sorted(seen))
+
+def playlist_filter(include=None, exclude=None):
+    """Predicate selecting playlists by case-insensitive name pattern (fnmatch) or Spotify ID"""
+    def matches(playlist, patterns):
+        name = (playlist.get("name") or "").casefold()
+        return any(pattern == playlist.get("id") or fnmatch.fnmatchcase(name, pattern.casefold()) for pattern in patterns)
+    def select(playlist):
+        if include and not matches(playlist, include):
+            return False
+        return not (exclude and matches(playlist, exclude))
+    return select
+
+def order_playlists(playlists):
+    """Schedule the largest playlists first so long insert runs start early; unknown sizes go last"""
+    return sorted(playlists, key=lambda p: -(p.get("track_count") or -1))
+
+def get_spotify_playlists(driver):
+    """Scrape playlist information from Spotify"""
+    playlists = list(iter_spotify_library(driver))
+    known = [p["track_count"] for p in playlists if p.get("track_count") is not None]
+    if known:
+        print(f"Library size: {sum(known)} tracks across {len(known)} playlists with a known size")
     
     print(f"Found {len(playlists)} playlists on Spotify")
     
@@ -241,158 +1501,508 @@ def get_spotify_playlists(driver):
     if not playlists:
         print("DEBUG: No playlists found. Current URL:", driver.current_url)
         print("DEBUG: Page title:", driver.title)
-        # Take a screenshot
-        try:
-            screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spotify_debug.png")
-            driver.save_screenshot(screenshot_path)
-            print(f"DEBUG: Screenshot saved to {screenshot_path}")
-        except:
-            print("DEBUG: Could not save screenshot")
+        artifacts.failure(driver, "spotify_no_playlists")
     
     return playlists
 
-def get_spotify_playlist_tracks(driver, playlist_url):
-    """Scrape tracks from a Spotify playlist"""
+def iter_spotify_playlist_tracks(driver, playlist_url, max_stalls=3, expected_total=None):
+    """Yield tracks from a Spotify playlist while scrolling its virtualized tracklist
+
+    Spotify only keeps a window of rows in the DOM, so rows are harvested after
+    every scroll step and deduplicated by aria-rowindex. Harvesting stops once the
+    playlist's declared row count (or expected_total, when the page does not
+    declare one) is reached or scrolling stops producing rows.
+    """
     print(f"Getting tracks from playlist: {playlist_url}")
+    rate_limits["spotify"].acquire()
     driver.get(playlist_url)
     
-    # Wait longer for tracks to load
+    # Wait until the first batch of tracklist rows has rendered
     print("Waiting for tracks to load...")
-    time.sleep(10)
+    if not waits.until(driver, "spotify_tracklist", count_settled("div[data-testid='tracklist-row']")):
+        print("Warning: Tracklist rows did not settle before timeout")
     
     # Check if we need to accept cookies (might block UI)
     try:
         accept_cookies = driver.find_element(By.XPATH, "//button[contains(text(), 'Accept') or contains(text(), 'Accept Cookies')]")
         accept_cookies.click()
-        time.sleep(2)
+        waits.polite()
     except:
         pass  # No cookie banner found
     
-    # Scroll multiple times to load all tracks
-    print("Scrolling to load all tracks...")
-    scroll_count = 0
-    max_scrolls = 10
-    last_height = driver.execute_script("return document.body.scrollHeight")
-    
-    while scroll_count < max_scrolls:
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(3)
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-        scroll_count += 1
-    
-    # Try multiple selector patterns to find tracks
-    track_selector_patterns = [
-        "//div[@data-testid='tracklist-row']",
-        "//div[contains(@class, 'tracklist-row')]",
-        "//div[contains(@class, 'TrackListRow')]"
-    ]
-    
-    tracks = []
-    for pattern in track_selector_patterns:
-        print(f"Trying track selector: {pattern}")
-        track_elements = driver.find_elements(By.XPATH, pattern)
+    # Only the highest row index yielded so far is kept, so memory stays flat for huge playlists
+    high_water = 0
+    unindexed = set()
+    yielded = 0
+    stalls = 0
+    announced = False
+    while stalls < max_stalls:
+        # Harvest the rendered window and scroll the next rows in, in one round trip
+        result = driver.execute_script(
+            XPATH_HELPERS_JS + SPOTIFY_TRACK_ROWS_JS,
+            strategies.order("spotify_track_row", SPOTIFY_TRACK_ROW_PATTERNS),
+            strategies.order("spotify_track_name", SPOTIFY_TRACK_NAME_SELECTORS),
+            strategies.order("spotify_track_artist", SPOTIFY_TRACK_ARTIST_SELECTORS),
+            True,
+        ) or {}
+        strategies.record("spotify_track_row", result.get("pattern"))
+        strategies.record("spotify_track_name", result.get("name_selector"))
+        strategies.record("spotify_track_artist", result.get("artist_selector"))
+        total = result.get("total") or expected_total
+        if not announced and result.get("pattern"):
+            print(f"Harvesting tracks with: {result['pattern']}" + (f" ({total} declared)" if total else ""))
+            announced = True
         
-        if track_elements:
-            print(f"Found {len(track_elements)} potential track elements")
-            
-            for element in track_elements:
-                try:
-                    # Try different patterns for track name
-                    track_name_found = False
-                    track_name = ""
-                    for name_selector in [
-                        ".//a[@data-testid='internal-track-link']",
-                        ".//div[contains(@class, 'tracklist-name')]",
-                        ".//div[contains(@class, 'track-name')]"
-                    ]:
-                        try:
-                            name_element = element.find_element(By.XPATH, name_selector)
-                            track_name = name_element.text.strip()
-                            if track_name:
-                                track_name_found = True
-                                break
-                        except:
-                            continue
-                    
-                    if not track_name_found:
-                        continue
-                    
-                    # Try different patterns for artists
-                    artists = ""
-                    for artist_selector in [
-                        ".//span[@data-testid='tracklist-row-artists-album-artist-link']",
-                        ".//span[contains(@class, 'artist-name')]",
-                        ".//div[contains(@class, 'artist')]//a"
-                    ]:
-                        try:
-                            artist_elements = element.find_elements(By.XPATH, artist_selector)
-                            if artist_elements:
-                                artists = ", ".join([artist.text for artist in artist_elements if artist.text])
-                                break
-                        except:
-                            continue
-                    
-                    # If we found at least a track name, add it
-                    if track_name:
-                        tracks.append({
-                            "name": track_name,
-                            "artists": artists
-                        })
-                except Exception as e:
-                    print(f"Error extracting track info: {e}")
+        fresh = 0
+        for track in sorted(result.get("tracks", []), key=lambda t: t.get("row_index") or 0):
+            row_index = track.get("row_index")
+            if row_index is not None:
+                if row_index <= high_water:
                     continue
-            
-            if tracks:
-                break  # Stop if we found tracks with this selector
+                high_water = row_index
+            else:
+                key = track.get("uri") or (track["name"], track["artists"])
+                if key in unindexed:
+                    continue
+                unindexed.add(key)
+            fresh += 1
+            yielded += 1
+            yield track
+        
+        if total and yielded >= total:
+            break
+        stalls = 0 if fresh else stalls + 1
+        waits.until(driver, "tracklist_scroll", tracklist_advanced(high_water))
     
     # Debug information
-    if not tracks:
-        print("DEBUG: No tracks found. Taking screenshot...")
-        try:
-            screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spotify_tracks_debug.png")
-            driver.save_screenshot(screenshot_path)
-            print(f"DEBUG: Screenshot saved to {screenshot_path}")
-            
-            # Also print page source to a file for debugging
-            html_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spotify_source.html")
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(driver.page_source)
-            print(f"DEBUG: Page source saved to {html_path}")
-        except:
-            print("DEBUG: Could not save debug information")
+    if not yielded:
+        print("DEBUG: No tracks found. Saving debug artifacts...")
+        check_throttling(driver, rate_limits["spotify"], "empty playlist page")
+        artifacts.failure(driver, "spotify_no_tracks")
+    else:
+        rate_limits["spotify"].succeeded()
+        if total and yielded < total:
+            print(f"Warning: harvested {yielded} of {total} declared tracks")
     
-    print(f"Found {len(tracks)} tracks in this playlist")
-    return tracks
+    print(f"Found {yielded} tracks in this playlist")
 
-def create_ytmusic_playlist(driver, name, description="Imported from Spotify"):
-    """Create a new playlist on YouTube Music"""
-    # Navigate to library - try the playlists page directly
-    driver.get("https://music.youtube.com/library/playlists")
-    print("Waiting for YouTube Music playlists to load...")
-    time.sleep(5)
+def get_spotify_playlist_tracks(driver, playlist_url):
+    """Scrape tracks from a Spotify playlist"""
+    return list(iter_spotify_playlist_tracks(driver, playlist_url))
+
+# Playlist data requests made by the web player (matched as a URL substring)
+SPOTIFY_API_PATTERN = "/pathfinder/v"
+SPOTIFY_API_OPERATIONS = ("fetchPlaylist", "fetchPlaylistContents", "fetchPlaylistWithGatedEntityRelations")
+SPOTIFY_API_PAGE_SIZE = 100
+SPOTIFY_API_CONCURRENT_PAGES = 4
+
+# Request headers the browser manages itself and that fetch() refuses to set
+_UNREPLAYABLE_HEADERS = {"cookie", "user-agent", "referer", "origin", "host", "accept-encoding", "content-length", "connection"}
+
+class NetworkCapture:
+    """Collect matching API responses from the driver's performance log"""
+
+    def __init__(self, driver, pattern=SPOTIFY_API_PATTERN, operations=SPOTIFY_API_OPERATIONS):
+        self.driver = driver
+        self.pattern = pattern
+        self.operations = operations
+        self.requests = {}
+        self.responses = []
+
+    def matches(self, url):
+        return self.pattern in url and any(operation in url for operation in self.operations)
+
+    def poll(self):
+        """Read new log entries; returns the list of (request, payload) captured so far"""
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Network.requestWillBeSent":
+                request = params.get("request", {})
+                body = request.get("postData") or ""
+                if self.matches(request.get("url", "") + body):
+                    self.requests[params["requestId"]] = request
+            elif method == "Network.loadingFinished" and params.get("requestId") in self.requests:
+                request = self.requests.pop(params["requestId"])
+                try:
+                    body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": params["requestId"]})
+                    self.responses.append((request, json.loads(body["body"])))
+                except Exception:
+                    continue
+        return self.responses
+
+def find_playlist_content(payload):
+    """Locate the {"items": [...], "totalCount": N} block in a playlist API response"""
+    if isinstance(payload, dict):
+        if isinstance(payload.get("items"), list) and "totalCount" in payload:
+            return payload
+        children = payload.values()
+    elif isinstance(payload, list):
+        children = payload
+    else:
+        return None
+    for child in children:
+        found = find_playlist_content(child)
+        if found is not None:
+            return found
+    return None
+
+def track_from_api_item(item):
+    """Convert one playlist API item into the track dict the migration uses"""
+    wrapper = item.get("itemV2") or item.get("item") or {}
+    data = wrapper.get("data") or {}
+    if data.get("__typename", "Track") != "Track" or not data.get("name"):
+        return None
+    artists = [a.get("profile", {}).get("name", "") for a in data.get("artists", {}).get("items", [])]
+    millis = (data.get("trackDuration") or data.get("duration") or {}).get("totalMilliseconds")
+    return {
+        "name": data["name"],
+        "artists": ", ".join(a for a in artists if a),
+        "album": (data.get("albumOfTrack") or {}).get("name", ""),
+        "duration": millis_duration(millis),
+        "uri": data.get("uri", ""),
+    }
+
+def page_request(request, offset, limit):
+    """Copy a captured playlist request, asking for a different page"""
+    headers = {k: v for k, v in request.get("headers", {}).items()
+               if not k.startswith(":") and not k.lower().startswith("sec-") and k.lower() not in _UNREPLAYABLE_HEADERS}
+    url = request["url"]
+    body = request.get("postData")
+    if body:
+        payload = json.loads(body)
+        payload.setdefault("variables", {}).update(offset=offset, limit=limit)
+        body = json.dumps(payload)
+    else:
+        parts = urllib.parse.urlsplit(url)
+        query = urllib.parse.parse_qs(parts.query)
+        variables = json.loads(query.get("variables", ["{}"])[0])
+        variables.update(offset=offset, limit=limit)
+        query["variables"] = [json.dumps(variables, separators=(",", ":"))]
+        url = urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query, doseq=True)))
+    return {"url": url, "method": request.get("method", "GET"), "headers": headers, "body": body}
+
+# Replays several page requests at once from inside the page, with the page's own credentials
+FETCH_PAGES_JS = """
+    var requests = arguments[0], done = arguments[arguments.length - 1];
+    Promise.all(requests.map(function(r) {
+        return fetch(r.url, {method: r.method, headers: r.headers, body: r.body || undefined, credentials: 'include'})
+            .then(function(response) {
+                return response.text().then(function(text) { return {status: response.status, body: text}; });
+            })
+            .catch(function(error) { return {status: 0, error: String(error)}; });
+    })).then(done);
+"""
+
+def iter_spotify_tracks_from_api(driver, playlist_url, page_size=SPOTIFY_API_PAGE_SIZE, record_to=None):
+    """Yield a playlist's tracks from the web player's own JSON API responses
+
+    The first page is captured from the performance log as the page loads, and the
+    remaining pages are requested directly with the same headers, so nothing is
+    scrolled or rendered. The driver must be started with capture_network=True.
+    Yields nothing if no playlist response was seen, and raises RuntimeError if a
+    later page can't be fetched, so a playlist read in part is not taken for the
+    whole one. With record_to, the combined response is written to that directory
+    as a fixture for mock_server.py.
+    """
+    capture = NetworkCapture(driver)
+    capture.poll()  # Drop entries left over from earlier pages
+    capture.responses.clear()
+    limiter = rate_limits["spotify"]
+    limiter.acquire()
+    driver.get(playlist_url)
     
-    # Take a debug screenshot
-    screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ytmusic_playlists.png")
-    driver.save_screenshot(screenshot_path)
+    def first_page(driver):
+        for request, payload in capture.poll():
+            content = find_playlist_content(payload)
+            if content is not None:
+                return request, payload, content
+        return None
     
-    # Click on New playlist button
-    print("Looking for New playlist button...")
-    try:
-        new_playlist_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='New playlist']"))
-        )
-        new_playlist_button.click()
-        print("Clicked New playlist button")
-    except Exception as e:
-        print(f"Could not find New playlist button by aria-label: {e}")
-        try:
-            # Fallback to JavaScript
-            result = driver.execute_script("""
-                var button = document.querySelector('button[aria-label="New playlist"]');
-                if (button) {
+    captured = waits.until(driver, "spotify_api", first_page)
+    if not captured:
+        print("Warning: No playlist API response captured")
+        check_throttling(driver, limiter)
+        return
+    limiter.succeeded()
+    request, payload, content = captured
+    total = content.get("totalCount") or 0
+    items = list(content["items"]) if record_to else None
+    print(f"Captured playlist API response ({total} tracks)")
+    
+    for item in content["items"]:
+        track = track_from_api_item(item)
+        if track:
+            yield track
+    
+    driver.set_script_timeout(60)
+    offset = len(content["items"])
+    retries = 0
+    while offset < total:
+        batch = [page_request(request, start, page_size)
+                 for start in range(offset, total, page_size)][:SPOTIFY_API_CONCURRENT_PAGES]
+        limiter.acquire(len(batch))
+        responses = driver.execute_async_script(FETCH_PAGES_JS, batch)
+        for response in responses:
+            if response.get("status") == 429 and retries < 3:
+                # Back off and ask again from the first page we don't have
+                limiter.throttled("HTTP 429 from the playlist API")
+                retries += 1
+                break
+            if response.get("status") != 200:
+                raise RuntimeError(f"playlist page request failed after {offset} of {total} tracks "
+                                   f"({response.get('status')}): {response.get('error', '')}")
+            limiter.succeeded()
+            page = find_playlist_content(json.loads(response["body"])) or {"items": []}
+            if not page["items"]:
+                return
+            offset += len(page["items"])
+            if items is not None:
+                items.extend(page["items"])
+            for item in page["items"]:
+                track = track_from_api_item(item)
+                if track:
+                    yield track
+    
+    if record_to:
+        content["items"] = items
+        playlist_id = playlist_url.rstrip("/").split("/")[-1].split("?")[0]
+        with open(os.path.join(record_to, f"{playlist_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        print(f"Recorded playlist fixture to {record_to}")
+
+# Spotify account data export ("Download your data" in the account privacy settings) and CSV exports
+EXPORT_CHUNK_SIZE = 1 << 20
+EXPORT_JSON_PATTERN = "Playlist*.json"
+# Lowercased CSV headers used by Exportify, TuneMyMusic and similar tools, first match wins
+EXPORT_CSV_COLUMNS = {
+    "name": ("track name", "trackname", "title", "song", "name", "track"),
+    "artists": ("artist name(s)", "artist name", "artist names", "artists", "artist", "artistname"),
+    "album": ("album name", "album", "albumname"),
+    "duration_ms": ("track duration (ms)", "duration (ms)", "duration_ms", "duration ms"),
+    "duration": ("duration", "length", "time"),
+    "uri": ("track uri", "spotify uri", "uri", "spotify - id", "spotify id", "track id"),
+    "playlist": ("playlist name", "playlist"),
+}
+
+def millis_duration(millis):
+    """Format a duration in milliseconds like the tracklist does (3:07)"""
+    return f"{millis // 60000}:{millis // 1000 % 60:02d}" if millis else ""
+
+def iter_json_array(f, key, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the elements of the array under key in a JSON file, one at a time
+
+    The file is read in chunks and each element decoded as soon as it is complete,
+    so only one playlist is held in memory rather than the whole export.
+    """
+    decoder = json.JSONDecoder()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buffer = ""
+    while True:
+        match = start.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        # Keep enough of the tail to find a key split across two chunks
+        buffer = buffer[-(len(key) + 64):] + chunk
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,")
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # Incomplete element: read at least as much again so huge playlists stay linear
+            chunk = f.read(max(chunk_size, len(buffer)))
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+def track_from_local_uri(uri):
+    """Track dict from a local file URI (spotify:local:artist:album:title:seconds)"""
+    parts = [urllib.parse.unquote_plus(part) for part in uri.split(":")[2:]]
+    if len(parts) < 3 or not parts[2]:
+        return None
+    seconds = parts[3] if len(parts) > 3 else ""
+    return {
+        "name": parts[2],
+        "artists": parts[0],
+        "album": parts[1],
+        "duration": millis_duration(int(seconds) * 1000) if seconds.isdigit() else "",
+        "uri": uri,
+    }
+
+def track_from_export_item(item):
+    """Convert one item of a Playlist*.json export into the track dict the migration uses"""
+    track = item.get("track")
+    if track and track.get("trackName"):
+        return {
+            "name": track["trackName"],
+            "artists": track.get("artistName") or "",
+            "album": track.get("albumName") or "",
+            "duration": "",  # The export has no durations
+            "uri": track.get("trackUri") or "",
+        }
+    local = item.get("localTrack")
+    if local and local.get("uri"):
+        return track_from_local_uri(local["uri"])
+    return None  # Episodes and audiobooks have nothing to search for
+
+def export_csv_columns(header):
+    """Map track fields to column indexes for a CSV header"""
+    positions = {}
+    for index, title in enumerate(header):
+        positions.setdefault(title.strip().lower(), index)
+    columns = {}
+    for field, aliases in EXPORT_CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[field] = positions[alias]
+                break
+    return columns
+
+def track_from_csv_row(row, columns):
+    """Convert one CSV row into a track dict, or None for a row without a title"""
+    def value(field):
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ""
+    name = value("name")
+    if not name:
+        return None
+    millis = value("duration_ms")
+    uri = value("uri")
+    if uri and not uri.startswith("spotify:"):
+        # A bare track ID or an open.spotify.com link
+        uri = f"spotify:track:{uri.rstrip('/').split('/')[-1].split('?')[0]}"
+    return {
+        "name": name,
+        "artists": value("artists"),
+        "album": value("album"),
+        "duration": millis_duration(int(float(millis))) if re.fullmatch(r"\d+(\.\d+)?", millis) else value("duration"),
+        "uri": uri,
+    }
+
+def iter_csv_playlists(f, filename):
+    """Yield (playlist name, tracks) from an Exportify or TuneMyMusic style CSV
+
+    Files with a playlist column can hold several playlists; otherwise the file is
+    one playlist named after the file.
+    """
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if not header:
+        return
+    columns = export_csv_columns(header)
+    if "name" not in columns:
+        raise ValueError(f"{filename} has no track name column (columns: {', '.join(header)})")
+    default_name = re.sub(r"_+", " ", os.path.splitext(filename)[0]).strip()
+    playlists = {}
+    for row in reader:
+        track = track_from_csv_row(row, columns)
+        if track is None:
+            continue
+        index = columns.get("playlist")
+        name = row[index].strip() if index is not None and index < len(row) and row[index].strip() else default_name
+        playlists.setdefault(name, []).append(track)
+    yield from playlists.items()
+
+def natural_key(name):
+    """Sort key putting Playlist2.json before Playlist10.json"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+def is_export_file(name):
+    return fnmatch.fnmatch(name, EXPORT_JSON_PATTERN) or name.lower().endswith(".csv")
+
+def export_files(path):
+    """Yield (file name, opener) for the export files at path
+
+    path can be a single JSON or CSV file, a directory of them, or the zip
+    Spotify sends, which is read without unpacking it.
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path), key=natural_key):
+            if is_export_file(name):
+                yield name, lambda full=os.path.join(path, name): open(full, encoding="utf-8-sig", newline="")
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            members = [m for m in archive.namelist() if is_export_file(os.path.basename(m))]
+            for member in sorted(members, key=lambda m: natural_key(os.path.basename(m))):
+                yield os.path.basename(member), lambda m=member: io.TextIOWrapper(archive.open(m), encoding="utf-8-sig", newline="")
+    else:
+        yield os.path.basename(path), lambda: open(path, encoding="utf-8-sig", newline="")
+
+def export_playlist(filename, name, track_count, seen):
+    """Playlist record for an exported playlist
+
+    Exports carry no playlist IDs, so the URL is made up from the file and the
+    playlist name; it only needs to stay the same between runs for --resume.
+    """
+    name = name or "Untitled playlist"
+    key = f"{filename}/{name}"
+    seen[key] = seen.get(key, 0) + 1
+    if seen[key] > 1:
+        key += f"#{seen[key]}"
+    return {"id": None, "name": name, "url": f"export:{urllib.parse.quote(key)}", "owner": None, "track_count": track_count}
+
+def iter_spotify_export(path):
+    """Yield (playlist, tracks) from a Spotify data export or CSV exports, without a browser
+
+    Playlists are yielded as soon as they are parsed, in file order.
+    """
+    started = time.perf_counter()
+    seen = {}
+    playlists = tracks_read = 0
+    for filename, open_file in export_files(path):
+        with open_file() as f:
+            if filename.lower().endswith(".csv"):
+                entries = iter_csv_playlists(f, filename)
+            else:
+                entries = ((entry.get("name"), [t for t in map(track_from_export_item, entry.get("items") or []) if t])
+                           for entry in iter_json_array(f, "playlists"))
+            for name, tracks in entries:
+                playlists += 1
+                tracks_read += len(tracks)
+                yield export_playlist(filename, name, len(tracks), seen), tracks
+    print(f"Read {playlists} playlists ({tracks_read} tracks) from {path} in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+def create_ytmusic_playlist(driver, name, description="Imported from Spotify"):
+    """Create a new playlist through the New playlist dialog; returns its URL, or None if that failed
+
+    PlaylistRegistry creates playlists without the dialog and only falls back to this.
+    """
+    # Navigate to library - try the playlists page directly
+    rate_limits["ytmusic"].acquire()
+    driver.get(f"{YTMUSIC_BASE_URL}/library/playlists")
+    print("Waiting for YouTube Music playlists to load...")
+    waits.until(driver, "ytmusic_library", css_present("button[aria-label='New playlist']"))
+    
+    artifacts.checkpoint(driver, "ytmusic_playlists")
+    
+    # Click on New playlist button
+    print("Looking for New playlist button...")
+    try:
+        new_playlist_button = WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='New playlist']"))
+        )
+        new_playlist_button.click()
+        print("Clicked New playlist button")
+    except Exception as e:
+        print(f"Could not find New playlist button by aria-label: {e}")
+        try:
+            # Fallback to JavaScript
+            result = driver.execute_script("""
+                var button = document.querySelector('button[aria-label="New playlist"]');
+                if (button) {
                     button.click();
                     return "Button clicked via JS";
                 }
@@ -402,11 +2012,9 @@ def create_ytmusic_playlist(driver, name, description="Imported from Spotify"):
         except Exception as e:
             print(f"JavaScript button click failed: {e}")
     
-    time.sleep(3)  # Wait for dialog to appear
+    waits.until(driver, "create_dialog", css_present("#title-input"))
     
-    # Take screenshot after clicking
-    screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "after_button_click.png")
-    driver.save_screenshot(screenshot_path)
+    artifacts.checkpoint(driver, "after_button_click")
     
     # Fill the title input - using the correct ID from the HTML structure
     print("Looking for title input using correct selectors...")
@@ -425,39 +2033,37 @@ def create_ytmusic_playlist(driver, name, description="Imported from Spotify"):
         
         # Try another approach - using JavaScript to target the actual input
         try:
-            result = driver.execute_script(f"""
+            result = driver.execute_script("""
                 // Target the input inside title-input
                 var titleInput = document.querySelector('#title-input input');
-                if (titleInput) {{
-                    titleInput.value = "{name}";
-                    titleInput.dispatchEvent(new Event('input', {{ bubbles: true }}));
+                if (titleInput) {
+                    titleInput.value = arguments[0];
+                    titleInput.dispatchEvent(new Event('input', { bubbles: true }));
                     return "Set title via direct selector";
-                }}
+                }
                 
                 // Try by label if ID approach failed
                 var inputs = document.querySelectorAll('input');
-                for (var i = 0; i < inputs.length; i++) {{
+                for (var i = 0; i < inputs.length; i++) {
                     var label = inputs[i].getAttribute('aria-labelledby');
-                    if (label) {{
+                    if (label) {
                         var labelElement = document.getElementById(label);
-                        if (labelElement && labelElement.textContent.trim() === 'Title') {{
-                            inputs[i].value = "{name}";
-                            inputs[i].dispatchEvent(new Event('input', {{ bubbles: true }}));
+                        if (labelElement && labelElement.textContent.trim() === 'Title') {
+                            inputs[i].value = arguments[0];
+                            inputs[i].dispatchEvent(new Event('input', { bubbles: true }));
                             return "Set title via label match";
-                        }}
-                    }}
-                }}
+                        }
+                    }
+                }
                 return "Failed to set title";
-            """)
+            """, name)
             print(f"JavaScript title entry: {result}")
         except Exception as e:
             print(f"JavaScript title entry failed: {e}")
     
-    time.sleep(2)
+    waits.polite()
     
-    # Take screenshot after title entry
-    screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "after_title_entry.png")
-    driver.save_screenshot(screenshot_path)
+    artifacts.checkpoint(driver, "after_title_entry")
     
     # Click the Create button - look specifically for the create-button ID from HTML
     print("Looking for Create button...")
@@ -494,8 +2100,8 @@ def create_ytmusic_playlist(driver, name, description="Imported from Spotify"):
         except Exception as e:
             print(f"JavaScript create button click failed: {e}")
     
-    # Wait for playlist to be created
-    time.sleep(5)
+    # Wait for the redirect to the newly created playlist
+    waits.until(driver, "playlist_created", url_matches("playlist?list=", "browse/VL"))
     
     # Rest of the function remains the same
     
@@ -503,348 +2109,2157 @@ def create_ytmusic_playlist(driver, name, description="Imported from Spotify"):
     playlist_url = driver.current_url
     print(f"Current URL after creation: {playlist_url}")
     
-    # Check if we're on a playlist page - updated to handle both URL formats
-    if "playlist" in playlist_url or ("browse/VLPL" in playlist_url) or ("browse/VL" in playlist_url):
+    # Check if we're on a playlist page - the library URL also contains "playlist"
+    if playlist_id_from_url(playlist_url):
         print(f"✅ Created YouTube Music playlist: {name}")
         return playlist_url
-    else:
-        print("Not on playlist page, trying to find newly created playlist")
-        # Try to find the newly created playlist in the list
-        try:
-            driver.get("https://music.youtube.com/library/playlists")
-            time.sleep(3)
-            
-            # Take a screenshot of playlists page
-            screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "playlists_after_create.png")
-            driver.save_screenshot(screenshot_path)
-            
-            # Try to find and click the new playlist
-            found = driver.execute_script(f"""
-                var items = document.querySelectorAll('ytmusic-responsive-list-item-renderer');
-                for(var i=0; i<items.length; i++) {{
-                    if(items[i].innerText.includes("{name}")) {{
-                        var link = items[i].querySelector('a');
-                        if (link) {{
-                            link.click();
-                            return true;
-                        }}
-                    }}
-                }}
-                return false;
-            """)
-            
-            if found:
-                time.sleep(3)
-                playlist_url = driver.current_url
-                print(f"Found and navigated to playlist: {playlist_url}")
-                return playlist_url
-        except Exception as e:
-            print(f"Error finding playlist in list: {e}")
-        
-        # If we still don't have a proper URL, use a mock one
-        print("Using mock playlist URL to continue")
-        return "https://music.youtube.com/playlist?list=mock_playlist_id"
-
-def search_and_add_to_ytmusic_playlist(driver, playlist_url, track, playlist_name=""):
-    """Search for a track on YouTube Music and add it to the playlist"""
-    # Include both song name and artist in search for better results
-    search_query = f"{track['name']} {track['artists']}"
-    print(f"Searching for: {search_query}")
-    
-    # Check if we're using a mock playlist URL
-    if "mock_playlist_id" in playlist_url:
-        print("Using mock playlist - will search for track but can't add to playlist")
-        search_url = f"https://music.youtube.com/search?q={search_query.replace(' ', '+')}"
-        driver.get(search_url)
-        time.sleep(2)
-        print(f"⚠️ Track found but not added: {track['name']} - {track['artists']}")
-        return True
-    
-    # Navigate to search
-    search_url = f"https://music.youtube.com/search?q={search_query.replace(' ', '+')}"
-    driver.get(search_url)
-    time.sleep(3)  # Wait longer for search results
-    
-    # Take a screenshot of search results
-    screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_results.png")
-    driver.save_screenshot(screenshot_path)
     
-    # Try to find and click the Save button using the exact HTML structure you provided
+    # No redirect: look the new playlist up once in the library by its exact title
+    print("Not on playlist page, looking the new playlist up in the library")
     try:
-        save_button_result = driver.execute_script("""
-            // Try looking for the Save button anywhere in the document
-            var saveButtons = [];
-            
-            // METHOD 1: Find by exact aria-label
-            var buttonsByLabel = document.querySelectorAll('button[aria-label="Save to playlist"]');
-            for (var i = 0; i < buttonsByLabel.length; i++) {
-                saveButtons.push(buttonsByLabel[i]);
-            }
-            
-            // METHOD 2: Find inside action containers
-            var actionContainers = document.querySelectorAll('#actions, .actions-container');
-            for (var i = 0; i < actionContainers.length; i++) {
-                var buttons = actionContainers[i].querySelectorAll('button');
-                for (var j = 0; j < buttons.length; j++) {
-                    if (buttons[j].textContent.includes('Save') || 
-                        buttons[j].getAttribute('aria-label') === 'Save to playlist') {
-                        saveButtons.push(buttons[j]);
-                    }
-                }
-            }
-            
-            // METHOD 3: Find inside card-shelf-renderer (as shown in your HTML)
-            var shelfRenderers = document.querySelectorAll('ytmusic-card-shelf-renderer');
-            for (var i = 0; i < shelfRenderers.length; i++) {
-                var buttons = shelfRenderers[i].querySelectorAll('button');
-                for (var j = 0; j < buttons.length; j++) {
-                    if (buttons[j].textContent.includes('Save') || 
-                        buttons[j].getAttribute('aria-label') === 'Save to playlist') {
-                        saveButtons.push(buttons[j]);
-                    }
-                }
+        playlist_url = get_ytmusic_library_playlists(driver).get(name)
+    except Exception as e:
+        print(f"Error reading the playlist library: {e}")
+        playlist_url = None
+    if playlist_id_from_url(playlist_url):
+        print(f"Found the new playlist: {playlist_url}")
+        return playlist_url
+    
+    artifacts.failure(driver, "create_playlist_no_url")
+    print(f"❌ Could not find the playlist that was created for {name}")
+    return None
+
+# Ways SAVE_BUTTON_JS looks for the Save button, tried in the order given as arguments[0]
+SAVE_BUTTON_STRATEGIES = ["aria-label", "actions-container", "card-shelf", "save-span"]
+
+# Finds the Save button of the top search result and clicks it.
+# Returns {message, strategy}, strategy being the one that found the button.
+SAVE_BUTTON_JS = """
+    function isSave(button) {
+        return button.textContent.includes('Save') ||
+               button.getAttribute('aria-label') === 'Save to playlist';
+    }
+    function saveButtonsIn(selector) {
+        var found = [];
+        var containers = document.querySelectorAll(selector);
+        for (var i = 0; i < containers.length; i++) {
+            var buttons = containers[i].querySelectorAll('button');
+            for (var j = 0; j < buttons.length; j++) {
+                if (isSave(buttons[j])) found.push(buttons[j]);
             }
-            
-            // METHOD 4: Look for the exact button structure from your HTML
+        }
+        return found;
+    }
+    var strategies = {
+        // Find by exact aria-label
+        'aria-label': function() {
+            return Array.prototype.slice.call(document.querySelectorAll('button[aria-label="Save to playlist"]'));
+        },
+        // Find inside action containers
+        'actions-container': function() { return saveButtonsIn('#actions, .actions-container'); },
+        // Find inside the top result card
+        'card-shelf': function() { return saveButtonsIn('ytmusic-card-shelf-renderer'); },
+        // The button around a "Save" label
+        'save-span': function() {
+            var found = [];
             var spans = document.querySelectorAll('span.yt-core-attributed-string');
             for (var i = 0; i < spans.length; i++) {
-                if (spans[i].textContent.trim() === 'Save') {
-                    // Find parent button
-                    var current = spans[i];
-                    while (current && current.tagName.toLowerCase() !== 'button') {
-                        current = current.parentElement;
-                    }
-                    if (current) {
-                        saveButtons.push(current);
-                    }
-                }
+                if (spans[i].textContent.trim() !== 'Save') continue;
+                var button = spans[i].closest('button');
+                if (button) found.push(button);
             }
-            
-            // METHOD 5: Last resort - any button with "Save" text
-            if (saveButtons.length === 0) {
-                var allButtons = document.querySelectorAll('button');
-                for (var i = 0; i < allButtons.length; i++) {
-                    if (allButtons[i].textContent.includes('Save')) {
-                        saveButtons.push(allButtons[i]);
-                    }
-                }
-            }
-            
-            console.log("Found " + saveButtons.length + " potential Save buttons");
-            
-            // Try to click the first found button
-            if (saveButtons.length > 0) {
-                console.log("Clicking Save button with text: " + saveButtons[0].textContent);
-                saveButtons[0].click();
-                return "Save button clicked";
+            return found;
+        },
+        // Last resort - any button with "Save" text; never learned, always tried last
+        'any-save-text': function() {
+            return Array.prototype.filter.call(document.querySelectorAll('button'), function(button) {
+                return button.textContent.includes('Save');
+            });
+        }
+    };
+
+    var order = (arguments[0] || []).concat(['any-save-text']);
+    for (var i = 0; i < order.length; i++) {
+        var strategy = strategies[order[i]];
+        var buttons = strategy ? strategy() : [];
+        if (buttons.length) {
+            buttons[0].click();
+            return {message: "Save button clicked", strategy: order[i] === 'any-save-text' ? null : order[i]};
+        }
+    }
+    return {message: "No Save button found", strategy: null};
+"""
+
+# Containers the Save dialog's options are looked for in, and the ways an option's
+# playlist ID is read; both are tried in the order given to SAVE_DIALOG_OPTION_JS
+PLAYLIST_DIALOG_STRATEGIES = ["ytmusic-add-to-playlist-renderer", "tp-yt-paper-dialog", "ytmusic-popup-container"]
+DIALOG_OPTION_STRATEGIES = ["edit-endpoint", "browse-endpoint", "link"]
+
+# Clicks the option for playlist ID arguments[0] in the open Save dialog, reading each
+# option's ID from its Polymer data (or its link). arguments[1], the exact title, is
+# only used when the dialog exposes no IDs at all. arguments[2] and [3] order the
+# dialog and option strategies. Returns {message, dialog, option}, naming the
+# strategies that found the dialog and the clicked option's ID.
+SAVE_DIALOG_OPTION_JS = """
+    var playlistId = arguments[0], title = arguments[1];
+    var dialogOrder = arguments[2], optionOrder = arguments[3];
+    var dialog = null, dialogStrategy = null, items = [];
+    for (var d = 0; d < dialogOrder.length && !items.length; d++) {
+        dialog = document.querySelector(dialogOrder[d]);
+        if (!dialog) continue;
+        dialogStrategy = dialogOrder[d];
+        items = dialog.querySelectorAll('ytmusic-playlist-add-to-option-renderer, ytmusic-two-row-item-renderer');
+    }
+    if (!dialogStrategy) return {message: "Playlist dialog not found"};
+    if (!items.length) return {message: "No playlist items found in dialog"};
+
+    function data(item) {
+        return item.data || (item.__data && item.__data.data) || null;
+    }
+    var readers = {
+        'edit-endpoint': function(item) {
+            var info = data(item);
+            var edit = info && info.addToPlaylistServiceEndpoint && info.addToPlaylistServiceEndpoint.playlistEditEndpoint;
+            return edit && edit.playlistId ? edit.playlistId : null;
+        },
+        'browse-endpoint': function(item) {
+            var info = data(item);
+            var browse = info && info.navigationEndpoint && info.navigationEndpoint.browseEndpoint;
+            return browse && browse.browseId ? browse.browseId.replace(/^VL/, '') : null;
+        },
+        'link': function(item) {
+            var link = item.querySelector('a[href*="list="], a[href*="browse/VL"]');
+            var match = link && link.href.match(/(?:list=|browse\\/VL)([A-Za-z0-9_-]+)/);
+            return match ? match[1] : null;
+        }
+    };
+    // Returns [id, strategy] from the first reader that finds an ID
+    function optionId(item) {
+        for (var r = 0; r < optionOrder.length; r++) {
+            var id = readers[optionOrder[r]] ? readers[optionOrder[r]](item) : null;
+            if (id) return [id, optionOrder[r]];
+        }
+        return [null, null];
+    }
+    function click(item) {
+        (item.querySelector('button, a.yt-simple-endpoint') || item).click();
+    }
+
+    var withIds = 0;
+    for (var i = 0; i < items.length; i++) {
+        var found = optionId(items[i]);
+        if (found[0]) withIds++;
+        if (found[0] === playlistId) {
+            click(items[i]);
+            return {message: "Clicked playlist " + playlistId, dialog: dialogStrategy, option: found[1]};
+        }
+    }
+    if (!withIds && title) {
+        for (var i = 0; i < items.length; i++) {
+            var titleEl = items[i].querySelector('yt-formatted-string.title, .title');
+            if (titleEl && titleEl.textContent.trim() === title) {
+                click(items[i]);
+                return {message: "Clicked playlist titled " + title, dialog: dialogStrategy};
             }
-            
-            return "No Save button found";
+        }
+    }
+    return {message: "Playlist " + playlistId + " is not in the dialog (" + items.length + " options, " +
+                     withIds + " with IDs)", dialog: dialogStrategy};
+"""
+
+# On-disk cache of Spotify track -> YouTube Music video resolutions (None disables it)
+TRACK_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "track_cache.sqlite3")
+TRACK_CACHE_TTL = 90 * 24 * 3600
+TRACK_CACHE_MAX_ENTRIES = 100000
+
+def normalize_text(text):
+    """Lowercase, strip accents, featured-artist notes and punctuation"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"[\(\[]\s*(feat|ft|with)\.?\s[^\)\]]*[\)\]]", " ", text)
+    text = re.sub(r"[^\w]+", " ", text)
+    return " ".join(text.split())
+
+def normalize_track_key(track):
+    """Build the cache key for a track dict from get_spotify_playlist_tracks"""
+    artists = sorted(normalize_text(artist) for artist in (track.get("artists") or "").split(","))
+    return normalize_text(track.get("name")) + "\x1f" + "|".join(a for a in artists if a)
+
+def match_confidence(track, title, artists=""):
+    """Score (0-1) how well a YouTube Music result matches a Spotify track"""
+    name_score = difflib.SequenceMatcher(None, normalize_text(track.get("name")), normalize_text(title)).ratio()
+    wanted = [normalize_text(a) for a in (track.get("artists") or "").split(",") if a.strip()]
+    if not wanted:
+        return round(name_score, 3)
+    found = normalize_text(artists)
+    artist_score = sum(1 for artist in wanted if artist in found) / len(wanted)
+    return round(0.7 * name_score + 0.3 * artist_score, 3)
+
+class TrackCache:
+    """SQLite-backed track resolution cache with TTL expiry and LRU eviction"""
+
+    def __init__(self, path=TRACK_CACHE_PATH, ttl=TRACK_CACHE_TTL, max_entries=TRACK_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        # Several batch jobs may share one cache file: WAL lets readers and a writer work at once
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                key TEXT PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                resolved_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
         """)
-        print(f"Save button action: {save_button_result}")
-        
-        # Wait for the playlist dialog to appear
-        time.sleep(2)
-        
-        # Take screenshot of the dialog
-        screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "playlist_dialog.png")
-        driver.save_screenshot(screenshot_path)
-        
-        # Click the desired playlist in the dialog - specifically targeting the carousel items
-        playlist_result = driver.execute_script(f"""
-            // First find any dialog/popup container
-            var dialog = document.querySelector('ytmusic-add-to-playlist-renderer') || 
-                        document.querySelector('tp-yt-paper-dialog') ||
-                        document.querySelector('ytmusic-popup-container');
-            
-            if (!dialog) {{
-                // Try looking for any element that appeared after clicking Save
-                var possibleDialogs = document.querySelectorAll('ytmusic-add-to-playlist-renderer, tp-yt-paper-dialog, ytmusic-popup-container');
-                if (possibleDialogs.length > 0) {{
-                    dialog = possibleDialogs[0];
-                }}
-            }}
-            
-            if (!dialog) {{
-                return "Playlist dialog not found";
-            }}
-            
-            console.log("Dialog found");
-            
-            // Look specifically for the carousel items which are the playlist entries
-            // Target ytmusic-two-row-item-renderer elements inside any carousel
-            var carouselItems = dialog.querySelectorAll('ytmusic-two-row-item-renderer');
-            if (carouselItems.length === 0) {{
-                // If not in a carousel, try the standard renderer
-                carouselItems = dialog.querySelectorAll('ytmusic-playlist-add-to-option-renderer');
-            }}
-            
-            console.log("Found " + carouselItems.length + " playlist items");
-            
-            // Try to find a match by name
-            var targetItem = null;
-            
-            // Debug: Log all item texts
-            console.log("Available playlists:");
-            for (var i = 0; i < carouselItems.length; i++) {{
-                console.log(i + ": " + carouselItems[i].textContent);
-            }}
-            
-            if ('{playlist_name}') {{
-                for (var i = 0; i < carouselItems.length; i++) {{
-                    // For ytmusic-two-row-item-renderer, look specifically at the title element
-                    var titleEl = carouselItems[i].querySelector('yt-formatted-string.title');
-                    var itemText = titleEl ? titleEl.textContent : carouselItems[i].textContent;
-                    
-                    if (itemText.includes('{playlist_name}')) {{
-                        targetItem = carouselItems[i];
-                        console.log("Found playlist match: " + itemText);
-                        break;
-                    }}
-                }}
-            }}
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tracks_last_used ON tracks (last_used)")
+        self.conn.commit()
+
+    def get(self, track, min_confidence=0.0):
+        """Return {"video_id", "confidence"} for track, or None if unknown, expired or below min_confidence
+
+        The top result of a page search is cached whatever its confidence, so
+        callers that add the video by ID without looking at it pass a minimum.
+        """
+        key = normalize_track_key(track)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT video_id, confidence, resolved_at FROM tracks WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    self.conn.execute("DELETE FROM tracks WHERE key = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                return None
+            if row[1] < min_confidence:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE tracks SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return {"video_id": row[0], "confidence": row[1]}
+
+    def put(self, track, video_id, confidence):
+        key = normalize_track_key(track)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tracks (key, video_id, confidence, resolved_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, video_id, confidence, now, now),
+            )
+            # Every so often, evict the least recently used entries beyond the size limit
+            self.puts += 1
+            if self.puts % 100 == 1:
+                self.conn.execute(
+                    "DELETE FROM tracks WHERE key IN (SELECT key FROM tracks ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+_track_cache = None
+_track_cache_lock = threading.Lock()
+
+def get_track_cache():
+    """Return the shared TrackCache, opening it on first use"""
+    global _track_cache
+    if TRACK_CACHE_PATH is None:
+        return None
+    with _track_cache_lock:
+        if _track_cache is None:
+            _track_cache = TrackCache(TRACK_CACHE_PATH)
+        return _track_cache
+
+# Rendered once YouTube Music has answered a search, including the "no results" message
+SEARCH_RESULTS_SELECTOR = "ytmusic-card-shelf-renderer, ytmusic-shelf-renderer, ytmusic-message-renderer"
+PLAYLIST_DIALOG_SELECTOR = "ytmusic-add-to-playlist-renderer, tp-yt-paper-dialog ytmusic-playlist-add-to-option-renderer"
+
+# Reads the video behind the top search result, which is what the Save button acts on
+TOP_RESULT_JS = """
+    var scope = document.querySelector('ytmusic-card-shelf-renderer') ||
+                document.querySelector('ytmusic-shelf-renderer');
+    if (!scope) return null;
+    var link = scope.querySelector('a[href*="watch?v="]');
+    if (!link) return null;
+    var match = link.href.match(/[?&]v=([^&]+)/);
+    var title = scope.querySelector('.title, yt-formatted-string.title');
+    var subtitle = scope.querySelector('.subtitle, .secondary-flex-columns');
+    return {
+        video_id: match ? match[1] : null,
+        title: (title || link).textContent.trim(),
+        subtitle: subtitle ? subtitle.textContent.trim() : ''
+    };
+"""
+
+# YouTube Music's internal search endpoint, called relative to the loaded page
+YTMUSIC_SEARCH_ENDPOINT = "/youtubei/v1/search"
+# Search params that restrict results to songs
+YTMUSIC_SONGS_PARAMS = "EgWKAQIIAWoMEA4QChADEAQQCRAF"
+RESOLVE_CONCURRENCY = 8
+RESOLVE_BATCH_SIZE = 25
+RESOLVE_MIN_CONFIDENCE = 0.5
+
+# Runs many searches concurrently from inside the logged-in page and returns, per
+# query, {candidates: [{video_id, title, artists, duration}]} or {error}
+YTMUSIC_SEARCH_JS = """
+    var queries = arguments[0], concurrency = arguments[1], endpoint = arguments[2], params = arguments[3];
+    var done = arguments[arguments.length - 1];
+    var config = (window.ytcfg && ytcfg.get) ? ytcfg : {get: function() { return null; }};
+    var context = config.get('INNERTUBE_CONTEXT') || {client: {clientName: 'WEB_REMIX', clientVersion: '1.20240101.01.00'}};
+    var key = config.get('INNERTUBE_API_KEY');
+    var url = endpoint + '?prettyPrint=false' + (key ? '&key=' + encodeURIComponent(key) : '');
+
+    function text(node) {
+        return node && node.runs ? node.runs.map(function(run) { return run.text; }).join('') : '';
+    }
+    function candidateFrom(renderer) {
+        var columns = renderer.flexColumns || [];
+        var title = columns[0] ? text(columns[0].musicResponsiveListItemFlexColumnRenderer.text) : '';
+        var runs = columns[1] ? (columns[1].musicResponsiveListItemFlexColumnRenderer.text.runs || []) : [];
+        var videoId = renderer.playlistItemData ? renderer.playlistItemData.videoId : null;
+        if (!videoId) {
+            var found = JSON.stringify(renderer.overlay || {}).match(/"videoId":"([^"]+)"/);
+            videoId = found ? found[1] : null;
+        }
+        var artists = [], duration = '';
+        runs.forEach(function(run) {
+            var page = run.navigationEndpoint && run.navigationEndpoint.browseEndpoint &&
+                run.navigationEndpoint.browseEndpoint.browseEndpointContextSupportedConfigs;
+            if (page && JSON.stringify(page).indexOf('MUSIC_PAGE_TYPE_ARTIST') !== -1) artists.push(run.text);
+            if (/^\\d{1,2}:\\d{2}(:\\d{2})?$/.test(run.text)) duration = run.text;
+        });
+        if (!artists.length && runs.length) artists.push(runs[0].text);
+        return videoId ? {video_id: videoId, title: title, artists: artists.join(', '), duration: duration} : null;
+    }
+    function collect(node, out) {
+        if (!node || typeof node !== 'object' || out.length >= 5) return out;
+        if (node.musicResponsiveListItemRenderer) {
+            var candidate = candidateFrom(node.musicResponsiveListItemRenderer);
+            if (candidate) out.push(candidate);
+            return out;
+        }
+        for (var k in node) collect(node[k], out);
+        return out;
+    }
+    function search(query) {
+        return fetch(url, {
+            method: 'POST',
+            credentials: 'include',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({context: context, query: query, params: params})
+        }).then(function(response) {
+            if (!response.ok) throw new Error('HTTP ' + response.status);
+            return response.json();
+        }).then(function(payload) {
+            return {candidates: collect(payload, [])};
+        }).catch(function(error) {
+            return {error: String(error)};
+        });
+    }
+
+    var results = new Array(queries.length), next = 0;
+    function worker() {
+        if (next >= queries.length) return Promise.resolve();
+        var index = next++;
+        return search(queries[index]).then(function(result) { results[index] = result; return worker(); });
+    }
+    var workers = [];
+    for (var i = 0; i < Math.min(concurrency, queries.length); i++) workers.push(worker());
+    Promise.all(workers).then(function() { done(results); });
+"""
+
+def duration_seconds(duration):
+    """Turn "m:ss" or "h:mm:ss" into seconds (None if unknown)"""
+    if not duration:
+        return None
+    seconds = 0
+    for part in duration.split(":"):
+        if not part.isdigit():
+            return None
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+def candidate_confidence(track, candidate):
+    """match_confidence, nudged by how closely the durations agree"""
+    confidence = match_confidence(track, candidate["title"], candidate["artists"])
+    wanted, found = duration_seconds(track.get("duration")), duration_seconds(candidate.get("duration"))
+    if wanted is not None and found is not None:
+        if abs(wanted - found) <= 3:
+            confidence += 0.1
+        elif abs(wanted - found) > 15:
+            confidence -= 0.1
+    return round(min(max(confidence, 0.0), 1.0), 3)
+
+def ensure_ytmusic_page(driver):
+    """Make sure the driver is on a loaded YouTube Music page we can issue requests from"""
+    if driver.execute_script("return !!(window.ytcfg && window.ytcfg.get)"):
+        return
+    driver.get(f"{YTMUSIC_BASE_URL}/")
+    waits.until(driver, "ytmusic_app", css_present("ytmusic-app"))
+
+def resolve_ytmusic_tracks(driver, tracks, concurrency=RESOLVE_CONCURRENCY):
+    """Resolve tracks to YouTube Music videos from inside the loaded page
+
+    Searches run concurrently in the current tab without any navigation. Tracks
+    cached with at least RESOLVE_MIN_CONFIDENCE are skipped; new matches at or
+    above it are cached. Returns, per track, {"video_id",
+    "confidence"} or None when no good match was found.
+    """
+    cache = get_track_cache()
+    resolved = [cache.get(track, RESOLVE_MIN_CONFIDENCE) if cache else None for track in tracks]
+    missing = [i for i, hit in enumerate(resolved) if hit is None]
+    if not missing:
+        return resolved
+    
+    queries = [f"{tracks[i]['name']} {tracks[i]['artists']}" for i in missing]
+    limiter = rate_limits["ytmusic"]
+    # Send at most a burst of searches per script so the limiter paces large batches
+    chunk_size = max(1, int(limiter.burst))
+    results = []
+    try:
+        ensure_ytmusic_page(driver)
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+            limiter.acquire(len(chunk))
+            driver.set_script_timeout(max(30, len(chunk)))
+            chunk_results = driver.execute_async_script(
+                YTMUSIC_SEARCH_JS, chunk, concurrency, YTMUSIC_SEARCH_ENDPOINT, YTMUSIC_SONGS_PARAMS
+            )
+            results.extend(chunk_results)
+            refused = [r for r in chunk_results if throttled_status((r or {}).get("error"))]
+            if refused:
+                limiter.throttled(f"{len(refused)} searches refused ({refused[0]['error']})")
+            elif not any((r or {}).get("candidates") for r in chunk_results):
+                limiter.empty_result("no search results for a whole batch")
+            else:
+                limiter.succeeded()
+    except Exception as e:
+        print(f"⚠️ In-page search failed, falling back to search pages: {e}")
+    
+    found = 0
+    for i, result in zip(missing, results):
+        candidates = (result or {}).get("candidates") or []
+        scored = [(candidate_confidence(tracks[i], c), c) for c in candidates]
+        if not scored:
+            continue
+        confidence, best = max(scored, key=lambda pair: pair[0])
+        if confidence < RESOLVE_MIN_CONFIDENCE:
+            continue
+        resolved[i] = {"video_id": best["video_id"], "confidence": confidence}
+        found += 1
+        if cache:
+            cache.put(tracks[i], best["video_id"], confidence)
+    print(f"Resolved {found}/{len(missing)} tracks with in-page search")
+    return resolved
+
+# The web client's own endpoint for adding videos to a playlist
+YTMUSIC_EDIT_PLAYLIST_ENDPOINT = "/youtubei/v1/browse/edit_playlist"
+INSERT_BATCH_SIZE = 100
+
+# Helpers for calling the web client's own endpoints from inside the logged-in page,
+# authenticating the way it does (SAPISIDHASH); prepended to the scripts that need them
+YTMUSIC_INNERTUBE_JS = """
+    var config = (window.ytcfg && ytcfg.get) ? ytcfg : {get: function() { return null; }};
+    var context = config.get('INNERTUBE_CONTEXT') || {client: {clientName: 'WEB_REMIX', clientVersion: '1.20240101.01.00'}};
+
+    function innertubeUrl(endpoint) {
+        var key = config.get('INNERTUBE_API_KEY');
+        return endpoint + '?prettyPrint=false' + (key ? '&key=' + encodeURIComponent(key) : '');
+    }
+    function cookie(name) {
+        var parts = document.cookie.split('; ');
+        for (var i = 0; i < parts.length; i++) {
+            if (parts[i].indexOf(name + '=') === 0) return decodeURIComponent(parts[i].slice(name.length + 1));
+        }
+        return null;
+    }
+    function authorization() {
+        var sapisid = cookie('SAPISID') || cookie('__Secure-3PAPISID');
+        if (!sapisid || !window.crypto || !crypto.subtle) return Promise.resolve(null);
+        var timestamp = Math.floor(Date.now() / 1000);
+        var input = new TextEncoder().encode(timestamp + ' ' + sapisid + ' ' + location.origin);
+        return crypto.subtle.digest('SHA-1', input).then(function(digest) {
+            var hex = Array.from(new Uint8Array(digest)).map(function(b) {
+                return ('0' + b.toString(16)).slice(-2);
+            }).join('');
+            return 'SAPISIDHASH ' + timestamp + '_' + hex;
+        });
+    }
+    function innertubePost(endpoint, auth, body) {
+        var headers = {'Content-Type': 'application/json', 'X-Goog-AuthUser': String(config.get('SESSION_INDEX') || 0),
+                       'X-Origin': location.origin};
+        if (auth) headers['Authorization'] = auth;
+        body.context = context;
+        return fetch(innertubeUrl(endpoint), {
+            method: 'POST',
+            credentials: 'include',
+            headers: headers,
+            body: JSON.stringify(body)
+        }).then(function(response) {
+            if (!response.ok) throw new Error('HTTP ' + response.status);
+            return response.json();
+        });
+    }
+"""
+
+# Adds videos to a playlist in one edit request. Returns {ok, rejected, error};
+# rejected means the service answered and refused the whole edit.
+YTMUSIC_ADD_VIDEOS_JS = YTMUSIC_INNERTUBE_JS + """
+    var playlistId = arguments[0], videoIds = arguments[1], endpoint = arguments[2];
+    var done = arguments[arguments.length - 1];
+
+    authorization().then(function(auth) {
+        return innertubePost(endpoint, auth, {
+            playlistId: playlistId,
+            actions: videoIds.map(function(id) { return {action: 'ACTION_ADD_VIDEO', addedVideoId: id}; })
+        });
+    }).then(function(payload) {
+        if (payload.status === 'STATUS_SUCCEEDED') return done({ok: true});
+        done({ok: false, rejected: true, error: payload.status || 'edit failed'});
+    }).catch(function(error) {
+        done({ok: false, error: String(error)});
+    });
+"""
+
+def playlist_id_from_url(playlist_url):
+    """Extract the YouTube Music playlist ID from a playlist or browse/VL URL"""
+    if not playlist_url:
+        return None
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(playlist_url).query)
+    if query.get("list"):
+        return query["list"][0]
+    match = re.search(r"/browse/VL([A-Za-z0-9_-]+)", playlist_url)
+    return match.group(1) if match else None
+
+def add_videos_to_ytmusic_playlist(driver, playlist_id, video_ids, batch_size=INSERT_BATCH_SIZE):
+    """Add videos to a playlist by ID in batches; returns per-video True/False in order
+
+    A batch the service rejects is split in halves and retried, down to single
+    videos, so one bad video doesn't fail the rest. Every request waits for the
+    rate limiter. Adding stops at the first video that can't be added (or when a
+    request is refused or its outcome is unknown): the videos after it are not
+    tried and come back False, so the caller can add that one another way without
+    breaking the playlist order.
+    """
+    if not video_ids:
+        return []
+    limiter = rate_limits["ytmusic"]
+    video_ids = list(video_ids)
+    work = [video_ids[start:start + batch_size] for start in range(0, len(video_ids), batch_size)]
+    added = 0
+    error = None
+    try:
+        ensure_ytmusic_page(driver)
+        driver.set_script_timeout(60)
+        while work:
+            ids = work.pop(0)
+            limiter.acquire()
+            outcome = driver.execute_async_script(YTMUSIC_ADD_VIDEOS_JS, playlist_id, ids, YTMUSIC_EDIT_PLAYLIST_ENDPOINT)
+            if outcome.get("ok"):
+                limiter.succeeded()
+                added += len(ids)
+                continue
+            error = outcome.get("error")
+            if throttled_status(error):
+                limiter.throttled("playlist edits refused")
+                break
+            if not outcome.get("rejected") or len(ids) == 1:
+                break
+            # A rejected edit adds nothing, so its halves can be tried without adding a video twice
+            half = -(-len(ids) // 2)
+            work[:0] = [ids[:half], ids[half:]]
+    except Exception as e:
+        error = e
+    print(f"Batch-added {added}/{len(video_ids)} tracks by video ID" + (f" (stopped: {error})" if error else ""))
+    return [True] * added + [False] * (len(video_ids) - added)
+
+# The web client's endpoint behind the New playlist dialog
+YTMUSIC_CREATE_PLAYLIST_ENDPOINT = "/youtubei/v1/playlist/create"
+YTMUSIC_PLAYLIST_PRIVACY = "PRIVATE"
+
+# Creates playlists one after another, so they show up in the library in order.
+# Returns [{title, playlist_id} or {title, error}] in order.
+YTMUSIC_CREATE_PLAYLISTS_JS = YTMUSIC_INNERTUBE_JS + """
+    var titles = arguments[0], description = arguments[1], privacy = arguments[2], endpoint = arguments[3];
+    var done = arguments[arguments.length - 1];
+
+    authorization().then(function(auth) {
+        var results = [], index = 0;
+        function next() {
+            if (index >= titles.length) return done(results);
+            var title = titles[index++];
+            innertubePost(endpoint, auth, {title: title, description: description, privacyStatus: privacy})
+                .then(function(payload) {
+                    if (!payload.playlistId) throw new Error('no playlistId in response');
+                    results.push({title: title, playlist_id: payload.playlistId});
+                })
+                .catch(function(error) { results.push({title: title, error: String(error)}); })
+                .then(next);
+        }
+        next();
+    });
+"""
+
+def create_ytmusic_playlists(driver, names, description="Imported from Spotify", privacy=YTMUSIC_PLAYLIST_PRIVACY):
+    """Create playlists from inside the loaded page, without the dialog; returns per-name results in order"""
+    if not names:
+        return []
+    limiter = rate_limits["ytmusic"]
+    limiter.acquire(len(names))
+    try:
+        ensure_ytmusic_page(driver)
+        driver.set_script_timeout(max(30, len(names) * 2))
+        results = driver.execute_async_script(
+            YTMUSIC_CREATE_PLAYLISTS_JS, list(names), description, privacy, YTMUSIC_CREATE_PLAYLIST_ENDPOINT
+        )
+    except Exception as e:
+        print(f"⚠️ Playlist creation request failed: {e}")
+        return [{"title": name, "error": str(e)} for name in names]
+    errors = {r["error"] for r in results if r.get("error")}
+    created = sum(1 for r in results if r.get("playlist_id"))
+    if any(throttled_status(error) for error in errors):
+        limiter.throttled("playlist creation refused")
+    elif created:
+        limiter.succeeded()
+    print(f"Created {created}/{len(names)} YouTube Music playlists" + (f" (errors: {', '.join(sorted(errors))})" if errors else ""))
+    return results
+
+class PlaylistRegistry:
+    """The YouTube Music playlist ID for each Spotify playlist being migrated
+
+    Playlists are created in one batch through the web client's endpoint, and
+    only fall back to the New playlist dialog one at a time if that fails. Tracks
+    are then added by playlist ID, never by looking the playlist up by name.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.ids = {}
+        self.api_failures = 0
+
+    def __contains__(self, key):
+        return key in self.ids
+
+    def url(self, key):
+        """Playlist URL for a Spotify playlist URL, or None if it has no playlist yet"""
+        playlist_id = self.ids.get(key)
+        return f"{YTMUSIC_BASE_URL}/playlist?list={playlist_id}" if playlist_id else None
+
+    def register(self, key, playlist_url):
+        """Remember an existing playlist; returns False if playlist_url has no playlist ID"""
+        playlist_id = playlist_id_from_url(playlist_url)
+        if playlist_id:
+            self.ids[key] = playlist_id
+        return bool(playlist_id)
+
+    def create_all(self, playlists, description="Imported from Spotify"):
+        """Create a playlist for each Spotify playlist that has none yet; returns those created"""
+        todo = [p for p in playlists if p['url'] not in self.ids]
+        if not todo or self.api_failures >= 3:
+            return []
+        results = create_ytmusic_playlists(self.driver, [p['name'] for p in todo], description)
+        created = []
+        for playlist, result in zip(todo, results):
+            if result.get("playlist_id"):
+                self.ids[playlist['url']] = result["playlist_id"]
+                created.append(playlist)
+        # Stop trying an endpoint that keeps refusing everything
+        self.api_failures = 0 if created else self.api_failures + 1
+        return created
+
+    def ensure(self, playlist):
+        """Return the URL of playlist's YouTube Music playlist, creating it if needed (None if that fails)"""
+        if playlist['url'] not in self.ids:
+            self.create_all([playlist])
+        if playlist['url'] not in self.ids:
+            print("Creating the playlist through the New playlist dialog instead")
+            self.register(playlist['url'], create_ytmusic_playlist(self.driver, playlist['name']))
+        return self.url(playlist['url'])
+
+def remember_top_result(driver, track):
+    """Store the top search result for track in the resolution cache"""
+    cache = get_track_cache()
+    if cache is None:
+        return None
+    try:
+        result = driver.execute_script(TOP_RESULT_JS)
+    except Exception:
+        return None
+    if not result or not result.get("video_id"):
+        return None
+    confidence = match_confidence(track, result["title"], result["subtitle"])
+    cache.put(track, result["video_id"], confidence)
+    return result["video_id"]
+
+def open_save_dialog_for_video(driver, video_id):
+    """Open the Save to playlist dialog for a known video from its watch page"""
+    driver.get(f"{YTMUSIC_BASE_URL}/watch?v={video_id}")
+    if not waits.until(driver, "player_menu", css_present("ytmusic-player-bar ytmusic-menu-renderer button")):
+        return "No player menu found"
+    driver.execute_script("document.querySelector('ytmusic-player-bar ytmusic-menu-renderer button').click();")
+    if not waits.until(driver, "player_menu", css_present("ytmusic-menu-popup-renderer ytmusic-menu-navigation-item-renderer")):
+        return "Player menu did not open"
+    return driver.execute_script("""
+        var items = document.querySelectorAll('ytmusic-menu-popup-renderer ytmusic-menu-navigation-item-renderer');
+        for (var i = 0; i < items.length; i++) {
+            if (items[i].textContent.trim() === 'Save to playlist') {
+                items[i].querySelector('a, tp-yt-paper-item') ? items[i].querySelector('a, tp-yt-paper-item').click() : items[i].click();
+                return "Save to playlist clicked from player menu";
+            }
+        }
+        return "No Save to playlist item in player menu";
+    """)
+
+def search_and_add_to_ytmusic_playlist(driver, playlist_url, track, playlist_name="", save_turn=None):
+    """Search for a track on YouTube Music and add it to the playlist
+
+    save_turn is an optional context manager held while the Save dialog is used,
+    which lets concurrent workers search in parallel but add tracks in order.
+    """
+    # Tracks resolved on an earlier run (or in another playlist) skip the search entirely
+    cache = get_track_cache()
+    cached = cache.get(track) if cache else None
+    
+    # Include both song name and artist in search for better results
+    search_query = f"{track['name']} {track['artists']}"
+    if cached:
+        print(f"Cached match for: {search_query} -> {cached['video_id']}")
+    else:
+        print(f"Searching for: {search_query}")
+    
+    playlist_id = playlist_id_from_url(playlist_url)
+    if not playlist_id:
+        print(f"❌ No playlist ID in {playlist_url}, cannot add: {track['name']} - {track['artists']}")
+        return False
+    
+    limiter = rate_limits["ytmusic"]
+    if not cached:
+        # Navigate to search
+        with metrics.span("search", track=track['name']):
+            search_url = f"{YTMUSIC_BASE_URL}/search?q={search_query.replace(' ', '+')}"
+            limiter.acquire()
+            driver.get(search_url)
+            if not waits.until(driver, "search_results", css_present(SEARCH_RESULTS_SELECTOR)):
+                print("Warning: Search results did not appear before timeout")
+                check_throttling(driver, limiter, "no search results")
+            remember_top_result(driver, track)
             
-            // If not found by name, use the first item (likely the most recently created)
-            if (!targetItem && carouselItems.length > 0) {{
-                targetItem = carouselItems[0];
-                var firstItemTitle = targetItem.querySelector('yt-formatted-string.title');
-                console.log("Using first playlist item: " + (firstItemTitle ? firstItemTitle.textContent : "Unnamed"));
-            }}
+            artifacts.checkpoint(driver, "search_results")
+    
+    # Try to find and click the Save button using the exact HTML structure you provided
+    try:
+        # Only one worker at a time may click through the dialog, in playlist order
+        with save_turn or nullcontext(), metrics.span("save_dialog", track=track['name']):
+            # Saving is a request of its own (and a page load for cached tracks)
+            limiter.acquire()
+            if cached:
+                save_button_result = open_save_dialog_for_video(driver, cached['video_id'])
+            else:
+                clicked = driver.execute_script(SAVE_BUTTON_JS, strategies.order("save_button", SAVE_BUTTON_STRATEGIES)) or {}
+                strategies.record("save_button", clicked.get("strategy"))
+                save_button_result = clicked.get("message")
+            print(f"Save button action: {save_button_result}")
             
-            // Click the target item
-            if (targetItem) {{
-                // For carousel items, find and click the anchor tag or the item itself
-                var clickTarget = targetItem.querySelector('a.yt-simple-endpoint') || targetItem;
-                clickTarget.click();
-                return "Clicked on playlist item";
-            }}
+            # Wait for the playlist dialog to appear
+            waits.until(driver, "playlist_dialog", css_present(PLAYLIST_DIALOG_SELECTOR))
             
-            // Last resort - try to find any clickable element with playlist text
-            var clickableElements = dialog.querySelectorAll('a, button, [role="button"]');
-            for (var i = 0; i < clickableElements.length; i++) {{
-                if (clickableElements[i].textContent.includes('{playlist_name}')) {{
-                    console.log("Clicking fallback element: " + clickableElements[i].textContent);
-                    clickableElements[i].click();
-                    return "Clicked fallback element with playlist name";
-                }}
-            }}
+            artifacts.checkpoint(driver, "playlist_dialog")
             
-            return "No playlist items found in dialog";
-        """)
-        print(f"Playlist selection: {playlist_result}")
+            # Click the target playlist in the dialog by its ID
+            selection = driver.execute_script(
+                SAVE_DIALOG_OPTION_JS, playlist_id, playlist_name,
+                strategies.order("playlist_dialog", PLAYLIST_DIALOG_STRATEGIES),
+                strategies.order("playlist_dialog_option", DIALOG_OPTION_STRATEGIES),
+            ) or {}
+            strategies.record("playlist_dialog", selection.get("dialog"))
+            strategies.record("playlist_dialog_option", selection.get("option"))
+            playlist_result = selection.get("message", "")
+            print(f"Playlist selection: {playlist_result}")
+            if "Clicked" in playlist_result:
+                waits.until(driver, "save_confirmation", css_present("ytmusic-notification-action-renderer, tp-yt-paper-toast[opened]"))
         
         # Success check
         if "Clicked" in playlist_result:
             print(f"✅ Added to YouTube Music: {track['name']} - {track['artists']}")
-            time.sleep(1)  # Wait for confirmation
+            limiter.succeeded()
             return True
         else:
             print(f"⚠️ Could not add to playlist: {track['name']} - {track['artists']}")
+            check_throttling(driver, limiter)
+            artifacts.failure(driver, "add_track_failed", playlist_result)
             return False
         
     except Exception as e:
         print(f"❌ Error adding track: {track['name']} - {track['artists']}")
         print(f"  Error: {e}")
         
-        # Save a debug screenshot
-        screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "error_screenshot.png")
+        check_throttling(driver, limiter)
+        artifacts.failure(driver, "add_track_error", e)
+        return False
+
+class OrderedGate:
+    """Let concurrent workers run a critical section strictly in index order"""
+
+    def __init__(self):
+        self.next_index = 0
+        self.finished = set()
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def turn(self, index):
+        """Wait until index is next; it stays held until release(index), so a retry keeps its place"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.next_index >= index)
+        yield
+
+    def release(self, index):
+        """Mark index as done; safe to call more than once"""
+        with self.cond:
+            if index < self.next_index:
+                return
+            self.finished.add(index)
+            while self.next_index in self.finished:
+                self.finished.remove(self.next_index)
+                self.next_index += 1
+            self.cond.notify_all()
+
+def driver_alive(driver):
+    """Return False if the browser session behind driver is gone"""
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+def clone_ytmusic_session(source_driver, headless=None, lean=False, **setup):
+    """Start a new browser that shares the YouTube Music login of source_driver"""
+    driver = metrics.wrap(drivers.acquire(headless=headless, lean=lean, **setup), "ytmusic_worker")
+    driver.get(f"{YTMUSIC_BASE_URL}/")
+    # With page_load_strategy="none" get() returns before cookies can be set for the site
+    waits.until(driver, "page_ready", url_matches(YTMUSIC_BASE_URL))
+    for cookie in source_driver.get_cookies():
         try:
-            driver.save_screenshot(screenshot_path)
-            print(f"Debug screenshot saved to: {screenshot_path}")
-        except:
-            pass
-            
+            driver.add_cookie(cookie)
+        except Exception:
+            continue  # Cookies for other domains can't be set from this page
+    driver.refresh()
+    waits.until(driver, "ytmusic_app", css_present("ytmusic-app"))
+    return driver
+
+# setup_driver arguments of the browser whose tabs are YTMusicWorkerPool.from_tabs workers:
+# navigations don't hold the session, and tabs in the background are not throttled
+TAB_BROWSER_SETUP = {"page_load_strategy": "none", "active_tabs": True}
+
+# Marks the document a tab is leaving, so a navigation counts as done only once the new one is in
+TAB_LEAVING_JS = "window.__tabLeaving = true;"
+TAB_LOADED_JS = "return window.__tabLeaving === undefined && document.readyState !== 'loading';"
+WORKER_HEAP_JS = "return performance.memory ? performance.memory.usedJSHeapSize : null;"
+
+class TabbedBrowser:
+    """One browser whose tabs are driven from several threads, one command at a time
+
+    WebDriver only talks to the selected tab, so every command takes the lock and
+    switches tabs first. Start the browser with TAB_BROWSER_SETUP so a navigation
+    returns at once and its tab waits for the page without the lock, and so tabs
+    in the background keep running at full speed.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.lock = threading.RLock()
+        self.current = driver.current_window_handle
+
+    @contextmanager
+    def focus(self, handle):
+        with self.lock:
+            if self.current != handle:
+                self.driver.switch_to.window(handle)
+                self.current = handle
+            yield self.driver
+
+    def tab(self, handle=None):
+        """The tab with this handle, by default the one the browser started with"""
+        return BrowserTab(self, handle or self.current)
+
+    def open_tab(self):
+        with self.lock:
+            self.driver.switch_to.new_window("tab")
+            self.current = self.driver.current_window_handle
+            return BrowserTab(self, self.current)
+
+    def close_tab(self, handle):
+        with self.focus(handle) as driver:
+            driver.close()
+            self.current = None
+
+    def quit(self):
+        with self.lock:
+            self.driver.quit()
+
+class BrowserTab:
+    """A WebDriver stand-in bound to one tab of a TabbedBrowser
+
+    Commands are forwarded to the browser's driver with this tab selected. Elements
+    returned by find_element are not bound to the tab, so only check for them.
+    """
+
+    def __init__(self, browser, handle):
+        self.browser = browser
+        self.handle = handle
+
+    def __getattr__(self, name):
+        if callable(getattr(type(self.browser.driver), name, None)):
+            def command(*args, **kwargs):
+                with self.browser.focus(self.handle) as driver:
+                    return getattr(driver, name)(*args, **kwargs)
+            return command
+        with self.browser.focus(self.handle) as driver:
+            return getattr(driver, name)
+
+    def get(self, url):
+        """Start loading url, then wait for it with the browser free for the other tabs"""
+        with self.browser.focus(self.handle) as driver:
+            driver.execute_script(TAB_LEAVING_JS)
+            driver.get(url)
+        waits.until(self, "page_ready", lambda tab: tab.execute_script(TAB_LOADED_JS))
+
+    def quit(self):
+        """Close this tab; the browser and its other tabs keep running"""
+        self.browser.close_tab(self.handle)
+
+def browser_rss(driver):
+    """Resident memory of the browser processes behind driver in bytes, or None without psutil"""
+    if psutil is None:
+        return None
+    try:
+        service = psutil.Process(driver.service.process.pid)
+        return sum(process.memory_info().rss for process in service.children(recursive=True))
+    except Exception:
+        return None
+
+class YTMusicWorkerPool:
+    """Add tracks through several logged-in YouTube Music sessions at once"""
+
+    def __init__(self, drivers, session_factory=None):
+        self.drivers = list(drivers)
+        self.session_factory = session_factory
+        self.owned = set()
+        # Set when the workers are tabs of one browser the pool started
+        self.browser = None
+
+    @classmethod
+    def from_session(cls, ytmusic_driver, workers, headless=None, lean=False):
+        """Build a pool of `workers` sessions, reusing ytmusic_driver as the first one"""
+        factory = lambda: clone_ytmusic_session(ytmusic_driver, headless=headless, lean=lean)
+        pool = cls([ytmusic_driver], session_factory=factory)
+        clones = [None] * (workers - 1)
+
+        def launch(slot):
+            try:
+                clones[slot] = factory()
+            except Exception as e:
+                print(f"⚠️ Could not start YouTube Music worker {slot + 2}: {e}")
+
+        threads = [threading.Thread(target=launch, args=(slot,)) for slot in range(workers - 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for driver in clones:
+            if driver is not None:
+                pool.drivers.append(driver)
+                pool.owned.add(driver)
+        print(f"YouTube Music worker pool ready with {len(pool.drivers)} sessions")
+        return pool
+
+    @classmethod
+    def from_tabs(cls, ytmusic_driver, workers, headless=None, lean=False):
+        """Build a pool of `workers` tabs in one new browser sharing the login of ytmusic_driver"""
+        browser = TabbedBrowser(clone_ytmusic_session(ytmusic_driver, headless=headless, lean=lean, **TAB_BROWSER_SETUP))
+
+        def open_tab():
+            tab = browser.open_tab()
+            if lean:
+                # Request blocking is set up per tab
+                with browser.focus(tab.handle) as driver:
+                    start_lean_session(driver)
+            return tab
+
+        pool = cls([browser.tab()], session_factory=open_tab)
+        pool.browser = browser
+        for slot in range(workers - 1):
+            try:
+                pool.drivers.append(open_tab())
+            except Exception as e:
+                print(f"⚠️ Could not open YouTube Music worker tab {slot + 2}: {e}")
+        pool.owned.update(pool.drivers)
+        print(f"YouTube Music worker pool ready with {len(pool.drivers)} tabs in one browser")
+        return pool
+
+    def run(self, playlist_url, tracks, playlist_name="", on_result=None):
+        """Add tracks concurrently; returns per-track results in playlist order
+
+        on_result(index, added) is called from the worker thread as each track finishes.
+        """
+        results = [False] * len(tracks)
+        work = queue.Queue()
+        for index, track in enumerate(tracks):
+            work.put((index, track))
+        gate = OrderedGate()
+
+        def worker(slot):
+            while True:
+                try:
+                    index, track = work.get_nowait()
+                except queue.Empty:
+                    return
+                print(f"[worker {slot + 1}] ({index+1}/{len(tracks)}) Processing track: {track['name']} - {track['artists']}")
+                try:
+                    with metrics.span("add_track", playlist=playlist_name, index=index, track=track['name'], worker=slot + 1):
+                        results[index] = self._add_with_recovery(slot, playlist_url, track, playlist_name, gate, index)
+                except Exception as e:
+                    print(f"❌ Worker {slot + 1} failed on {track['name']}: {e}")
+                finally:
+                    gate.release(index)
+                if on_result is not None:
+                    on_result(index, results[index])
+
+        threads = [threading.Thread(target=worker, args=(slot,), daemon=True) for slot in range(len(self.drivers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _add_with_recovery(self, slot, playlist_url, track, playlist_name, gate, index):
+        """Add one track, replacing this worker's browser once if it has crashed
+
+        The caller releases index in gate afterwards, so no later track is saved
+        while this one is restarted and retried.
+        """
+        driver = self.drivers[slot]
+        try:
+            added = search_and_add_to_ytmusic_playlist(driver, playlist_url, track, playlist_name, save_turn=gate.turn(index))
+        except Exception as e:
+            print(f"❌ Worker {slot + 1} error on {track['name']}: {e}")
+            added = False
+        if added or driver_alive(driver) or self.session_factory is None:
+            return added
+        print(f"⚠️ Worker {slot + 1} lost its browser session, restarting it...")
+        if driver in self.owned:
+            self.owned.discard(driver)
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        driver = self.session_factory()
+        self.drivers[slot] = driver
+        self.owned.add(driver)
+        return search_and_add_to_ytmusic_playlist(driver, playlist_url, track, playlist_name, save_turn=gate.turn(index))
+
+    def memory_report(self):
+        """JS heap and resident memory per worker; a browser's memory is split evenly over its tabs"""
+        browsers = [worker.browser.driver if isinstance(worker, BrowserTab) else worker for worker in self.drivers]
+        shares = collections.Counter(id(driver) for driver in browsers)
+        resident = {}
+        lines = []
+        for slot, (worker, driver) in enumerate(zip(self.drivers, browsers)):
+            try:
+                heap = worker.execute_script(WORKER_HEAP_JS)
+            except Exception:
+                heap = None
+            if id(driver) not in resident:
+                resident[id(driver)] = browser_rss(driver)
+            parts = [f"{heap / 1048576:.0f} MB JS heap" if heap else "JS heap unknown"]
+            if resident[id(driver)] is not None:
+                parts.append(f"{resident[id(driver)] / shares[id(driver)] / 1048576:.0f} MB resident")
+            lines.append(f"  worker {slot + 1}: {', '.join(parts)}")
+        known = [rss for rss in resident.values() if rss is not None]
+        if known:
+            header = (f"Worker memory: {sum(known) / 1048576:.0f} MB resident in {len(known)} browsers "
+                      f"for {len(self.drivers)} workers")
+        else:
+            header = "Worker memory (install psutil to include resident memory):"
+        return "\n".join([header] + lines)
+
+    def close(self):
+        """Quit the browsers started by the pool (the shared login session is left open)"""
+        if self.browser is not None:
+            # Quitting the browser closes every tab with it
+            self.owned = {self.browser}
+            self.browser = None
+        for driver in self.owned:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self.owned.clear()
+
+# Reads every playlist card/row on the YouTube Music library page in one call
+YTMUSIC_LIBRARY_JS = """
+    var playlists = [];
+    var seen = {};
+    var items = document.querySelectorAll('ytmusic-two-row-item-renderer, ytmusic-responsive-list-item-renderer');
+    for (var i = 0; i < items.length; i++) {
+        var link = items[i].querySelector('a[href*="list="], a[href*="browse/VL"]');
+        var title = items[i].querySelector('.title, yt-formatted-string.title');
+        if (!link || !title) continue;
+        var name = title.textContent.trim();
+        if (!name || seen[name]) continue;
+        seen[name] = true;
+        playlists.push({name: name, url: link.href});
+    }
+    return playlists;
+"""
+
+# Reads every track row of a YouTube Music playlist page in one call
+YTMUSIC_PLAYLIST_TRACKS_JS = """
+    var tracks = [];
+    var rows = document.querySelectorAll('ytmusic-playlist-shelf-renderer ytmusic-responsive-list-item-renderer');
+    for (var i = 0; i < rows.length; i++) {
+        var title = rows[i].querySelector('.title-column .title, yt-formatted-string.title');
+        if (!title) continue;
+        var secondary = rows[i].querySelector('.secondary-flex-columns yt-formatted-string');
+        var link = rows[i].querySelector('a[href*="watch?v="]');
+        var match = link ? link.href.match(/[?&]v=([^&]+)/) : null;
+        tracks.push({
+            name: title.textContent.trim(),
+            artists: secondary ? secondary.textContent.trim() : '',
+            video_id: match ? match[1] : null
+        });
+    }
+    return tracks;
+"""
+
+def scroll_to_end(driver, max_scrolls=200):
+    """Scroll the page until it stops growing, so continuation content is loaded"""
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    for _ in range(max_scrolls):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        new_height = waits.until(driver, "scroll_growth", scroll_height_changed(last_height))
+        if not new_height:
+            break
+        last_height = new_height
+
+def get_ytmusic_library_playlists(driver):
+    """Return {name: url} for every playlist already in the YouTube Music library"""
+    driver.get(f"{YTMUSIC_BASE_URL}/library/playlists")
+    waits.until(driver, "ytmusic_library", css_present("ytmusic-two-row-item-renderer, ytmusic-responsive-list-item-renderer"))
+    scroll_to_end(driver)
+    playlists = driver.execute_script(YTMUSIC_LIBRARY_JS) or []
+    print(f"Found {len(playlists)} playlists on YouTube Music")
+    return {playlist["name"]: playlist["url"] for playlist in playlists}
+
+def get_ytmusic_playlist_tracks(driver, playlist_url):
+    """Return the tracks already in a YouTube Music playlist"""
+    driver.get(playlist_url)
+    waits.until(driver, "ytmusic_playlist", count_settled("ytmusic-playlist-shelf-renderer ytmusic-responsive-list-item-renderer", minimum=0))
+    scroll_to_end(driver)
+    return driver.execute_script(YTMUSIC_PLAYLIST_TRACKS_JS) or []
+
+class PlaylistDiff:
+    """Tells which Spotify tracks are missing from an existing YouTube Music playlist"""
+
+    def __init__(self, ytmusic_tracks):
+        self.tracks = list(ytmusic_tracks)
+        self.claimed = set()
+        self.by_video_id = collections.defaultdict(list)
+        self.by_title = collections.defaultdict(list)
+        for index, track in enumerate(self.tracks):
+            if track.get("video_id"):
+                self.by_video_id[track["video_id"]].append(index)
+            self.by_title[normalize_text(track["name"])].append(index)
+
+    def take(self, indexes, accept=lambda track: True):
+        """Claim the first unclaimed track among indexes that accept() allows"""
+        for index in indexes:
+            if index not in self.claimed and accept(self.tracks[index]):
+                self.claimed.add(index)
+                return True
+        return False
+
+    def claim(self, track):
+        """Return True if track is already present, consuming the match so duplicates are counted"""
+        cache = get_track_cache()
+        cached = cache.get(track) if cache else None
+        if cached and self.take(self.by_video_id[cached["video_id"]]):
+            return True
+        # Without a known video ID a title alone is not enough: "Intro" by two artists are two songs
+        wanted = [normalize_text(artist) for artist in (track.get("artists") or "").split(",") if artist.strip()]
+
+        def same_artist(found):
+            credited = f" {normalize_text(found.get('artists'))} "
+            return not wanted or any(f" {artist} " in credited for artist in wanted)
+
+        return self.take(self.by_title[normalize_text(track["name"])], same_artist)
+
+# Append-only record of migration progress used by --resume
+JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migration_journal.jsonl")
+
+class MigrationJournal:
+    """Append-only JSON-lines journal of migration progress, fsynced in batches
+
+    Every record is flushed to the OS immediately, so a crashed browser or a
+    killed process loses nothing; fsync is batched to bound what a power loss
+    can take with it.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, resume=False, fsync_every=25, fsync_interval=2.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def record(self, event, **fields):
+        line = json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+            self.unsynced += 1
+            if self.unsynced >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self._sync()
+                self.file.close()
+
+class MigrationState:
+    """Progress recovered from a journal: what was scraped, created and added"""
+
+    def __init__(self):
+        self.playlists = None
+        self.tracks = {}
+        self.created = {}
+        # Playlists that already existed on YouTube Music and were synced into (--sync)
+        self.reused = set()
+        self.added = {}
+        self.completed = set()
+        # The journal ends with a run that got to the end without failures
+        self.finished = False
+
+    @property
+    def interrupted(self):
+        """True if the journal holds progress of a migration that did not finish"""
+        return not self.finished and bool(self.playlists or self.tracks or self.created or self.added)
+
+    @classmethod
+    def replay(cls, path=JOURNAL_PATH):
+        state = cls()
+        if not os.path.exists(path):
+            return state
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A crash can leave the last line half written
+                event = record.get("event")
+                state.finished = event == "finished"
+                if event == "playlists":
+                    state.playlists = record["playlists"]
+                elif event == "tracks":
+                    state.tracks[record["playlist"]] = record["tracks"]
+                elif event == "playlist_created":
+                    state.created[record["playlist"]] = record["ytmusic_url"]
+                    if record.get("reused"):
+                        state.reused.add(record["playlist"])
+                elif event == "track" and record.get("added"):
+                    state.added.setdefault(record["playlist"], set()).add(record["index"])
+                elif event == "playlist_done":
+                    state.completed.add(record["playlist"])
+        return state
+
+# Plan / apply: --plan scrapes and resolves into a manifest that --apply executes later
+MANIFEST_VERSION = 1
+
+def open_manifest(path, mode="r"):
+    """Open a manifest as text, gzip-compressed if its name ends in .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+class ManifestWriter:
+    """Stream a migration manifest: JSON lines of playlists, their tracks and planned matches
+
+    A playlist only counts once its end record is written, so a plan that dies
+    midway still leaves a manifest of the playlists it finished.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open_manifest(path, "w")
+        self.playlists = 0
+        self.tracks = 0
+        self.resolved = 0
+        self.write("manifest", version=MANIFEST_VERSION, created=round(time.time(), 3))
+
+    def write(self, kind, **fields):
+        self.file.write(json.dumps({"type": kind, **fields}, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def playlist(self, playlist):
+        self.playlists += 1
+        self.write("playlist", n=self.playlists, playlist=playlist)
+
+    def add_tracks(self, tracks):
+        """Write tracks of the current playlist, with their "match" (see resolve_ytmusic_tracks) if they were resolved"""
+        for track in tracks:
+            fields = {"track": {k: v for k, v in track.items() if k != "match"}}
+            if "match" in track:
+                fields["match"] = track["match"]
+                self.resolved += 1 if track["match"] else 0
+            self.write("track", p=self.playlists, **fields)
+        self.tracks += len(tracks)
+
+    def end(self):
+        self.write("end", p=self.playlists)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def iter_manifest(path):
+    """Yield (playlist, tracks) for every complete playlist in a manifest
+
+    Tracks that were resolved when planning carry the result under "match"
+    (None if nothing good was found).
+    """
+    open_playlists = {}
+    with open_manifest(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A plan that was killed can leave the last line half written
+            kind = record.get("type")
+            if kind == "manifest" and record.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"{path} is a version {record.get('version')} manifest, expected {MANIFEST_VERSION}")
+            elif kind == "playlist":
+                open_playlists[record["n"]] = (record["playlist"], [])
+            elif kind == "track" and record["p"] in open_playlists:
+                track = record["track"]
+                if "match" in record:
+                    track = dict(track, match=record["match"])
+                open_playlists[record["p"]][1].append(track)
+            elif kind == "end" and record["p"] in open_playlists:
+                yield open_playlists.pop(record["p"])
+    for playlist, _ in open_playlists.values():
+        print(f"⚠️ Manifest has no end for {playlist['name']}, skipping it")
+
+def parse_shard(value):
+    """argparse type for --shard K/N"""
+    match = re.fullmatch(r"(\d+)/(\d+)", value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError("shards are given as K/N with 1 <= K <= N, e.g. 2/4")
+    return int(match.group(1)), int(match.group(2))
+
+def in_shard(playlist, shard):
+    """Whether playlist belongs to shard (K, N); the split is stable across runs and machines"""
+    if shard is None:
+        return True
+    number, count = shard
+    return zlib.crc32(playlist['url'].encode("utf-8")) % count == number - 1
+
+def iter_manifest_source(path, state=None, select=None, shard=None):
+    """Yield (playlist, tracks) from a manifest, as a source for migrate_playlists"""
+    for playlist, tracks in iter_manifest(path):
+        if in_shard(playlist, shard) and not skip_playlist(playlist, state, select):
+            yield playlist, tracks
+
+def dry_run_manifest(source):
+    """Print what applying a manifest would do, without opening a browser"""
+    totals = collections.Counter()
+    for playlist, tracks in source:
+        planned = sum(1 for track in tracks if track.get("match"))
+        totals["playlists"] += 1
+        totals["tracks"] += len(tracks)
+        totals["planned"] += planned
+        print(f"  {playlist['name']}: {len(tracks)} tracks, {planned} added by video ID, {len(tracks) - planned} searched")
+    print(f"Would migrate {totals['playlists']} playlists with {totals['tracks']} tracks "
+          f"({totals['planned']} already matched)")
+    return totals
+
+# Maximum number of scraped items buffered between the Spotify and YouTube Music stages
+PIPELINE_QUEUE_SIZE = 500
+
+def spotify_playlists(spotify_driver, journal=None, state=None):
+    """Every playlist in the Spotify account, largest first, read from the journal when resuming"""
+    if state is not None and state.playlists is not None:
+        print(f"Resuming with {len(state.playlists)} playlists from the journal")
+        return state.playlists
+    with metrics.span("spotify_library"):
+        playlists = order_playlists(get_spotify_playlists(spotify_driver))
+    if journal is not None:
+        journal.record("playlists", playlists=playlists)
+    return playlists
+
+def iter_spotify_source(spotify_driver, journal=None, state=None, use_api=False, select=None, playlists=None):
+    """Yield (playlist, tracks) for every playlist in the Spotify account
+
+    When resuming, playlists and tracks already in the journal are not scraped again.
+    With use_api, tracks come from captured API responses instead of the tracklist DOM.
+    select, if given, is a predicate (see playlist_filter) choosing which playlists to migrate.
+    playlists skips reading the library when the caller already has it (see spotify_playlists).
+    """
+    if playlists is None:
+        playlists = spotify_playlists(spotify_driver, journal, state)
+    
+    for playlist in playlists:
+        if skip_playlist(playlist, state, select):
+            continue
+        tracks = state.tracks.get(playlist['url']) if state is not None else None
+        if tracks is None:
+            # Stream tracks as they are harvested so insertion starts before scrolling ends
+            if use_api:
+                tracks = spotify_api_tracks(spotify_driver, playlist)
+            else:
+                tracks = iter_spotify_playlist_tracks(spotify_driver, playlist['url'], expected_total=playlist.get('track_count'))
+            tracks = metrics.iterate("spotify_track", tracks, playlist=playlist['name'])
+            if journal is not None:
+                tracks = journal_tracks(journal, playlist['url'], tracks)
+        yield playlist, tracks
+
+def skip_playlist(playlist, state=None, select=None, quiet=False):
+    """True (after saying why, unless quiet) if the playlist is filtered out or was already migrated"""
+    if select is not None and not select(playlist):
+        reason = "filtered-out"
+    elif state is not None and playlist['url'] in state.completed:
+        reason = "already migrated"
+    else:
         return False
+    if not quiet:
+        print(f"Skipping {reason} playlist: {playlist['name']}")
+    return True
+
+def iter_export_source(path, state=None, select=None):
+    """Yield (playlist, tracks) from Spotify export files instead of the Spotify browser
+
+    The files are read again on resume, so nothing about them goes to the journal.
+    """
+    for playlist, tracks in iter_spotify_export(path):
+        if not skip_playlist(playlist, state, select):
+            yield playlist, tracks
+
+def spotify_api_tracks(spotify_driver, playlist):
+    """Read tracks from the API, falling back to the tracklist DOM if nothing was captured"""
+    found = False
+    for track in iter_spotify_tracks_from_api(spotify_driver, playlist['url']):
+        found = True
+        yield track
+    if not found:
+        yield from iter_spotify_playlist_tracks(spotify_driver, playlist['url'], expected_total=playlist.get('track_count'))
+
+def journal_tracks(journal, playlist_url, tracks):
+    """Pass tracks through, recording the full list once the playlist has been read"""
+    seen = []
+    for track in tracks:
+        seen.append(track)
+        yield track
+    journal.record("tracks", playlist=playlist_url, tracks=seen)
+
+def produce_playlist_events(source, events, stop):
+    """Stream ("playlist" | "track" | "end" | "error", item) events from source into the events queue
+
+    Track events carry (index, track) so the consumer knows each track's position.
+    A playlist whose tracks fail to read ends with ("error", (playlist, exception))
+    instead of "end", and the next playlist is read; if source itself fails the
+    error carries None for the playlist and nothing more is read.
+    """
+    def put(event):
+        while not stop.is_set():
+            try:
+                events.put(event, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for playlist, tracks in source:
+            if not put(("playlist", playlist)):
+                return
+            try:
+                for index, track in enumerate(tracks):
+                    if not put(("track", (index, track))):
+                        return
+            except Exception as e:
+                if not put(("error", (playlist, e))):
+                    return
+                continue
+            if not put(("end", playlist)):
+                return
+    except Exception as e:
+        put(("error", (None, e)))
+    finally:
+        put(("done", None))
+
+def reading_failed(item, failures=None):
+    """Report an "error" event from produce_playlist_events, adding what failed to failures"""
+    playlist, error = item
+    name = playlist['name'] if playlist else "the Spotify playlists"
+    print(f"❌ Error while reading {name}: {error}")
+    if failures is not None:
+        failures.append(name)
 
-def migrate_playlists(spotify_driver, ytmusic_driver):
-    """Migrate playlists from Spotify to YouTube Music"""
-    # Get all Spotify playlists
-    spotify_playlists = get_spotify_playlists(spotify_driver)
+def migrate_playlists(spotify_driver, ytmusic_driver, pool=None, journal=None, state=None, sync=False, spotify_api=False,
+                      resolve=True, batch_insert=True, select=None, source=None, failures=None):
+    """Migrate playlists from Spotify to YouTube Music
+
+    Spotify is scraped on a background thread that feeds a bounded queue, so the
+    next playlist is already being read while tracks are added to the current one.
+    Progress goes to journal; passing the state replayed from an earlier journal
+    continues from the first track that was not added. With sync, playlists that
+    already exist on YouTube Music are reused and only missing tracks are added.
+    spotify_api reads tracks from captured API responses (see iter_spotify_tracks_from_api).
+    resolve matches tracks in batches with in-page search before they are added, and
+    batch_insert adds matched tracks by video ID in bulk, leaving only the rest to
+    the Save dialog. select limits the migration to some playlists (see playlist_filter).
+    source replaces the Spotify browser with another iterable of (playlist, tracks),
+    such as iter_export_source; spotify_driver can then be None. Playlists that
+    could not be read are added to failures; the tracks read before the error are
+    still added, but the playlist is not marked done, so --resume reads it again.
     
-    for playlist in spotify_playlists:
-        print(f"\nProcessing playlist: {playlist['name']}")
-        
-        # Get tracks for this playlist
-        tracks = get_spotify_playlist_tracks(spotify_driver, playlist['url'])
+    Target playlists are created up front in one batch when the playlists are known
+    in advance (the Spotify library, or a source given as a list) and otherwise as
+    each playlist arrives; tracks are added to them by playlist ID (see PlaylistRegistry).
+    """
+    known_playlists = None
+    if source is None:
+        # Read the library before the producer takes over the Spotify driver
+        known_playlists = spotify_playlists(spotify_driver, journal, state)
+        source = iter_spotify_source(spotify_driver, journal, state, use_api=spotify_api, select=select,
+                                     playlists=known_playlists)
+    elif isinstance(source, list):
+        known_playlists = [entry[0] for entry in source]
+    
+    events = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=produce_playlist_events,
+        args=(source, events, stop),
+        name="spotify-producer",
+        daemon=True,
+    )
+    producer.start()
+    
+    # Read the YouTube Music library once, while Spotify is being scraped
+    existing_playlists = {}
+    if sync:
+        with metrics.span("ytmusic_library"):
+            existing_playlists = get_ytmusic_library_playlists(ytmusic_driver)
+    diff = None
+    
+    def record(event, **fields):
+        if journal is not None:
+            journal.record(event, **fields)
+    
+    def read_existing(url):
+        """Diff against the tracks already in an existing YouTube Music playlist"""
+        with metrics.span("read_ytmusic_playlist", playlist=playlist['name']):
+            existing_tracks = get_ytmusic_playlist_tracks(ytmusic_driver, url)
+        print(f"Syncing into existing playlist with {len(existing_tracks)} tracks: {url}")
+        return PlaylistDiff(existing_tracks)
+    
+    registry = PlaylistRegistry(ytmusic_driver)
+    if known_playlists:
+        wanted = [p for p in known_playlists
+                  if not skip_playlist(p, state, select, quiet=True)
+                  and not (state is not None and p['url'] in state.created)
+                  and p['name'] not in existing_playlists]
+        with metrics.span("create_playlists", playlists=len(wanted)):
+            created = registry.create_all(wanted)
+        for created_playlist in created:
+            record("playlist_created", playlist=created_playlist['url'], name=created_playlist['name'],
+                   ytmusic_url=registry.url(created_playlist['url']))
+    
+    playlist = None
+    ytmusic_playlist_url = None
+    already_added = set()
+    pending = []
+    added_count = 0
+    
+    def flush():
+        """Resolve and add the buffered tracks; returns how many were added"""
+        if not pending:
+            return 0
+        batch = list(pending)
+        pending.clear()
+        count = 0
+        # Tracks from a manifest were already resolved when it was planned
+        resolved = [track.get("match") for _, track in batch]
+        todo = [i for i, (_, track) in enumerate(batch) if "match" not in track]
+        if todo and resolve:
+            with metrics.span("resolve", playlist=playlist['name'], tracks=len(todo)):
+                found = resolve_ytmusic_tracks(ytmusic_driver, [batch[i][1] for i in todo])
+        elif todo:
+            cache = get_track_cache()
+            found = [cache.get(batch[i][1], RESOLVE_MIN_CONFIDENCE) if cache else None for i in todo]
+        for i, hit in zip(todo, found if todo else []):
+            resolved[i] = hit
         
-        # Create a new playlist on YouTube Music
-        ytmusic_playlist_url = create_ytmusic_playlist(ytmusic_driver, playlist['name'])
-        if not ytmusic_playlist_url:
-            print(f"Skipping playlist: {playlist['name']}")
+        playlist_id = playlist_id_from_url(ytmusic_playlist_url)
+        if not (batch_insert and playlist_id):
+            return add_through_dialog(batch)
+        # Keep Spotify order: runs of resolved tracks are added in a few requests by
+        # video ID, and the tracks between them go through the Save dialog in turn
+        start = 0
+        while start < len(batch):
+            end = start
+            if resolved[start]:
+                while end < len(batch) and resolved[end]:
+                    end += 1
+                with metrics.span("batch_insert", playlist=playlist['name'], tracks=end - start):
+                    results = add_videos_to_ytmusic_playlist(ytmusic_driver, playlist_id,
+                                                             [hit["video_id"] for hit in resolved[start:end]])
+                added = len(list(itertools.takewhile(bool, results)))
+                for i in range(start, start + added):
+                    record("track", playlist=playlist['url'], index=batch[i][0], added=True, video_id=resolved[i]["video_id"])
+                count += added
+                start += added
+                if start == end:
+                    continue
+                end = start + 1  # The track it stopped at goes through the dialog before the rest
+            else:
+                while end < len(batch) and not resolved[end]:
+                    end += 1
+            print(f"Adding {end - start} tracks through the Save dialog")
+            count += add_through_dialog(batch[start:end])
+            start = end
+        return count
+    
+    def add_through_dialog(entries):
+        """Add (index, track) entries with search and the Save dialog; returns how many were added"""
+        if pool is not None:
+            results = pool.run(
+                ytmusic_playlist_url, [track for _, track in entries], playlist['name'],
+                on_result=lambda i, added: record("track", playlist=playlist['url'], index=entries[i][0], added=bool(added)),
+            )
+            return sum(1 for added in results if added)
+        count = 0
+        for index, track in entries:
+            print(f"({index + 1}) Processing track: {track['name']} - {track['artists']}")
+            with metrics.span("add_track", playlist=playlist['name'], index=index, track=track['name']):
+                added = search_and_add_to_ytmusic_playlist(ytmusic_driver, ytmusic_playlist_url, track, playlist['name'])
+            record("track", playlist=playlist['url'], index=index, added=bool(added))
+            count += 1 if added else 0
+        return count
+    
+    try:
+        while True:
+            kind, item = events.get()
+            
+            if kind == "playlist":
+                playlist = item
+                print(f"\nProcessing playlist: {playlist['name']}")
+                pending.clear()
+                added_count = 0
+                diff = None
+                already_added = state.added.get(playlist['url'], set()) if state is not None else set()
+                
+                if state is not None and playlist['url'] in state.created:
+                    ytmusic_playlist_url = state.created[playlist['url']]
+                    print(f"Reusing playlist created before the interruption: {ytmusic_playlist_url}")
+                    if already_added:
+                        print(f"{len(already_added)} tracks were already added")
+                    if playlist['url'] in state.reused:
+                        # Tracks the diff skipped were never journaled, so compare again
+                        diff = read_existing(ytmusic_playlist_url)
+                    continue
+                
+                if playlist['name'] in existing_playlists:
+                    ytmusic_playlist_url = existing_playlists[playlist['name']]
+                    diff = read_existing(ytmusic_playlist_url)
+                    record("playlist_created", playlist=playlist['url'], name=playlist['name'], ytmusic_url=ytmusic_playlist_url, reused=True)
+                    continue
+                
+                if playlist['url'] in registry:
+                    ytmusic_playlist_url = registry.url(playlist['url'])
+                    print(f"Adding to the playlist created up front: {ytmusic_playlist_url}")
+                    continue
+                
+                # Create a new playlist on YouTube Music
+                with metrics.span("create_playlist", playlist=playlist['name']):
+                    ytmusic_playlist_url = registry.ensure(playlist)
+                if not ytmusic_playlist_url:
+                    print(f"Skipping playlist: {playlist['name']}")
+                    continue
+                record("playlist_created", playlist=playlist['url'], name=playlist['name'], ytmusic_url=ytmusic_playlist_url)
+            
+            elif kind == "track":
+                index, track = item
+                if not ytmusic_playlist_url:
+                    continue
+                if index in already_added:
+                    if diff is not None:
+                        diff.claim(track)  # Its copy is in the playlist now; don't let another track match it
+                    continue
+                if diff is not None and diff.claim(track):
+                    continue  # Already on YouTube Music
+                pending.append((index, track))
+                # The pool works on whole playlists so it can keep them in order
+                if pool is None and len(pending) >= (RESOLVE_BATCH_SIZE if resolve else 1):
+                    added_count += flush()
+            
+            elif kind == "end":
+                if not ytmusic_playlist_url:
+                    continue
+                added_count += flush()
+                print(f"Added {added_count} tracks to {playlist['name']}")
+                metrics.count("tracks_added", added_count)
+                metrics.count("playlists_migrated")
+                record("playlist_done", playlist=playlist['url'])
+                print(f"✅ Completed migration for playlist: {playlist['name']}")
+            
+            elif kind == "error":
+                reading_failed(item, failures)
+                if item[0] is not None and item[0] is playlist and ytmusic_playlist_url:
+                    added_count += flush()
+                    print(f"Added {added_count} tracks to {playlist['name']} before the error")
+                    metrics.count("tracks_added", added_count)
+                ytmusic_playlist_url = None
+            
+            elif kind == "done":
+                break
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+
+def resolve_once(source, ytmusic_driver, failures=None):
+    """Read every playlist from source, resolve each distinct track once and return the playlists with matches
+
+    Tracks are interned across playlists by normalize_track_key (the track cache
+    key), so a song in ten playlists costs one search. Reading runs on a background
+    thread while distinct tracks are resolved in batches as they turn up. Returns
+    [(playlist, tracks)] with every track's "match" filled in, ready to be passed
+    as the source of migrate_playlists or plan_migration. Playlists that could not
+    be read are left out and added to failures.
+    """
+    events = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    producer = threading.Thread(target=produce_playlist_events, args=(source, events, stop),
+                                name="spotify-producer", daemon=True)
+    producer.start()
+    matches = {}
+    pending = {}
+    playlists = []
+    complete = set()
+    total = 0
+    
+    def flush():
+        if not pending:
+            return
+        keys = list(pending)
+        with metrics.span("resolve", tracks=len(keys)):
+            found = resolve_ytmusic_tracks(ytmusic_driver, list(pending.values()))
+        pending.clear()
+        matches.update(zip(keys, found))
+    
+    try:
+        while True:
+            kind, item = events.get()
+            if kind == "playlist":
+                playlists.append((item, []))
+            elif kind == "track":
+                track = item[1]
+                key = normalize_track_key(track)
+                playlists[-1][1].append((key, track))
+                total += 1
+                if "match" in track:
+                    matches.setdefault(key, track["match"])
+                elif key not in matches and key not in pending:
+                    pending[key] = track
+                    if len(pending) >= RESOLVE_BATCH_SIZE:
+                        flush()
+            elif kind == "end":
+                complete.add(len(playlists) - 1)
+            elif kind == "error":
+                reading_failed(item, failures)
+            elif kind == "done":
+                break
+        flush()
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+    
+    distinct = len(matches)
+    found = sum(1 for match in matches.values() if match)
+    saved = total - distinct
+    metrics.count("tracks_deduplicated", saved)
+    print(f"🔁 {total} tracks in {len(playlists)} playlists are {distinct} distinct tracks: "
+          f"{saved} searches saved ({saved / total * 100 if total else 0:.0f}%), {found} matched")
+    
+    result = []
+    for number, (playlist, entries) in enumerate(playlists):
+        if number not in complete:
+            print(f"⚠️ {playlist['name']} was not read completely, leaving it out")
             continue
-        
-        # Add each track to the YouTube Music playlist
-        for i, track in enumerate(tracks):
-            print(f"({i+1}/{len(tracks)}) Processing track: {track['name']} - {track['artists']}")
-            search_and_add_to_ytmusic_playlist(ytmusic_driver, ytmusic_playlist_url, track, playlist['name'])
-            time.sleep(1)  # Avoid rate limiting
-        
-        print(f"✅ Completed migration for playlist: {playlist['name']}")
+        result.append((playlist, [dict(track, match=matches[key]) for key, track in entries]))
+    return result
+
+def plan_migration(source, ytmusic_driver, path, resolve=True, failures=None):
+    """Read every playlist and resolve its tracks into a manifest, leaving YouTube Music untouched
+
+    Reading runs on a background thread as in migrate_playlists, and tracks are
+    resolved in batches as they arrive unless the source already matched them
+    (see resolve_once). Without resolve (or a driver) tracks are written
+    unresolved and searched for when the manifest is applied. Playlists that
+    could not be read are left out of the manifest and added to failures.
+    """
+    events = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    producer = threading.Thread(target=produce_playlist_events, args=(source, events, stop),
+                                name="spotify-producer", daemon=True)
+    producer.start()
+    manifest = ManifestWriter(path)
+    pending = []
+    
+    def flush():
+        if not pending:
+            return
+        tracks = list(pending)
+        pending.clear()
+        todo = [i for i, track in enumerate(tracks) if "match" not in track]
+        if todo and resolve and ytmusic_driver is not None:
+            with metrics.span("resolve", tracks=len(todo)):
+                found = resolve_ytmusic_tracks(ytmusic_driver, [tracks[i] for i in todo])
+            for i, match in zip(todo, found):
+                tracks[i] = dict(tracks[i], match=match)
+        manifest.add_tracks(tracks)
+    
+    try:
+        while True:
+            kind, item = events.get()
+            if kind == "playlist":
+                print(f"\nPlanning playlist: {item['name']}")
+                manifest.playlist(item)
+            elif kind == "track":
+                pending.append(item[1])
+                if len(pending) >= RESOLVE_BATCH_SIZE:
+                    flush()
+            elif kind == "end":
+                flush()
+                manifest.end()
+            elif kind == "error":
+                # Without its end record the playlist is not applied
+                pending.clear()
+                reading_failed(item, failures)
+            elif kind == "done":
+                break
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+        manifest.close()
+    print(f"📝 Planned {manifest.playlists} playlists with {manifest.tracks} tracks "
+          f"({manifest.resolved} matched) into {path}")
+    return manifest
 
 
 # Add this function to your script
-def setup_driver_with_profile(profile_path, headless=False):
+def setup_driver_with_profile(profile_path, headless=None, lean=False, capture_network=False):
     """Set up Edge with an existing profile that's already logged in"""
+    if headless is None:
+        headless = lean
     options = EdgeOptions()
     if headless:
         options.add_argument("--headless")
-    options.add_argument("--window-size=1920,1080")
+    if lean:
+        apply_lean_options(options)
+    else:
+        options.add_argument("--window-size=1920,1080")
     options.add_argument(f"user-data-dir={profile_path}")
     
     # Anti-detection measures
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
+    if capture_network:
+        options.set_capability("ms:loggingPrefs", {"performance": "ALL"})
     
-    driver = webdriver.Edge(service=EdgeService(EdgeChromiumDriverManager().install()), options=options)
+    driver = drivers.launch(options)
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    if lean:
+        start_lean_session(driver)
     return driver
-def main():
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate Spotify playlists to YouTube Music")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of YouTube Music browser sessions adding tracks in parallel (default: 1)")
+    parser.add_argument("--tabs", action="store_true",
+                        help="run the --workers as tabs of one extra browser instead of a browser each, "
+                             "which takes far less memory")
+    parser.add_argument("--cache", default=TRACK_CACHE_PATH,
+                        help="path of the track resolution cache (default: track_cache.sqlite3 next to this script)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always search YouTube Music instead of reusing earlier matches")
+    parser.add_argument("--selector-cache", default=SELECTOR_CACHE_PATH, metavar="PATH",
+                        help="where the selectors that found each page element are remembered, so later runs try "
+                             "them first (default: selector_cache.json next to this script)")
+    parser.add_argument("--journal", default=JOURNAL_PATH,
+                        help="path of the progress journal (default: migration_journal.jsonl next to this script)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted migration from the journal instead of starting over")
+    parser.add_argument("--fresh", action="store_true",
+                        help="start over even if the journal holds an interrupted migration, discarding its progress")
+    parser.add_argument("--import", dest="import_path", metavar="PATH",
+                        help="read playlists from a Spotify data export (the zip, Playlist*.json files or their folder) "
+                             "or CSV exports such as Exportify's, instead of a Spotify browser")
+    phase = parser.add_mutually_exclusive_group()
+    phase.add_argument("--plan", metavar="FILE",
+                       help="only read playlists and match their tracks, writing a manifest (JSON lines, gzipped if "
+                            "FILE ends in .gz) for --apply; YouTube Music playlists are not touched")
+    phase.add_argument("--apply", metavar="FILE",
+                       help="create the playlists and add the tracks of a manifest written by --plan; "
+                            "no Spotify browser is needed")
+    parser.add_argument("--shard", type=parse_shard, metavar="K/N",
+                        help="with --apply, only migrate the K-th of N equal shares of the playlists")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="with --apply, print what would be migrated and exit without opening a browser")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="read every playlist before adding anything and search for each distinct track once, "
+                             "however many playlists it is in")
+    parser.add_argument("--spotify-api", action="store_true",
+                        help="read Spotify tracks from the web player's API responses instead of scrolling the tracklist")
+    parser.add_argument("--page-search", action="store_true",
+                        help="find tracks by loading search result pages instead of searching from inside the page")
+    parser.add_argument("--ui-insert", action="store_true",
+                        help="add every track through the Save dialog instead of in batches by video ID")
+    parser.add_argument("--debug-artifacts", choices=ARTIFACT_LEVELS, default="failure",
+                        help="when to save debug screenshots and page snapshots (default: failure)")
+    parser.add_argument("--artifact-dir", default=ARTIFACT_DIR,
+                        help="where debug artifacts are written (default: debug/ next to this script)")
+    parser.add_argument("--lean", choices=("spotify", "ytmusic", "both"),
+                        help="run these browsers lean: no images, media or fonts, smaller window, fewer background "
+                             "features; sessions that need no manual login also run headless")
+    parser.add_argument("--page-stats", action="store_true",
+                        help="report page-load time and bytes transferred per browser at the end")
+    parser.add_argument("--driver-version",
+                        help=f"pin the msedgedriver version (also ${DRIVER_VERSION_ENV}); "
+                             f"${DRIVER_PATH_ENV} points at a specific binary instead")
+    parser.add_argument("--offline", action="store_true",
+                        help="never download msedgedriver; use the cached, PATH or Selenium-managed one")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="append per-track stage spans (with WebDriver command and sleep counts) to this JSON lines file")
+    parser.add_argument("--prometheus", metavar="PATH",
+                        help="keep a Prometheus textfile with command, wait, sleep and stage totals up to date here")
+    parser.add_argument("--non-interactive", action="store_true",
+                        help="never prompt; needs --spotify-profile and --ytmusic-profile, and exits with status "
+                             f"{EXIT_LOGIN_REQUIRED} if either is not logged in")
+    parser.add_argument("--spotify-profile", metavar="PATH", help="Edge profile directory already logged in to Spotify")
+    parser.add_argument("--ytmusic-profile", metavar="PATH", help="Edge profile directory already logged in to YouTube Music")
+    parser.add_argument("--playlist", action="append", default=[], metavar="PATTERN",
+                        help="only migrate playlists whose name matches this pattern (e.g. 'Road trip*') or with this "
+                             "Spotify ID; can be repeated")
+    parser.add_argument("--exclude-playlist", action="append", default=[], metavar="PATTERN",
+                        help="skip playlists whose name matches this pattern or with this Spotify ID; can be repeated")
+    parser.add_argument("--spotify-rate", type=float, default=RATE_LIMITS["spotify"],
+                        help=f"most Spotify requests per second (default: {RATE_LIMITS['spotify']}); "
+                             "backs off automatically when throttled")
+    parser.add_argument("--ytmusic-rate", type=float, default=RATE_LIMITS["ytmusic"],
+                        help=f"most YouTube Music requests per second (default: {RATE_LIMITS['ytmusic']}); "
+                             "backs off automatically when throttled")
+    parser.add_argument("--sync", action="store_true",
+                        help="reuse YouTube Music playlists with the same name and only add the tracks they are missing")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.tabs and args.workers < 2:
+        parser.error("--tabs needs --workers 2 or more")
+    if (args.shard or args.dry_run) and not args.apply:
+        parser.error("--shard and --dry-run only apply to --apply")
+    if args.apply and args.import_path:
+        parser.error("--import and --apply both replace the Spotify browser; use one")
+    if args.dedupe and args.page_search:
+        parser.error("--dedupe resolves tracks with in-page search, which --page-search turns off")
+    return args
+
+def main(argv=None):
+    global TRACK_CACHE_PATH, artifacts, drivers, metrics, strategies
+    args = parse_args(argv)
+    metrics = Instrumentation(args.metrics, args.prometheus)
+    drivers = DriverFactory(version=args.driver_version, offline=args.offline or None)
+    rate_limits["spotify"].configure(args.spotify_rate)
+    rate_limits["ytmusic"].configure(args.ytmusic_rate)
+    TRACK_CACHE_PATH = None if args.no_cache else args.cache
+    artifacts = ArtifactRecorder(args.debug_artifacts, args.artifact_dir)
+    strategies = SelectorRegistry(args.selector_cache)
     print("Spotify to YouTube Music Playlist Migration")
     print("------------------------------------------")
     
+    lean_spotify = args.lean in ("spotify", "both")
+    lean_ytmusic = args.lean in ("ytmusic", "both")
+    
+    interactive = not args.non_interactive
+    spotify_source = args.import_path or args.apply
+    if not interactive and not ((args.spotify_profile or spotify_source) and args.ytmusic_profile):
+        print("❌ --non-interactive needs --spotify-profile (or --import/--apply) and --ytmusic-profile with profiles that are already logged in")
+        return EXIT_USAGE
+    if spotify_source and not os.path.exists(spotify_source):
+        print(f"❌ Nothing to read at {spotify_source}")
+        return EXIT_USAGE
+    
+    select = playlist_filter(args.playlist, args.exclude_playlist)
+    if args.dry_run:
+        state = MigrationState.replay(args.journal) if args.resume else None
+        dry_run_manifest(iter_manifest_source(args.apply, state, select, args.shard))
+        return EXIT_OK
+    if not (args.resume or args.fresh or args.plan) and MigrationState.replay(args.journal).interrupted:
+        # Starting over rewrites the journal; don't lose an interrupted migration by forgetting --resume
+        print(f"❌ {args.journal} holds a migration that did not finish. "
+              "Run with --resume to continue it, or --fresh to start over and discard its progress")
+        return EXIT_USAGE
+    
     # Ask user for Edge profile directory (if they have one)
-    print("Do you have an Edge profile where you're already logged into YouTube Music?")
-    use_profile = input("Type 'yes' if you do, or anything else to proceed normally: ").lower() == 'yes'
-    
-    if use_profile:
-        print("\nCommon Edge profile directory locations:")
-        print("- C:\\Users\\[YourUsername]\\AppData\\Local\\Microsoft\\Edge\\User Data\\Default")
-        print("- C:\\Users\\[YourUsername]\\AppData\\Local\\Microsoft\\Edge\\User Data\\Profile 1")
-        print("\nTo find your profile directory:")
-        print("1. Type 'edge://version' in your Edge address bar")
-        print("2. Look for 'Profile Path' entry")
-        print("3. Copy the path up to the 'User Data' folder, then add the profile name (Default, Profile 1, etc.)\n")
+    ytmusic_profile = args.ytmusic_profile
+    if ytmusic_profile is None:
+        print("Do you have an Edge profile where you're already logged into YouTube Music?")
+        use_profile = input("Type 'yes' if you do, or anything else to proceed normally: ").lower() == 'yes'
         
-        profile_path = input("Enter the full path to your Edge profile directory: ")
-        spotify_driver = setup_driver()
-        ytmusic_driver = setup_driver_with_profile(profile_path)
+        if use_profile:
+            print("\nCommon Edge profile directory locations:")
+            print("- C:\\Users\\[YourUsername]\\AppData\\Local\\Microsoft\\Edge\\User Data\\Default")
+            print("- C:\\Users\\[YourUsername]\\AppData\\Local\\Microsoft\\Edge\\User Data\\Profile 1")
+            print("\nTo find your profile directory:")
+            print("1. Type 'edge://version' in your Edge address bar")
+            print("2. Look for 'Profile Path' entry")
+            print("3. Copy the path up to the 'User Data' folder, then add the profile name (Default, Profile 1, etc.)\n")
+            
+            ytmusic_profile = input("Enter the full path to your Edge profile directory: ")
+    
+    # Unattended runs have nobody to look at the windows
+    profile_headless = None if interactive else True
+    spotify_driver = None
+    if spotify_source:
+        print(f"Reading Spotify playlists from {spotify_source}, no Spotify browser needed")
+    elif args.spotify_profile:
+        spotify_driver = setup_driver_with_profile(args.spotify_profile, headless=profile_headless,
+                                                   lean=lean_spotify, capture_network=args.spotify_api)
+    else:
+        spotify_driver = setup_driver(headless=False, capture_network=args.spotify_api, lean=lean_spotify)
+    if ytmusic_profile:
+        ytmusic_driver = setup_driver_with_profile(ytmusic_profile, headless=profile_headless, lean=lean_ytmusic)
     else:
-        spotify_driver = setup_driver()
-        ytmusic_driver = setup_driver()
+        ytmusic_driver = setup_driver(headless=False, lean=lean_ytmusic)
+    
+    # Launch the extra worker browsers while the user is busy logging in
+    if args.workers > 1 and not args.plan and args.tabs:
+        drivers.prewarm(1, url=f"{YTMUSIC_BASE_URL}/", headless=profile_headless, lean=lean_ytmusic, **TAB_BROWSER_SETUP)
+    elif args.workers > 1 and not args.plan:
+        drivers.prewarm(args.workers - 1, url=f"{YTMUSIC_BASE_URL}/", headless=profile_headless, lean=lean_ytmusic)
     
+    if spotify_driver is not None:
+        metrics.wrap(spotify_driver, "spotify")
+    metrics.wrap(ytmusic_driver, "ytmusic")
+    browsers = [(label, driver) for label, driver in (("Spotify", spotify_driver), ("YouTube Music", ytmusic_driver))
+                if driver is not None]
+    
+    page_stats = []
+    if args.page_stats:
+        page_stats = [(PageLoadStats(label).attach(driver), driver) for label, driver in browsers]
+    
+    pool = None
+    journal = None
+    # Playlists that could not be read from Spotify
+    failures = []
     try:
         # Login to both services
-        spotify_login(spotify_driver)
+        if spotify_driver is not None:
+            spotify_login(spotify_driver, interactive=interactive)
         
-        if not use_profile:
+        if not ytmusic_profile:
             print("\nIMPORTANT: For YouTube Music login, you may need to:")
             print("1. Manually login in the browser window")
             print("2. Verify your identity using your phone if prompted")
             print("3. Complete any security challenges Google presents\n")
         
-        ytmusic_login(ytmusic_driver)
+        ytmusic_login(ytmusic_driver, interactive=interactive)
         
-        # Migrate playlists
-        migrate_playlists(spotify_driver, ytmusic_driver)
+        if args.plan:
+            if args.import_path:
+                source = iter_export_source(args.import_path, select=select)
+            else:
+                source = iter_spotify_source(spotify_driver, use_api=args.spotify_api, select=select)
+            if args.dedupe:
+                source = resolve_once(source, ytmusic_driver, failures)
+            plan_migration(source, ytmusic_driver, args.plan, resolve=not args.page_search, failures=failures)
+            print(f"Apply it with: python ytmusic.py --apply {args.plan}")
+            if failures:
+                print(f"❌ {len(failures)} playlists could not be read and are not in the plan: {', '.join(failures)}")
+                return EXIT_FAILED
+            return EXIT_OK
         
-        print("\n✅ Migration complete!")
+        if args.workers > 1:
+            build = YTMusicWorkerPool.from_tabs if args.tabs else YTMusicWorkerPool.from_session
+            pool = build(ytmusic_driver, args.workers, headless=profile_headless, lean=lean_ytmusic)
         
+        # Migrate playlists
+        state = MigrationState.replay(args.journal) if args.resume else None
+        journal = MigrationJournal(args.journal, resume=args.resume)
+        source = None
+        if args.apply:
+            source = iter_manifest_source(args.apply, state, select, args.shard)
+        elif args.import_path:
+            source = iter_export_source(args.import_path, state, select)
+        if args.dedupe:
+            if source is None:
+                source = iter_spotify_source(spotify_driver, journal, state, use_api=args.spotify_api, select=select)
+            source = resolve_once(source, ytmusic_driver, failures)
+        migrate_playlists(spotify_driver, ytmusic_driver, pool=pool, journal=journal, state=state,
+                          sync=args.sync, spotify_api=args.spotify_api, resolve=not args.page_search,
+                          batch_insert=not args.ui_insert, select=select, source=source, failures=failures)
+        
+        if failures:
+            print(f"\n❌ Migration finished, but {len(failures)} playlists could not be read: {', '.join(failures)}")
+            print("Run again with --resume to retry them")
+        else:
+            journal.record("finished")
+            print("\n✅ Migration complete!")
+        cache = get_track_cache()
+        if cache is not None:
+            print(f"Track cache: {cache.hits} hits, {cache.misses} misses")
+        for stats, driver in page_stats:
+            print(stats.report(driver))
+        if pool is not None:
+            print(pool.memory_report())
+        print(metrics.summary())
+        return EXIT_FAILED if failures else EXIT_OK
+    
+    except LoginRequired as e:
+        print(f"❌ Cannot continue unattended: {e}")
+        return EXIT_LOGIN_REQUIRED
+    
     finally:
         # Clean up
         print("Closing browsers...")
-        spotify_driver.quit()
-        ytmusic_driver.quit()
+        if pool is not None:
+            pool.close()
+        drivers.close()
+        if journal is not None:
+            journal.close()
+        strategies.save()
+        artifacts.flush()
+        metrics.close()
+        for _, driver in browsers:
+            driver.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file